@@ -1,3 +1,12 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-# Register your models here.
+from core.admin import SoftDeleteAdmin
+from .models import User
+from .purge import soft_delete_user
+
+
+@admin.register(User)
+class UserAdmin(SoftDeleteAdmin, BaseUserAdmin):
+    soft_delete = staticmethod(soft_delete_user)
+    fieldsets = BaseUserAdmin.fieldsets + (('Profile', {'fields': ('bio', 'profile_picture')}),)
@@ -0,0 +1,37 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Password hashing is CPU-bound (pbkdf2_hmac releases the GIL), so at most
+# LOGIN_HASH_WORKERS logins per process hash at once, in the request's own
+# thread, and never starve the threads serving other requests. Up to
+# LOGIN_HASH_QUEUE more wait for a turn; callers beyond that, or that wait
+# longer than LOGIN_HASH_QUEUE_TIMEOUT, are turned away instead of piling up.
+# Sync gunicorn workers serve one request at a time, so this only bounds
+# threaded workers and bench_login.
+_hashing = threading.BoundedSemaphore(settings.LOGIN_HASH_WORKERS)
+_slots = threading.BoundedSemaphore(settings.LOGIN_HASH_WORKERS + settings.LOGIN_HASH_QUEUE)
+
+
+class LoginBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, please retry shortly.'
+    default_code = 'login_busy'
+
+
+def bounded_authenticate(**credentials):
+    """authenticate() once a hashing slot is free; raises LoginBusy when too many are waiting."""
+    if not _slots.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        if not _hashing.acquire(timeout=settings.LOGIN_HASH_QUEUE_TIMEOUT):
+            raise LoginBusy()
+        try:
+            return authenticate(**credentials)
+        finally:
+            _hashing.release()
+    finally:
+        _slots.release()
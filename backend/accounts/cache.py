@@ -0,0 +1,70 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from core.cache import get_or_compute, invalidate
+from .models import User, Follow
+
+# What profiles show, in model field order (User.from_db); the password hash never goes to the cache
+PROFILE_FIELDS = ('id', 'username', 'email', 'bio', 'profile_picture', 'created_at')
+
+
+def user_key(username):
+    return f'user:{username}'
+
+
+def get_user(username):
+    """
+    Active (not soft-deleted) user by username, or None. Only PROFILE_FIELDS
+    are loaded; other fields are deferred and read from the table on access.
+    Misses are not cached: the username can be registered (or imported, or
+    renamed to) any moment.
+    """
+    values = get_or_compute(
+        user_key(username),
+        lambda: User.objects.filter(username=username, deleted_at__isnull=True).values_list(*PROFILE_FIELDS).first(),
+        cache_none=False,
+    )
+    return User.from_db(DEFAULT_DB_ALIAS, PROFILE_FIELDS, values) if values is not None else None
+
+
+def invalidate_user(*usernames):
+    invalidate(*[user_key(username) for username in usernames])
+
+
+def following_key(user_id):
+    return f'following:{user_id}'
+
+
+def follow_counts_key(user_id):
+    return f'follow_counts:{user_id}'
+
+
+def get_following_ids(user_id):
+    """Ids of the users `user_id` follows"""
+    return get_or_compute(
+        following_key(user_id),
+        lambda: set(Follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True)),
+    )
+
+
+def get_follow_counts(user_id):
+    """(followers, following) counts of a user, leaving out soft-deleted accounts"""
+    return get_or_compute(
+        follow_counts_key(user_id),
+        lambda: (Follow.objects.filter(following_id=user_id, follower__deleted_at__isnull=True).count(),
+                 Follow.objects.filter(follower_id=user_id, following__deleted_at__isnull=True).count()),
+    )
+
+
+def invalidate_follow(follower_id, following_id):
+    invalidate(following_key(follower_id), follow_counts_key(follower_id), follow_counts_key(following_id))
+
+
+DELETED_USERS_KEY = 'deleted_user_ids'
+
+
+def get_deleted_user_ids():
+    """Soft-deleted users not purged yet: a short list, since purging runs hourly"""
+    return get_or_compute(
+        DELETED_USERS_KEY,
+        lambda: set(User.objects.filter(deleted_at__isnull=False).values_list('id', flat=True)),
+    )
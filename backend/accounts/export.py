@@ -0,0 +1,90 @@
+import json
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.sharding import shards
+from notifications.models import Notification
+from posts.models import Post, Comment, Like
+from .models import User, Follow
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _on_every_shard(queryset):
+    return [queryset.using(alias) for alias in shards()]
+
+
+def export_sections(user):
+    """
+    Querysets making up a user's data export, as (name, [values querysets])
+    pairs: comments and likes sit on the shards of the posts they belong to,
+    so those sections read every shard in turn.
+    """
+    return (
+        ('profile', [User.objects.filter(pk=user.pk).values(
+            'id', 'username', 'email', 'bio', 'profile_picture', 'created_at')]),
+        ('posts', [Post.objects.for_user(user.pk).filter(author=user).order_by('id').values(
+            'id', 'content', 'image', 'created_at', 'updated_at')]),
+        ('comments', _on_every_shard(Comment.objects.filter(author=user).order_by('id').values(
+            'id', 'post_id', 'content', 'created_at', 'updated_at'))),
+        ('likes', _on_every_shard(Like.objects.filter(user=user).order_by('id').values(
+            'id', 'post_id', 'created_at'))),
+        ('following', [Follow.objects.filter(follower=user).order_by('id').values(
+            'id', 'following_id', 'following__username', 'created_at')]),
+        ('followers', [Follow.objects.filter(following=user).order_by('id').values(
+            'id', 'follower_id', 'follower__username', 'created_at')]),
+        ('notifications', [Notification.objects.for_user(user.pk).filter(recipient=user).order_by('id').values(
+            'id', 'sender_id', 'notification_type', 'message', 'related_post_id',
+            'is_read', 'created_at')]),
+    )
+
+
+def _ndjson_lines(querysets, chunk_size, **extra):
+    for queryset in querysets:
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield json.dumps({**extra, **row}, cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_ndjson(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the user's data as NDJSON lines, one record per row.
+    Rows are read through database cursors in chunks, so memory use does not
+    depend on the size of the account.
+    """
+    for section, querysets in export_sections(user):
+        yield from _ndjson_lines(querysets, chunk_size, type=section)
+
+
+class _ZipStream:
+    """Unseekable file object collecting what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a zip archive with one NDJSON file per section, built on the fly."""
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for section, querysets in export_sections(user):
+            with archive.open(f'{section}.ndjson', mode='w') as entry:
+                for line in _ndjson_lines(querysets, chunk_size):
+                    entry.write(line.encode())
+                    data = stream.drain()
+                    if data:
+                        yield data
+            yield stream.drain()
+    yield stream.drain()
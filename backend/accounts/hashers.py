@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the work factor taken from settings.PASSWORD_HASH_ITERATIONS.
+    It keeps the stock 'pbkdf2_sha256' algorithm name, so existing hashes still
+    verify and are re-encoded on the next successful login whenever the
+    configured iteration count changes.
+    """
+    iterations = settings.PASSWORD_HASH_ITERATIONS
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from core.db import delete_in_batches
+from core.jobs import job
+from .purge import purge_user, purge_deleted_users
+
+
+@job('accounts.purge_user')
+def purge(user_id):
+    purge_user(user_id)
+
+
+@job('accounts.purge_deleted', schedule=timedelta(hours=1), concurrency=1)
+def purge_deleted():
+    purge_deleted_users()
+
+
+@job('accounts.flush_expired_tokens', schedule=timedelta(days=1), concurrency=1)
+def flush_expired_tokens():
+    """Batched equivalent of simplejwt's flushexpiredtokens"""
+    now = timezone.now()
+    delete_in_batches(BlacklistedToken.objects.filter(token__expires_at__lt=now))
+    delete_in_batches(OutstandingToken.objects.filter(expires_at__lt=now))
@@ -0,0 +1,59 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as SimpleJWTRefreshSerializer
+
+from accounts.models import User
+from accounts.serializers import UserLoginSerializer, TokenRefreshSerializer
+from accounts.tokens import RefreshToken
+
+
+class Command(BaseCommand):
+    help = 'Measure logins/sec (per core) through the login serializer and token issuing path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=settings.LOGIN_HASH_WORKERS)
+
+    def handle(self, *args, **options):
+        password = uuid.uuid4().hex
+        name = f'bench-login-{uuid.uuid4().hex[:8]}'
+        user = User.objects.create_user(username=name, email=f'{name}@example.invalid', password=password)
+        try:
+            self._bench_logins(user, password, options['logins'], options['concurrency'])
+            self._count_refresh_queries(user)
+        finally:
+            user.delete()
+
+    def _bench_logins(self, user, password, logins, concurrency):
+        def login(_):
+            close_old_connections()
+            serializer = UserLoginSerializer(data={'email': user.email, 'password': password})
+            serializer.is_valid(raise_exception=True)
+            str(RefreshToken.for_user(serializer.validated_data['user']))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - started
+
+        cores = min(concurrency, settings.LOGIN_HASH_WORKERS, os.cpu_count() or 1)
+        self.stdout.write(
+            f'{logins} logins in {elapsed:.2f}s with {concurrency} clients: '
+            f'{logins / elapsed:.1f} logins/s, {logins / elapsed / cores:.1f} logins/s per core '
+            f'({settings.PASSWORD_HASH_ITERATIONS} PBKDF2 iterations, {settings.LOGIN_HASH_WORKERS} hash workers)'
+        )
+
+    def _count_refresh_queries(self, user):
+        for label, serializer_class in (('simplejwt', SimpleJWTRefreshSerializer),
+                                        ('accounts', TokenRefreshSerializer)):
+            refresh = str(RefreshToken.for_user(user))
+            with CaptureQueriesContext(connection) as ctx:
+                serializer_class(data={'refresh': refresh}).is_valid(raise_exception=True)
+            self.stdout.write(f'{label} token refresh: {len(ctx.captured_queries)} queries')
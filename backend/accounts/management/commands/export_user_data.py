@@ -0,0 +1,46 @@
+import os
+import secrets
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.export import iter_ndjson, iter_zip
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Export a user's posts, comments, likes, follows and notifications to "
+        "EXPORT_ROOT, readable by the owner of the process only. Users "
+        "download their own data from /api/auth/export/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--output', choices=['ndjson', 'zip'], default='zip')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        os.makedirs(settings.EXPORT_ROOT, mode=0o700, exist_ok=True)
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        # A random part too, so the name cannot be guessed should the directory ever be exposed
+        name = f'{user.username}-{stamp}-{secrets.token_urlsafe(16)}.{options["output"]}'
+        path = os.path.join(settings.EXPORT_ROOT, name)
+
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        if options['output'] == 'zip':
+            with open(fd, 'wb') as f:
+                for chunk in iter_zip(user, options['chunk_size']):
+                    f.write(chunk)
+        else:
+            with open(fd, 'w', encoding='utf-8') as f:
+                for line in iter_ndjson(user, options['chunk_size']):
+                    f.write(line)
+
+        self.stdout.write(self.style.SUCCESS(f'Export written to {path}'))
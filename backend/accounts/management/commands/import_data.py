@@ -0,0 +1,302 @@
+import contextlib
+import csv
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.cache import follow_counts_key, following_key
+from accounts.models import User, Follow
+from core.cache import invalidate
+from core.outbox import emit_many
+from core.sharding import is_sharded
+from posts import likes_index, read_model
+from posts.mentions import parse_mentions
+from posts.models import ImportedPost, Mention, Post, Like
+
+RECORD_TYPES = ('user', 'post', 'follow', 'like')
+# Fields every record of a type must have, as non-empty strings (numbers are accepted for ids)
+REQUIRED = {
+    'user': ('username', 'email'),
+    'post': ('id', 'author', 'content'),
+    'follow': ('follower', 'following'),
+    'like': ('post', 'user'),
+}
+# Invalid records reported one by one before only being counted
+MAX_REPORTED = 20
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+@contextlib.contextmanager
+def _preserve_timestamps(*models):
+    """Let bulk_create keep imported created_at/updated_at values instead of now()."""
+    fields = [f for model in models for f in model._meta.concrete_fields
+              if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _validate(record):
+    """The record with its fields checked and created_at parsed; raises InvalidRecord"""
+    record_type = record.get('type')
+    if record_type not in REQUIRED:
+        raise InvalidRecord(f'unknown type {record_type!r}')
+    for field in REQUIRED[record_type]:
+        value = record.get(field)
+        if isinstance(value, int) and not isinstance(value, bool) and field in ('id', 'post'):
+            record[field] = str(value)
+        elif not isinstance(value, str) or not value.strip():
+            raise InvalidRecord(f'{record_type} needs a non-empty {field!r}')
+    created_at = record.get('created_at')
+    if created_at:
+        try:
+            record['created_at'] = parse_datetime(created_at) if isinstance(created_at, str) else None
+        except ValueError:
+            record['created_at'] = None
+        if record['created_at'] is None:
+            raise InvalidRecord(f'created_at {created_at!r} is not a date and time')
+        if timezone.is_naive(record['created_at']):
+            record['created_at'] = timezone.make_aware(record['created_at'], timezone.utc)
+    else:
+        record['created_at'] = timezone.now()
+    return record
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import users, posts, follows and likes from NDJSON or CSV. '
+        'Rows are written with bulk_create, so no per-row signals (and no '
+        'notifications) fire; the change feed gets post, follow and like '
+        'events dated by the records\' created_at, so analytics count them '
+        'when they happened. Posts get new ids; likes name posts by their id '
+        'in the source, looked up among the posts imported under the same '
+        '--source, so a community can be onboarded in several files and into a '
+        'database that already has posts. Invalid records are skipped, counted '
+        'and reported with their line number. Progress is checkpointed after '
+        'every batch and an interrupted import resumes where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--type', choices=RECORD_TYPES,
+                            help='Record type of every row (required for CSV input)')
+        parser.add_argument('--source', default='import',
+                            help='Name of the data source, scoping the post ids likes refer to')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+
+    def handle(self, *args, **options):
+        if is_sharded():
+            raise CommandError('import_data writes to a single database; it does not support SHARDS yet')
+        if options['format'] == 'csv' and not options['type']:
+            raise CommandError('--type is required for CSV input')
+
+        self.source = options['source']
+        checkpoint = options['checkpoint'] or f"{options['path']}.checkpoint"
+        done = 0
+        if os.path.exists(checkpoint) and not options['restart']:
+            with open(checkpoint) as f:
+                done = int(f.read().split()[0] or 0)
+            self.stdout.write(f'Resuming after {done} rows')
+
+        self.counts = dict.fromkeys(RECORD_TYPES + ('skipped', 'invalid'), 0)
+        start = timezone.now()
+
+        with open(options['path'], newline='', encoding='utf-8') as f:
+            records = self._read(f, options['format'], options['type'])
+            records = islice(records, done, None)
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic(), _preserve_timestamps(User, Post, Follow, Like, Mention):
+                    self._import_batch(batch)
+                done += len(batch)
+                with open(checkpoint, 'w') as cp:
+                    cp.write(str(done))
+                self.stdout.write(f'{done} rows read', ending='\r')
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        elapsed = (timezone.now() - start).total_seconds() or 1e-9
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {done} rows in {elapsed:.1f}s ({done / elapsed:.0f} rows/s), inserted: '
+            + ', '.join(f'{k}={v}' for k, v in self.counts.items())
+        ))
+
+    def _read(self, f, fmt, record_type):
+        """(line number, record or InvalidRecord) for every row"""
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, {'type': record_type, **row}
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_number, InvalidRecord(f'not JSON: {e}')
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, InvalidRecord('not a JSON object')
+                    continue
+                if record_type:
+                    record.setdefault('type', record_type)
+                yield line_number, record
+
+    def _invalid(self, line_number, error):
+        self.counts['invalid'] += 1
+        if self.counts['invalid'] <= MAX_REPORTED:
+            self.stderr.write(f'Line {line_number}: {error}')
+
+    def _import_batch(self, batch):
+        by_type = {t: [] for t in RECORD_TYPES}
+        for line_number, record in batch:
+            try:
+                if isinstance(record, InvalidRecord):
+                    raise record
+                record = _validate(record)
+            except InvalidRecord as e:
+                self._invalid(line_number, e)
+                continue
+            by_type[record['type']].append(record)
+
+        # Users first, so that follows, posts and likes in the same batch can resolve them
+        self._import_users(by_type['user'])
+
+        usernames = {r[k] for r in by_type['follow'] for k in ('follower', 'following')}
+        usernames |= {r['author'] for r in by_type['post']}
+        usernames |= {r['user'] for r in by_type['like']}
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+        self._import_posts(by_type['post'], user_ids)
+        self._import_follows(by_type['follow'], user_ids)
+        self._import_likes(by_type['like'], user_ids)
+
+    def _insert(self, record_type, model, rows, existing, key):
+        """
+        bulk_create `rows` skipping conflicts. Returns the rows inserted, told
+        apart by their `key` fields among `existing` (the rows with their keys).
+        """
+        before = set(existing.values_list(*key))
+        model.objects.bulk_create(rows, ignore_conflicts=True)
+        new_keys = set(existing.values_list(*key)) - before
+        inserted = []
+        for row in rows:
+            row_key = tuple(getattr(row, field) for field in key)
+            if row_key in new_keys:
+                new_keys.remove(row_key)  # A key repeated in the batch was inserted once
+                inserted.append(row)
+        self.counts[record_type] += len(inserted)
+        self.counts['skipped'] += len(rows) - len(inserted)
+        return inserted
+
+    def _import_users(self, records):
+        users = []
+        for r in records:
+            users.append(User(
+                username=r['username'],
+                email=r['email'],
+                password=r.get('password') or make_password(None),
+                bio=r.get('bio') or '',
+                date_joined=r['created_at'],
+                created_at=r['created_at'],
+                updated_at=r['created_at'],
+            ))
+        self._insert('user', User, users, User.objects.filter(username__in=[u.username for u in users]),
+                     ('username',))
+
+    def _import_posts(self, records, user_ids):
+        # Posts already imported under this source come from a batch re-read after a crash
+        imported = set(ImportedPost.objects.filter(source=self.source, source_id__in=[r['id'] for r in records])
+                       .values_list('source_id', flat=True))
+        posts, source_ids = [], []
+        for r in records:
+            author_id = user_ids.get(r['author'])
+            if author_id is None or r['id'] in imported or r['id'] in source_ids:
+                self.counts['skipped'] += 1
+                continue
+            posts.append(Post(author_id=author_id, content=r['content'],
+                              created_at=r['created_at'], updated_at=r['created_at']))
+            source_ids.append(r['id'])
+        if not posts:
+            return
+        # No conflicts to ignore, so the new ids come back
+        posts = Post.objects.bulk_create(posts)
+        ImportedPost.objects.bulk_create([ImportedPost(source=self.source, source_id=source_id, post_id=post.id)
+                                          for source_id, post in zip(source_ids, posts)])
+        self.counts['post'] += len(posts)
+        emit_many('post.created', [(post.id, {'author_id': post.author_id, 'content': post.content,
+                                              'occurred_at': post.created_at.isoformat()}) for post in posts])
+        self._import_mentions(posts)
+        read_model.refresh_items([post.id for post in posts], 'default')
+
+    def _import_mentions(self, posts):
+        """Mention rows for @usernames in the posts, without notifications (nothing happened just now)"""
+        mentioned = {post.id: parse_mentions(post.content) for post in posts}
+        user_ids = dict(User.objects.filter(username__in={name for names in mentioned.values() for name in names},
+                                            deleted_at__isnull=True).values_list('username', 'id'))
+        Mention.objects.bulk_create([
+            Mention(post=post, user_id=user_ids[name], created_at=post.created_at)
+            for post in posts for name in mentioned[post.id]
+            if name in user_ids and user_ids[name] != post.author_id
+        ], ignore_conflicts=True)
+
+    def _import_follows(self, records, user_ids):
+        follows = []
+        for r in records:
+            follower_id = user_ids.get(r['follower'])
+            following_id = user_ids.get(r['following'])
+            if follower_id is None or following_id is None or follower_id == following_id:
+                self.counts['skipped'] += 1
+                continue
+            follows.append(Follow(follower_id=follower_id, following_id=following_id, created_at=r['created_at']))
+        follows = self._insert('follow', Follow, follows,
+                               Follow.objects.filter(follower_id__in={f.follower_id for f in follows},
+                                                     following_id__in={f.following_id for f in follows}),
+                               ('follower_id', 'following_id'))
+        emit_many('follow.created', [(f.follower_id, {'follower_id': f.follower_id, 'following_id': f.following_id,
+                                                      'occurred_at': f.created_at.isoformat()}) for f in follows])
+        # bulk_create skips the Follow signals that keep these cached
+        invalidate(*{following_key(f.follower_id) for f in follows},
+                   *{follow_counts_key(user_id) for f in follows for user_id in (f.follower_id, f.following_id)})
+
+    def _import_likes(self, records, user_ids):
+        post_ids = dict(ImportedPost.objects.filter(source=self.source, source_id__in={r['post'] for r in records})
+                        .values_list('source_id', 'post_id'))
+        likes = []
+        for r in records:
+            user_id = user_ids.get(r['user'])
+            post_id = post_ids.get(r['post'])
+            if user_id is None or post_id is None:
+                self.counts['skipped'] += 1
+                continue
+            likes.append(Like(post_id=post_id, user_id=user_id, created_at=r['created_at']))
+        likes = self._insert('like', Like, likes,
+                             Like.objects.filter(post_id__in={like.post_id for like in likes},
+                                                 user_id__in={like.user_id for like in likes}),
+                             ('post_id', 'user_id'))
+        authors = dict(Post.objects.filter(id__in={like.post_id for like in likes}).values_list('id', 'author_id'))
+        emit_many('like.created', [(like.post_id, {'post_id': like.post_id, 'post_author_id': authors[like.post_id],
+                                                   'user_id': like.user_id, 'occurred_at': like.created_at.isoformat()})
+                                   for like in likes])
+        likes_index.invalidate({like.post_id for like in likes})
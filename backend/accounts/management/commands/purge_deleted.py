@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.purge import purge_deleted_users
+from posts.purge import purge_deleted_posts
+
+
+class Command(BaseCommand):
+    help = 'Remove soft-deleted users and posts together with their likes, comments, follows and notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--limit', type=int, help='Purge at most this many users and posts per run')
+
+    def handle(self, *args, **options):
+        users = purge_deleted_users(options['batch_size'], options['limit'])
+        posts = purge_deleted_posts(options['batch_size'], options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {users} users and {posts} posts'))
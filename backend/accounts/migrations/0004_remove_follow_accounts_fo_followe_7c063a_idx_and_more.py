@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from core.operations import RemoveFieldIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY cannot run in a transaction (core.operations)
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0003_alter_user_options_user_deleted_at_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='follow',
+                    name='follower',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following_set', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[RemoveFieldIndexConcurrently('follow', 'follower')],
+        ),
+    ]
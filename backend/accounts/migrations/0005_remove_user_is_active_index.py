@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:29
+
+from django.db import migrations
+
+from core.operations import RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # DROP INDEX CONCURRENTLY cannot run in a transaction (core.operations). Almost every user is
+    # active, so the index on is_active was never selective enough to be used, only maintained
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0004_remove_follow_accounts_fo_followe_7c063a_idx_and_more'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='user',
+            name='accounts_us_is_acti_a5841d_idx',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:34
+
+from django.db import migrations, models
+
+from core.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction (core.operations)
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0005_remove_user_is_active_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(condition=models.Q(('last_login__isnull', False)), fields=['-last_login'], name='accounts_user_last_login_idx'),
+        ),
+    ]
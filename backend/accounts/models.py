@@ -15,16 +15,20 @@ class User(AbstractUser):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set (together with is_active=False) on account deletion; purge_deleted removes the data later
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
     class Meta:
+        # username and email are unique, so their lookups already use the unique indexes
         indexes = [
-            models.Index(fields=['username']),  # For username lookups
-            models.Index(fields=['email']),  # For email authentication
             models.Index(fields=['-created_at']),  # For ordering by join date
-            models.Index(fields=['is_active']),  # For active user queries
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False),
+                         name='accounts_user_deleted_idx'),  # For the purger
+            models.Index(fields=['-last_login'], condition=models.Q(last_login__isnull=False),
+                         name='accounts_user_last_login_idx'),  # For cache warming (core.warming)
         ]
 
     def __str__(self):
@@ -39,7 +43,8 @@ class User(AbstractUser):
         return self.followers_users.count()
 
 class Follow(models.Model):
-    follower = models.ForeignKey(User, related_name='following_set', on_delete=models.CASCADE)
+    # Lookups by follower use the (follower, following) unique index
+    follower = models.ForeignKey(User, related_name='following_set', on_delete=models.CASCADE, db_index=False)
     following = models.ForeignKey(User, related_name='followers_set', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -51,11 +56,6 @@ class Follow(models.Model):
                 name='no_self_follow'
             )
         ]
-        indexes = [
-            models.Index(fields=['follower']),
-            models.Index(fields=['following']),
-            models.Index(fields=['follower', 'following'])
-        ]
 
     def __str__(self):
         return f"{self.follower.username} follows {self.following.username}"
\ No newline at end of file
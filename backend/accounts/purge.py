@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from core.cache import invalidate
+from core.db import delete_in_batches
+from core.jobs import defer
+from core.outbox import emit_many
+from core.sharding import shards
+from notifications.cache import invalidate_unread
+from notifications.models import Notification
+from posts import likes_index, read_model
+from posts.cache import user_posts_key
+from posts.models import Post, Comment, Like, Mention
+from posts.purge import delete_comments, delete_likes, purge_post
+from .cache import DELETED_USERS_KEY, follow_counts_key, following_key, invalidate_user
+from .models import User, Follow
+
+
+def soft_delete_user(user):
+    """Hide the account and everything it wrote straight away; an accounts.purge_user job does the rest."""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(deleted_at=timezone.now(), is_active=False)
+        defer('accounts.purge_user', user_id=user.pk)
+    invalidate_user(user.username)
+    invalidate(user_posts_key(user.id), DELETED_USERS_KEY)
+
+
+def purge_user(user_id, batch_size=1000):
+    """
+    Remove a soft-deleted user's data in bounded batches, shard by shard, then the user row.
+
+    What shows up on other people's posts and profiles goes first, so their
+    like, comment and follower counts are right again as early as possible.
+    """
+    for alias in shards():
+        # Everything the user did on other people's posts and for other recipients
+        sent = Notification.objects.using(alias).filter(sender_id=user_id)
+        unread_recipients = set(sent.filter(is_read=False).values_list('recipient_id', flat=True))
+        delete_in_batches(sent, batch_size)
+        invalidate_unread(*unread_recipients)
+        while True:
+            # The liked posts' cached like arrays must not keep the deleted likes
+            likes = list(Like.objects.using(alias).filter(user_id=user_id).order_by()
+                         .values_list('id', 'post_id')[:batch_size])
+            if not likes:
+                break
+            delete_likes(Like.objects.using(alias).filter(id__in=[like_id for like_id, _ in likes]), batch_size)
+            likes_index.invalidate([post_id for _, post_id in likes])
+        delete_in_batches(Mention.objects.using(alias).filter(user_id=user_id), batch_size)
+        delete_in_batches(Mention.objects.using(alias).filter(comment__author_id=user_id), batch_size)
+        commented = set(Comment.objects.using(alias).filter(author_id=user_id).values_list('post_id', flat=True))
+        delete_comments(Comment.objects.using(alias).filter(author_id=user_id), batch_size)
+        # Comment counters of the other posts the user commented on
+        read_model.refresh_items(commented, alias)
+    # Raw deletes skip the Follow post_delete signal; the notifications are already gone
+    for follows in (Follow.objects.filter(follower_id=user_id), Follow.objects.filter(following_id=user_id)):
+        while True:
+            rows = list(follows.order_by().values_list('id', 'follower_id', 'following_id')[:batch_size])
+            if not rows:
+                break
+            with transaction.atomic():
+                delete_in_batches(Follow.objects.filter(id__in=[follow_id for follow_id, _, _ in rows]), batch_size)
+                emit_many('follow.deleted', [(follower_id, {'follower_id': follower_id, 'following_id': following_id})
+                                             for _, follower_id, following_id in rows])
+            invalidate(*{key for _, follower_id, following_id in rows for other_id in (follower_id, following_id)
+                         for key in (following_key(other_id), follow_counts_key(other_id))})
+
+    for post_id in list(Post.objects.for_user(user_id).filter(author_id=user_id).values_list('id', flat=True)):
+        purge_post(post_id, batch_size)
+    delete_in_batches(Notification.objects.for_user(user_id).filter(recipient_id=user_id), batch_size)
+    delete_in_batches(BlacklistedToken.objects.filter(token__user_id=user_id), batch_size)
+    delete_in_batches(OutstandingToken.objects.filter(user_id=user_id), batch_size)
+
+    User.objects.filter(pk=user_id).delete()
+    invalidate(DELETED_USERS_KEY)
+
+
+def purge_deleted_users(batch_size=1000, limit=None):
+    """Purge soft-deleted users, oldest deletion first. Returns the number purged."""
+    user_ids = User.objects.filter(deleted_at__isnull=False).order_by('deleted_at').values_list('id', flat=True)
+    if limit:
+        user_ids = user_ids[:limit]
+    purged = 0
+    for user_id in list(user_ids):
+        purge_user(user_id, batch_size)
+        purged += 1
+    return purged
@@ -1,7 +1,14 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from core.warming import warm_user_later
+from .auth import bounded_authenticate
+from .cache import get_follow_counts, get_following_ids
 from .models import User, Follow
+from .tokens import RefreshToken
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -30,7 +37,7 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
 
         if email and password:
-            user = authenticate(email=email, password=password)
+            user = bounded_authenticate(email=email, password=password)
             if not user:
                 raise serializers.ValidationError('Invalid credentials')
             if not user.is_active:
@@ -38,9 +45,45 @@ class UserLoginSerializer(serializers.Serializer):
             attrs['user'] = user
         return attrs
 
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Rotating refresh in one transaction: the user is loaded once and shared by
+    the active check and the blacklist write, and the new token is not written
+    at all (see accounts.tokens).
+    """
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if user_id and (user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user)):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            try:
+                with transaction.atomic():
+                    if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                        refresh.blacklist(user)
+                    refresh.set_jti()
+                    refresh.set_exp()
+                    refresh.set_iat()
+                    refresh.outstand(user)
+            except IntegrityError:
+                # A concurrent request rotated the same token first
+                raise TokenError('Token is blacklisted')
+            data['refresh'] = str(refresh)
+
+        if user is not None:
+            warm_user_later(user)
+
+        return data
+
 class UserProfileSerializer(serializers.ModelSerializer):
-    followers_count = serializers.ReadOnlyField()
-    following_count = serializers.ReadOnlyField()
+    followers_count = serializers.SerializerMethodField()
+    following_count = serializers.SerializerMethodField()
     is_following = serializers.SerializerMethodField()
 
     class Meta:
@@ -50,10 +93,20 @@ class UserProfileSerializer(serializers.ModelSerializer):
                  'created_at')
         read_only_fields = ('email', 'created_at')
 
+    def get_followers_count(self, obj):
+        return get_follow_counts(obj.id)[0]
+
+    def get_following_count(self, obj):
+        return get_follow_counts(obj.id)[1]
+
     def get_is_following(self, obj):
+        # Callers that already loaded the viewer's follow set pass it in the context
+        following_ids = self.context.get('following_ids')
+        if following_ids is not None:
+            return obj.id in following_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Follow.objects.filter(follower=request.user, following=obj).exists()
+            return obj.id in get_following_ids(request.user.id)
         return False
 
 class FollowSerializer(serializers.ModelSerializer):
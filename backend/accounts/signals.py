@@ -1,14 +1,17 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .cache import invalidate_follow
 from .models import Follow
 
 @receiver(post_save, sender=Follow)
 def create_follow_notification_signal(sender, instance, created, **kwargs):
     if created:
+        invalidate_follow(instance.follower_id, instance.following_id)
         from notifications.utils import create_follow_notification
         create_follow_notification(instance.follower, instance.following)
 
 @receiver(post_delete, sender=Follow)
 def remove_follow_notification_signal(sender, instance, **kwargs):
+    invalidate_follow(instance.follower_id, instance.following_id)
     from notifications.utils import remove_follow_notification
     remove_follow_notification(instance.follower, instance.following)
\ No newline at end of file
@@ -0,0 +1,283 @@
+import io
+import json
+import os
+import stat
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from accounts import auth
+from accounts.export import iter_ndjson
+from accounts.cache import get_follow_counts, get_user, user_key
+from accounts.purge import purge_user, soft_delete_user
+from accounts.models import User, Follow
+from core.models import Job
+from notifications.cache import get_unread_count
+from notifications.models import Notification
+from notifications.utils import create_notification
+from posts import likes_index, read_model
+from posts.models import ImportedPost, Mention, Post, Like, Comment, FeedItem
+
+
+class TokenTests(TestCase):
+    def setUp(self):
+        cache.clear()  # Throttle counters
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.client = APIClient()
+
+    def _login(self):
+        response = self.client.post('/api/auth/login/', {'email': 'alice@example.com', 'password': 'pw-secret-123'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_login_writes_no_token_row(self):
+        with self.assertNumQueries(3):  # The user and their two follow counts
+            self._login()
+        self.assertFalse(OutstandingToken.objects.exists())
+
+    def test_rotation_blacklists_the_old_token_once(self):
+        refresh = self._login()['refresh']
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['refresh'], refresh)
+        self.assertEqual(BlacklistedToken.objects.get().token.user, self.user)
+
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_rotated_token_can_be_rotated_again(self):
+        refresh = self._login()['refresh']
+        for _ in range(2):
+            response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh})
+            self.assertEqual(response.status_code, 200)
+            refresh = response.json()['refresh']
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+    def test_refresh_has_its_own_bucket(self):
+        with self.settings(THROTTLE_RATES={**settings.THROTTLE_RATES, 'auth': '1/min', 'refresh': '2/min'}):
+            refresh = self._login()['refresh']
+            for _ in range(2):
+                response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh})
+                self.assertEqual(response.status_code, 200)
+                refresh = response.json()['refresh']
+            self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': refresh}).status_code, 429)
+            response = self.client.post('/api/auth/login/', {'email': 'alice@example.com', 'password': 'pw-secret-123'})
+            self.assertEqual(response.status_code, 429)
+
+
+class BoundedAuthenticateTests(TestCase):
+    def test_authenticates(self):
+        user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.assertEqual(auth.bounded_authenticate(email='alice@example.com', password='pw-secret-123'), user)
+
+    @override_settings(LOGIN_HASH_QUEUE_TIMEOUT=0.01)
+    def test_busy_when_every_slot_is_taken(self):
+        taken = 0
+        while auth._hashing.acquire(blocking=False):
+            taken += 1
+        try:
+            with self.assertRaises(auth.LoginBusy):
+                auth.bounded_authenticate(email='alice@example.com', password='pw-secret-123')
+        finally:
+            for _ in range(taken):
+                auth._hashing.release()
+
+
+class ImportDataTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _write(self, records):
+        path = os.path.join(self.dir.name, 'in.ndjson')
+        with open(path, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+        return path
+
+    def _import(self, records, **options):
+        out = io.StringIO()
+        call_command('import_data', self._write(records), stdout=out, **options)
+        return out.getvalue()
+
+    def test_imports_and_maps_post_ids(self):
+        author = User.objects.create_user(username='existing', email='e@example.com', password='pw-secret-123')
+        Post.objects.create(id=500, author=author, content='unrelated')
+        self._import([
+            {'type': 'user', 'username': 'u1', 'email': 'u1@example.com'},
+            {'type': 'user', 'username': 'u2', 'email': 'u2@example.com'},
+            {'type': 'follow', 'follower': 'u1', 'following': 'u2'},
+            {'type': 'post', 'id': 500, 'author': 'u2', 'content': 'hello @u1', 'created_at': '2021-01-01T00:00:00Z'},
+            {'type': 'like', 'post': 500, 'user': 'u1'},
+        ], batch_size=2)
+        self.assertEqual(Post.objects.get(id=500).content, 'unrelated')
+        post = Post.objects.get(pk=ImportedPost.objects.get(source='import', source_id='500').post_id)
+        self.assertEqual((post.author.username, post.content, post.created_at.year), ('u2', 'hello @u1', 2021))
+        self.assertTrue(Follow.objects.filter(follower__username='u1', following__username='u2').exists())
+        self.assertTrue(Like.objects.filter(post=post, user__username='u1').exists())
+        self.assertFalse(Like.objects.filter(post_id=500).exists())
+        mention = Mention.objects.get(post=post)
+        self.assertEqual((mention.user.username, mention.created_at), ('u1', post.created_at))
+        self.assertFalse(Notification.objects.exists())
+
+    def test_rerun_does_not_duplicate_posts(self):
+        records = [
+            {'type': 'user', 'username': 'u1', 'email': 'u1@example.com'},
+            {'type': 'post', 'id': 7, 'author': 'u1', 'content': 'hello'},
+        ]
+        self._import(records)
+        out = self._import(records)
+        self.assertIn('user=0, post=0, follow=0, like=0, skipped=2', out)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_invalid_records_are_skipped_and_reported(self):
+        path = self._write([
+            {'type': 'user', 'username': 'u1', 'email': 'u1@example.com'},
+            {'type': 'user', 'username': 'u2'},
+            {'type': 'post', 'id': 1, 'author': 'u1', 'content': 'hi', 'created_at': 'yesterday'},
+            {'type': 'post', 'id': 2, 'author': 'u1', 'content': 'hi', 'created_at': '2021-02-30T00:00:00Z'},
+            {'type': 'comment', 'post': 1},
+            [1, 2],
+        ])
+        with open(path, 'a') as f:
+            f.write('{not json\n')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_data', path, stdout=out, stderr=err)
+        self.assertIn('user=1, post=0, follow=0, like=0, skipped=0, invalid=6', out.getvalue())
+        self.assertEqual([line.split(':')[0] for line in err.getvalue().splitlines()],
+                         [f'Line {n}' for n in range(2, 8)])
+
+    def test_imported_follows_refresh_cached_counts(self):
+        u1 = User.objects.create_user(username='u1', email='u1@example.com', password='pw-secret-123')
+        User.objects.create_user(username='u2', email='u2@example.com', password='pw-secret-123')
+        cache.clear()
+        self.assertEqual(get_follow_counts(u1.id), (0, 0))
+        self._import([{'type': 'follow', 'follower': 'u2', 'following': 'u1'}])
+        self.assertEqual(get_follow_counts(u1.id), (1, 0))
+
+    def test_users_and_follows_import_into_non_empty_database(self):
+        User.objects.create_user(username='u1', email='u1@example.com', password='pw-secret-123')
+        out = self._import([
+            {'type': 'user', 'username': 'u1', 'email': 'u1@example.com'},
+            {'type': 'user', 'username': 'u2', 'email': 'u2@example.com'},
+            {'type': 'follow', 'follower': 'u2', 'following': 'u1'},
+        ])
+        # Counts are rows inserted: the existing user is skipped, not counted
+        self.assertIn('user=1, post=0, follow=1, like=0, skipped=1', out)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+
+    def test_admin_delete_soft_deletes_and_defers_the_purge(self):
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='pw-secret-123')
+        post = Post.objects.create(author=self.alice, content='hello')
+        self.client.force_login(admin)
+        response = self.client.post(f'/admin/accounts/user/{self.alice.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.alice.refresh_from_db()
+        self.assertIsNotNone(self.alice.deleted_at)
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+        self.assertEqual(Job.objects.get().name, 'accounts.purge_user')
+
+    def test_counts_leave_out_deleted_users(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        create_notification(self.bob, self.alice, 'follow', 'alice follows you')
+        soft_delete_user(self.alice)
+        cache.clear()
+        self.assertEqual(get_follow_counts(self.bob.id), (0, 0))
+        self.assertEqual(get_unread_count(self.bob.id), 0)
+
+    def test_purge_refreshes_counters_of_other_posts(self):
+        post = Post.objects.create(author=self.bob, content='hello')
+        Like.objects.create(post=post, user=self.alice)
+        Comment.objects.create(post=post, author=self.alice, content='hi')
+        read_model.refresh_post(post)
+        soft_delete_user(self.alice)
+        purge_user(self.alice.id)
+        self.assertEqual(FeedItem.objects.get(post=post).comments_count, 0)
+        self.assertEqual(likes_index.likes_count(post.id), 0)
+        self.assertFalse(User.objects.filter(pk=self.alice.pk).exists())
+
+
+class ProfileCacheTests(TestCase):
+    def test_cached_user_has_no_password_hash(self):
+        cache.clear()
+        user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.assertEqual(get_user('alice'), user)
+        cached = cache.get(user_key('alice'))[0]
+        self.assertNotIn(user.password, repr(cached))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user('alice').email, 'alice@example.com')
+
+    def test_missing_user_is_found_once_registered(self):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='bob', email='bob@example.com',
+                                                           password='pw-secret-123'))
+        self.assertEqual(client.get('/api/auth/users/carol/').status_code, 404)
+        response = APIClient().post('/api/auth/register/', {
+            'username': 'carol', 'email': 'carol@example.com', 'password': 'pw-secret-123',
+            'password_confirm': 'pw-secret-123', 'bio': '',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(client.get('/api/auth/users/carol/').json()['email'], 'carol@example.com')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+        post = Post.objects.create(author=self.alice, content='hello')
+        Like.objects.create(post=post, user=self.bob)
+        Comment.objects.create(post=post, author=self.alice, content='first')
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def _types(self, lines):
+        return [json.loads(line)['type'] for line in lines]
+
+    def test_ndjson_has_every_section_and_only_the_users_rows(self):
+        self.assertEqual(self._types(iter_ndjson(self.alice, chunk_size=1)),
+                         ['profile', 'posts', 'comments', 'followers', 'notifications'])
+        self.assertEqual(self._types(iter_ndjson(self.bob)), ['profile', 'likes', 'following'])
+
+    def test_view_streams_ndjson_and_zip(self):
+        response = self.client.get('/api/auth/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(self._types(lines), ['profile', 'posts', 'comments', 'followers', 'notifications'])
+
+        response = self.client.get('/api/auth/export/?output=zip')
+        self.assertIn('alice-export.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(json.loads(archive.read('posts.ndjson'))['content'], 'hello')
+        self.assertEqual(archive.read('likes.ndjson'), b'')
+
+    def test_view_needs_a_login(self):
+        self.assertEqual(APIClient().get('/api/auth/export/').status_code, 401)
+
+    def test_command_writes_a_private_unguessable_file_outside_media(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(EXPORT_ROOT=os.path.join(root, 'exports'),
+                                                                      MEDIA_ROOT=os.path.join(root, 'media')):
+            call_command('export_user_data', 'alice', output='ndjson', stdout=io.StringIO())
+            [name] = os.listdir(os.path.join(root, 'exports'))
+            self.assertFalse(os.path.exists(os.path.join(root, 'media')))
+            self.assertRegex(name, r'^alice-\d{14}-[\w-]{20,}\.ndjson$')
+            path = os.path.join(root, 'exports', name)
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            with open(path) as f:
+                self.assertEqual(self._types(f), ['profile', 'posts', 'comments', 'followers', 'notifications'])
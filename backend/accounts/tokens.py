@@ -0,0 +1,47 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+# Set on tokens that have no OutstandingToken row
+UNRECORDED_CLAIM = 'unrecorded'
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token that is only written to the database when it is
+    blacklisted. simplejwt inserts an OutstandingToken for every token it
+    issues, on each login and rotation, although only blacklisting needs the
+    row; here blacklist() creates it then. Tokens issued this way carry
+    UNRECORDED_CLAIM, so blacklist() also skips looking for a row; tokens
+    issued before may have one. The rotation also reuses the user already
+    loaded by the caller.
+    """
+    no_copy_claims = BaseRefreshToken.no_copy_claims + (UNRECORDED_CLAIM,)
+
+    @classmethod
+    def for_user(cls, user):
+        # Token.for_user: the claims without BlacklistMixin's insert
+        token = super(BlacklistMixin, cls).for_user(user)
+        token[UNRECORDED_CLAIM] = True
+        return token
+
+    def blacklist(self, user=None):
+        """Blacklist the token. Raises IntegrityError if another request recorded it first."""
+        jti = self.payload[api_settings.JTI_CLAIM]
+        token_id = None
+        if not self.payload.get(UNRECORDED_CLAIM):
+            token_id = OutstandingToken.objects.filter(jti=jti).values_list('id', flat=True).first()
+        if token_id is None:
+            token_id = OutstandingToken.objects.create(
+                user=user,
+                jti=jti,
+                token=str(self),
+                created_at=self.current_time,
+                expires_at=datetime_from_epoch(self.payload['exp']),
+            ).id
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token_id=token_id)], ignore_conflicts=True)
+
+    def outstand(self, user=None):
+        """Called on the rotated token: no row, only the claim saying so"""
+        self.payload[UNRECORDED_CLAIM] = True
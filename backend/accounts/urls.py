@@ -1,17 +1,22 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
+from core.compression import no_compression
+from core.throttling import RefreshRateThrottle
 from . import views
 
+# Responses carrying tokens are never compressed (core.compression)
 urlpatterns = [
-    path('register/', views.UserRegistrationView.as_view(), name='register'),
-    path('login/', views.UserLoginView.as_view(), name='login'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('register/', no_compression(views.UserRegistrationView.as_view()), name='register'),
+    path('login/', no_compression(views.UserLoginView.as_view()), name='login'),
+    path('token/refresh/', no_compression(TokenRefreshView.as_view(throttle_classes=[RefreshRateThrottle])),
+         name='token_refresh'),
     path('profile/', views.UserProfileView.as_view(), name='profile'),
     path('users/<str:username>/', views.UserDetailView.as_view(), name='user_detail'),
     path('follow/<str:username>/', views.follow_user, name='follow_user'),
     path('unfollow/<str:username>/', views.unfollow_user, name='unfollow_user'),
     path('users/<str:username>/followers/', views.FollowersListView.as_view(), name='followers'),
     path('users/<str:username>/following/', views.FollowingListView.as_view(), name='following'),
-    path('users/', views.AllUsersListView.as_view(), name='all-users')
+    path('users/', views.AllUsersListView.as_view(), name='all-users'),
+    path('export/', views.export_user_data, name='export_user_data'),
   
 ]
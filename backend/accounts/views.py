@@ -1,11 +1,21 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.http import Http404, StreamingHttpResponse
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from .cache import get_user, invalidate_user
+from .export import iter_ndjson, iter_zip
 from .models import User, Follow
+from .purge import soft_delete_user
+from .tokens import RefreshToken
+from core.jobs import defer
+from core.outbox import emit
+from core.rendering import StreamingListMixin
+from core.throttling import AuthRateThrottle, FollowRateThrottle
+from core.warming import warm_user_later
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer,
     UserProfileSerializer, FollowSerializer
@@ -18,6 +28,7 @@ class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -34,12 +45,14 @@ class UserRegistrationView(generics.CreateAPIView):
 class UserLoginView(generics.GenericAPIView):
     serializer_class = UserLoginSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         refresh = RefreshToken.for_user(user)
+        warm_user_later(user)
         return Response({
             'user': UserProfileSerializer(user).data,
             'refresh': str(refresh),
@@ -47,7 +60,7 @@ class UserLoginView(generics.GenericAPIView):
         })
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
@@ -55,6 +68,17 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def perform_update(self, serializer):
+        old_username = serializer.instance.username
+        with transaction.atomic():
+            user = serializer.save()
+            # Post authors are rendered from snapshots in the feed items
+            defer('posts.refresh_author', user_id=user.id)
+        invalidate_user(old_username, user.username)
+
+    def perform_destroy(self, instance):
+        soft_delete_user(instance)
+
 
 class UserDetailView(generics.RetrieveAPIView):
     serializer_class = UserProfileSerializer
@@ -63,20 +87,31 @@ class UserDetailView(generics.RetrieveAPIView):
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        return User.objects.all()
+        return User.objects.filter(deleted_at__isnull=True)
+
+    def get_object(self):
+        # Reads of hot profiles share one cached, single-flight lookup
+        user = get_user(self.kwargs['username'])
+        if user is None:
+            raise Http404
+        return user
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @authentication_classes([JWTAuthentication])
+@throttle_classes([FollowRateThrottle])
 def follow_user(request, username):
-    target_user = get_object_or_404(User, username=username)
+    target_user = get_object_or_404(User, username=username, deleted_at__isnull=True)
     if target_user == request.user:
         return Response({'error': 'Cannot follow yourself'},status=status.HTTP_400_BAD_REQUEST)
 
-    follow, created = Follow.objects.get_or_create(
-        follower=request.user, following=target_user
-    )
+    with transaction.atomic():
+        follow, created = Follow.objects.get_or_create(
+            follower=request.user, following=target_user
+        )
+        if created:
+            emit('follow.created', request.user.id, {'follower_id': request.user.id, 'following_id': target_user.id})
 
     message = 'User followed successfully' if created else 'Already following this user'
 
@@ -90,11 +125,14 @@ def follow_user(request, username):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @authentication_classes([JWTAuthentication])
+@throttle_classes([FollowRateThrottle])
 def unfollow_user(request, username):
-    target_user = get_object_or_404(User, username=username)
+    target_user = get_object_or_404(User, username=username, deleted_at__isnull=True)
 
     try:
-        Follow.objects.get(follower=request.user, following=target_user).delete()
+        with transaction.atomic():
+            Follow.objects.get(follower=request.user, following=target_user).delete()
+            emit('follow.deleted', request.user.id, {'follower_id': request.user.id, 'following_id': target_user.id})
 
         return Response({
             'message': 'User unfollowed successfully',
@@ -106,31 +144,51 @@ def unfollow_user(request, username):
                         status=status.HTTP_400_BAD_REQUEST)
 
 
-class FollowersListView(generics.ListAPIView):
+class FollowersListView(StreamingListMixin, generics.ListAPIView):
     serializer_class = FollowSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        user = get_object_or_404(User, username=self.kwargs['username'])
-        return Follow.objects.filter(following=user).select_related('follower', 'following')
+        user = get_object_or_404(User, username=self.kwargs['username'], deleted_at__isnull=True)
+        return Follow.objects.filter(
+            following=user, follower__deleted_at__isnull=True
+        ).select_related('follower', 'following')
 
 
-class FollowingListView(generics.ListAPIView):
+class FollowingListView(StreamingListMixin, generics.ListAPIView):
     serializer_class = FollowSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        user = get_object_or_404(User, username=self.kwargs['username'])
-        return Follow.objects.filter(follower=user).select_related('follower', 'following')
+        user = get_object_or_404(User, username=self.kwargs['username'], deleted_at__isnull=True)
+        return Follow.objects.filter(
+            follower=user, following__deleted_at__isnull=True
+        ).select_related('follower', 'following')
 
 
-class AllUsersListView(generics.ListAPIView):
+class AllUsersListView(StreamingListMixin, generics.ListAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        return User.objects.exclude(id=self.request.user.id).order_by('username')
+        return User.objects.filter(deleted_at__isnull=True).exclude(id=self.request.user.id).order_by('username')
+
 
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def export_user_data(request):
+    """Stream the current user's data as NDJSON, or as a zip archive with ?output=zip"""
+    if request.query_params.get('output') == 'zip':
+        response = StreamingHttpResponse(iter_zip(request.user), content_type='application/zip')
+        filename = f'{request.user.username}-export.zip'
+    else:
+        response = StreamingHttpResponse(iter_ndjson(request.user), content_type='application/x-ndjson')
+        filename = f'{request.user.username}-export.ndjson'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from core.jobs import job
+from .rollups import prune_hourly, roll_up
+
+
+@job('analytics.rollup', schedule=timedelta(minutes=1), concurrency=1)
+def rollup():
+    roll_up()
+
+
+@job('analytics.prune_hourly', schedule=timedelta(days=1), concurrency=1)
+def prune():
+    prune_hourly()
@@ -0,0 +1,40 @@
+from django.db import models
+
+PERIODS = [('hour', 'Hour'), ('day', 'Day')]
+
+
+class PostRollup(models.Model):
+    """Engagement with one post in one hour or day, built by analytics.rollups from the change feed"""
+    # Plain ids: posts live on their shards, rollups on `default`
+    post_id = models.BigIntegerField()
+    author_id = models.BigIntegerField()
+    period = models.CharField(max_length=4, choices=PERIODS)
+    bucket = models.DateTimeField()
+    # Net changes in the bucket: likes and comments removed count against it
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post_id', 'period', 'bucket'], name='analytics_post_rollup_unique'),
+        ]
+        indexes = [
+            # An author's top posts over a range
+            models.Index(fields=['author_id', 'period', 'bucket']),
+        ]
+
+
+class AuthorRollup(models.Model):
+    """Engagement with everything by one author in one hour or day"""
+    author_id = models.BigIntegerField()
+    period = models.CharField(max_length=4, choices=PERIODS)
+    bucket = models.DateTimeField()
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    new_followers = models.IntegerField(default=0)
+    lost_followers = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['author_id', 'period', 'bucket'], name='analytics_author_rollup_unique'),
+        ]
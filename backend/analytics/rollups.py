@@ -0,0 +1,113 @@
+"""
+Hourly and daily engagement rollups, kept incrementally from the change feed.
+
+The analytics.rollup job reads the outbox (core.outbox) from the
+`analytics` consumer's checkpoint, so each run only sees events written
+since the previous one. It folds them into per-post and per-author
+counters. The counter updates commit in the same transaction as the
+checkpoint, so every event is counted exactly once. Reads (analytics.views)
+touch only these tables, so their cost depends on the range asked for and
+not on how much history there is.
+
+Events are bucketed by when they were written, except those of bulk
+changes replaying history (import_data), whose payload carries the time of
+the original action as `occurred_at`. Purges emit the deletions they make,
+so removed likes, comments and follows count against the buckets they
+happen in, like any other.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.db import delete_in_batches
+from core.outbox import Consumer
+from core.sharding import group_by_shard, shard_for_id
+from posts.models import Post
+from .models import AuthorRollup, PostRollup
+
+CONSUMER = 'analytics'
+PERIODS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+# topic: (counter, change)
+POST_TOPICS = {
+    'like.created': ('likes', 1),
+    'like.deleted': ('likes', -1),
+    'comment.created': ('comments', 1),
+    'comment.deleted': ('comments', -1),
+}
+FOLLOW_TOPICS = {
+    'follow.created': 'new_followers',
+    'follow.deleted': 'lost_followers',
+}
+
+
+def truncate(at, period):
+    at = at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0) if period == 'day' else at
+
+
+def _post_authors(events):
+    """{post_id: author_id} for post events written before their payload carried the author"""
+    missing = {event.payload['post_id'] for event in events
+               if event.topic in POST_TOPICS and 'post_author_id' not in event.payload}
+    authors = {}
+    for alias, post_ids in group_by_shard(missing, shard_for_id).items():
+        authors.update(Post.objects.using(alias).filter(id__in=post_ids).values_list('id', 'author_id'))
+    return authors
+
+
+def fold(events):
+    """Counter deltas of a batch: {(post_id or None, author_id, period, bucket): Counter}"""
+    authors = _post_authors(events)
+    deltas = defaultdict(Counter)
+    for event in events:
+        payload = event.payload
+        if event.topic in POST_TOPICS:
+            field, change = POST_TOPICS[event.topic]
+            post_id = payload['post_id']
+            author_id = payload.get('post_author_id', authors.get(post_id))
+            if author_id is None:
+                continue  # The post is gone
+        elif event.topic in FOLLOW_TOPICS:
+            field, change, post_id, author_id = FOLLOW_TOPICS[event.topic], 1, None, payload['following_id']
+        else:
+            continue
+        at = parse_datetime(payload['occurred_at']) if 'occurred_at' in payload else event.created_at
+        for period in PERIODS:
+            bucket = truncate(at, period)
+            if post_id is not None:
+                deltas[post_id, author_id, period, bucket][field] += change
+            deltas[None, author_id, period, bucket][field] += change
+    return deltas
+
+
+def apply(deltas):
+    for (post_id, author_id, period, bucket), counts in deltas.items():
+        counts = {field: change for field, change in counts.items() if change}
+        if not counts:
+            continue
+        if post_id is None:
+            rows = AuthorRollup.objects.filter(author_id=author_id, period=period, bucket=bucket)
+            model, key = AuthorRollup, {'author_id': author_id}
+        else:
+            rows = PostRollup.objects.filter(post_id=post_id, period=period, bucket=bucket)
+            model, key = PostRollup, {'post_id': post_id, 'author_id': author_id}
+        # The consumer's checkpoint lock makes this the only writer, so update-then-create is safe
+        if not rows.update(**{field: F(field) + change for field, change in counts.items()}):
+            model.objects.create(period=period, bucket=bucket, **key, **counts)
+
+
+def roll_up(max_batches=None):
+    """Fold the events written since the last run into the rollups. Returns the number of events read."""
+    return Consumer(CONSUMER, settings.ANALYTICS_BATCH_SIZE).consume(lambda events: apply(fold(events)),
+                                                                     max_batches)
+
+
+def prune_hourly():
+    cutoff = timezone.now() - timedelta(days=settings.ANALYTICS_HOURLY_RETENTION_DAYS)
+    delete_in_batches(PostRollup.objects.filter(period='hour', bucket__lt=cutoff))
+    delete_in_batches(AuthorRollup.objects.filter(period='hour', bucket__lt=cutoff))
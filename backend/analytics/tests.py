@@ -0,0 +1,164 @@
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from accounts.purge import purge_user
+from core.models import OutboxEvent
+from posts.models import Post
+from posts.purge import purge_post, soft_delete_post
+from analytics import jobs
+from analytics.models import AuthorRollup, PostRollup
+from analytics.rollups import roll_up, truncate
+
+
+def _counts(model, period='day', **key):
+    """Net counters of the matching rollups, summed over buckets"""
+    fields = ('likes', 'comments') if model is PostRollup else ('likes', 'comments', 'new_followers', 'lost_followers')
+    rows = model.objects.filter(period=period, **key).values(*fields)
+    return {field: sum(row[field] for row in rows) for field in fields}
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+        self.post = Post.objects.create(author=self.alice, content='hello')
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def _engage(self):
+        self.client.post(f'/api/posts/{self.post.id}/like/')
+        self.client.post(f'/api/posts/{self.post.id}/comments/', {'content': 'nice'})
+        self.client.post('/api/auth/follow/alice/')
+
+    def test_counts_what_the_api_records(self):
+        self._engage()
+        self.client.post(f'/api/posts/{self.post.id}/unlike/')
+        self.client.post(f'/api/posts/{self.post.id}/like/')
+        self.assertEqual(roll_up(), 5)
+        self.assertEqual(roll_up(), 0)  # Each event is counted once
+        self.assertEqual(_counts(PostRollup, post_id=self.post.id), {'likes': 1, 'comments': 1})
+        for period in ('hour', 'day'):
+            self.assertEqual(_counts(AuthorRollup, period, author_id=self.alice.id),
+                             {'likes': 1, 'comments': 1, 'new_followers': 1, 'lost_followers': 0})
+
+    def test_purging_a_user_takes_back_what_they_did(self):
+        self._engage()
+        roll_up()
+        purge_user(self.bob.id)
+        roll_up()
+        self.assertEqual(_counts(PostRollup, post_id=self.post.id), {'likes': 0, 'comments': 0})
+        self.assertEqual(_counts(AuthorRollup, author_id=self.alice.id),
+                         {'likes': 0, 'comments': 0, 'new_followers': 1, 'lost_followers': 1})
+
+    def test_purging_a_post_takes_back_its_likes_and_comments(self):
+        self._engage()
+        roll_up()
+        soft_delete_post(self.post)
+        purge_post(self.post.id)
+        roll_up()
+        self.assertEqual(_counts(AuthorRollup, author_id=self.alice.id),
+                         {'likes': 0, 'comments': 0, 'new_followers': 1, 'lost_followers': 0})
+        # Only the soft delete announced the post's deletion
+        self.assertEqual(OutboxEvent.objects.filter(topic='post.deleted').count(), 1)
+
+    def test_purging_an_author_deletes_their_posts(self):
+        purge_user(self.alice.id)
+        self.assertEqual(list(OutboxEvent.objects.filter(topic='post.deleted').values_list('aggregate_id', flat=True)),
+                         [self.post.id])
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _import(self, records, **options):
+        path = os.path.join(self.dir.name, 'in.ndjson')
+        with open(path, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+        call_command('import_data', path, stdout=io.StringIO(), **options)
+
+    def test_imports_are_counted_when_they_happened(self):
+        then = timezone.now() - timedelta(days=3)
+        records = [
+            {'type': 'user', 'username': 'u1', 'email': 'u1@example.com'},
+            {'type': 'user', 'username': 'u2', 'email': 'u2@example.com'},
+            {'type': 'follow', 'follower': 'u1', 'following': 'u2', 'created_at': then.isoformat()},
+            {'type': 'post', 'id': 1, 'author': 'u2', 'content': 'hello', 'created_at': then.isoformat()},
+            {'type': 'like', 'post': 1, 'user': 'u1', 'created_at': then.isoformat()},
+            {'type': 'like', 'post': 1, 'user': 'u1', 'created_at': then.isoformat()},
+        ]
+        self._import(records)
+        self._import(records, restart=True)  # Nothing new the second time, so no events either
+        roll_up()
+        u2 = User.objects.get(username='u2')
+        self.assertEqual(list(AuthorRollup.objects.filter(author_id=u2.id, period='day')
+                              .values_list('bucket', 'likes', 'new_followers')),
+                         [(truncate(then, 'day'), 1, 1)])
+        self.assertEqual(OutboxEvent.objects.filter(topic='post.created').count(), 1)
+
+
+class InsightsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+        self.post = Post.objects.create(author=self.alice, content='hello')
+        self.other = Post.objects.create(author=self.alice, content='again')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.today = truncate(timezone.now(), 'day')
+
+    def _rollups(self, post, days_ago, likes, comments=0, period='day'):
+        bucket = self.today - timedelta(days=days_ago)
+        PostRollup.objects.create(post_id=post.id, author_id=post.author_id, period=period, bucket=bucket,
+                                  likes=likes, comments=comments)
+        AuthorRollup.objects.create(author_id=post.author_id, period=period, bucket=bucket,
+                                    likes=likes, comments=comments)
+
+    def test_author_insights(self):
+        self._rollups(self.post, 0, likes=2)
+        self._rollups(self.other, 3, likes=5, comments=1)
+        self._rollups(self.other, 10, likes=100)  # Before the window
+        response = self.client.get('/api/analytics/insights/?days=7')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['totals'], {'likes': 7, 'comments': 1, 'new_followers': 0, 'lost_followers': 0})
+        self.assertEqual([entry['likes'] for entry in data['series']], [0, 0, 0, 5, 0, 0, 2])
+        self.assertEqual([(top['post_id'], top['likes']) for top in data['top_posts']],
+                         [(self.other.id, 5), (self.post.id, 2)])
+
+    def test_post_insights(self):
+        self._rollups(self.post, 1, likes=3, comments=2)
+        data = self.client.get(f'/api/analytics/posts/{self.post.id}/?days=2').json()
+        self.assertEqual(data['totals'], {'likes': 3, 'comments': 2})
+        self.assertEqual(len(data['series']), 2)
+
+        bobs = Post.objects.create(author=self.bob, content='mine')
+        self.assertEqual(self.client.get(f'/api/analytics/posts/{bobs.id}/').status_code, 404)
+
+    def test_rejects_bad_windows(self):
+        for query in ('period=week', 'days=x', 'days=0', 'days=400', 'period=hour&days=30'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/analytics/insights/?{query}').status_code, 400)
+
+    def test_prune_drops_only_old_hourly_rollups(self):
+        with self.settings(ANALYTICS_HOURLY_RETENTION_DAYS=14):
+            self._rollups(self.post, 20, likes=1, period='hour')
+            self._rollups(self.post, 1, likes=1, period='hour')
+            self._rollups(self.post, 20, likes=1)
+            jobs.prune()
+        self.assertEqual(sorted(PostRollup.objects.values_list('period', 'bucket')),
+                         [('day', self.today - timedelta(days=20)), ('hour', self.today - timedelta(days=1))])
+        self.assertEqual(AuthorRollup.objects.count(), 2)
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('insights/', views.author_insights, name='author_insights'),
+    path('posts/<int:post_id>/', views.post_insights, name='post_insights'),
+]
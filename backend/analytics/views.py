@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from posts.models import Post
+from .models import AuthorRollup, PostRollup
+from .rollups import PERIODS, truncate
+
+AUTHOR_FIELDS = ('likes', 'comments', 'new_followers', 'lost_followers')
+POST_FIELDS = ('likes', 'comments')
+TOP_POSTS = 10
+
+
+def _window(request):
+    """(period, first bucket, error) from ?period=hour|day (default day) and ?days="""
+    period = request.query_params.get('period', 'day')
+    if period not in PERIODS:
+        return None, None, 'period must be hour or day'
+    max_days = settings.ANALYTICS_HOURLY_RETENTION_DAYS if period == 'hour' else settings.ANALYTICS_MAX_DAYS
+    try:
+        days = int(request.query_params.get('days', 1 if period == 'hour' else 30))
+    except ValueError:
+        return None, None, 'days must be a number'
+    if not 1 <= days <= max_days:
+        return None, None, f'days must be between 1 and {max_days}'
+    now = truncate(timezone.now(), period)
+    return period, now - days * PERIODS['day'] + PERIODS[period], None
+
+
+def _series(rows, fields, period, since):
+    """One entry per bucket from `since` to now, zeros where nothing happened"""
+    by_bucket = {row['bucket']: row for row in rows}
+    series, bucket, last = [], since, truncate(timezone.now(), period)
+    while bucket <= last:
+        row = by_bucket.get(bucket, {})
+        series.append({'bucket': bucket, **{field: row.get(field, 0) for field in fields}})
+        bucket += PERIODS[period]
+    return series
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def author_insights(request):
+    """The current user's likes, comments and follower changes per hour or day, and their top posts"""
+    period, since, error = _window(request)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = list(AuthorRollup.objects.filter(author_id=request.user.id, period=period, bucket__gte=since)
+                .values('bucket', *AUTHOR_FIELDS))
+    top_posts = (PostRollup.objects.filter(author_id=request.user.id, period=period, bucket__gte=since)
+                 .values('post_id').annotate(likes=Sum('likes'), comments=Sum('comments'))
+                 .order_by('-likes', '-comments', '-post_id')[:TOP_POSTS])
+    return Response({
+        'period': period,
+        'since': since,
+        'totals': {field: sum(row[field] for row in rows) for field in AUTHOR_FIELDS},
+        'series': _series(rows, AUTHOR_FIELDS, period, since),
+        'top_posts': list(top_posts),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def post_insights(request, post_id):
+    """Likes and comments per hour or day on one of the current user's posts"""
+    if not Post.objects.for_id(post_id).filter(pk=post_id, author_id=request.user.id).exists():
+        return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
+    period, since, error = _window(request)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = list(PostRollup.objects.filter(post_id=post_id, period=period, bucket__gte=since)
+                .values('bucket', *POST_FIELDS))
+    return Response({
+        'post_id': post_id,
+        'period': period,
+        'since': since,
+        'totals': {field: sum(row[field] for row in rows) for field in POST_FIELDS},
+        'series': _series(rows, POST_FIELDS, period, since),
+    })
@@ -0,0 +1,10 @@
+"""
+The admin's URLs. config.urls mounts this module lazily, so the admin's
+modules are discovered and its URLs built on the first /admin/ request
+rather than by every worker at startup.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
@@ -31,7 +31,8 @@ DEBUG = config('DEBUG', default=False, cast=bool)
 
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Without autodiscover() at startup: config.admin_urls runs it on first use
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -43,9 +44,11 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt.token_blacklist",
     'corsheaders',
     #################################
+    "core",
     "posts",
     "accounts",
-    "notifications"
+    "notifications",
+    "analytics",
 ]
 
 
@@ -54,7 +57,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'AUTH_HEADER_TYPES': ('Bearer',)
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.TokenRefreshSerializer',
 }
 
 REST_FRAMEWORK = {
@@ -72,8 +76,36 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Token-bucket rates for core.throttling, as 'burst/period'. Kept outside
+# REST_FRAMEWORK because api_settings is already loaded by the time that dict
+# is defined (see the rest_framework import at the top of this file).
+THROTTLE_RATES = {
+    'ip_writes': config('THROTTLE_RATE_IP_WRITES', default='120/min'),
+    'likes': config('THROTTLE_RATE_LIKES', default='60/min'),
+    'follows': config('THROTTLE_RATE_FOLLOWS', default='30/min'),
+    'auth': config('THROTTLE_RATE_AUTH', default='10/min'),
+    # Every open tab refreshes its access token, so refreshes get their own, roomier bucket
+    'refresh': config('THROTTLE_RATE_REFRESH', default='60/min'),
+}
+# Reverse proxies in front of the app that append to X-Forwarded-For; per-IP
+# limits use the address the outermost one saw. 0 uses REMOTE_ADDR, since the
+# header can then be set by anyone. Behind a proxy this must be set (the
+# Dockerfile sets 1), or every client shares the proxy's per-IP buckets.
+THROTTLE_NUM_PROXIES = config('THROTTLE_NUM_PROXIES', default=0, cast=int)
+
+# Throttle counters live here; point it at a shared cache (e.g. Redis or
+# Memcached) in production so limits hold across workers.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.compression.CompressionMiddleware',
+    'core.throttling.WriteRateLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +113,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -118,6 +151,49 @@ DATABASES = {
     }
 }
 
+# Sharding (core.sharding): posts with their comments, likes and mentions are
+# placed on a shard picked from the author's id, notifications on one picked
+# from the recipient's. `default` is always the first shard and keeps
+# everything else. SHARD_DATABASES lists extra shard aliases; each one is a
+# database named <DB_NAME>_<alias> on the same server unless
+# <ALIAS>_DB_NAME / <ALIAS>_DB_HOST say otherwise. Run `migrate
+# --database=<alias>` for every shard, then `reshard` when setting or changing
+# SHARD_DATABASES on a database that has data. SQLITE_DIR puts every database in a
+# SQLite file in that directory, for trying shards out locally.
+SHARD_DATABASES = config('SHARD_DATABASES', default='', cast=Csv())
+SHARDS = ['default'] + SHARD_DATABASES
+for alias in SHARD_DATABASES:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': config(f'{alias.upper()}_DB_NAME', default=f"{DATABASES['default']['NAME']}_{alias}"),
+        'HOST': config(f'{alias.upper()}_DB_HOST', default=DATABASES['default']['HOST']),
+    }
+SQLITE_DIR = config('SQLITE_DIR', default='')
+if SQLITE_DIR:
+    DATABASES = {
+        alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(SQLITE_DIR, f'{alias}.sqlite3')}
+        for alias in SHARDS
+    }
+DATABASE_ROUTERS = ['core.sharding.ShardRouter']
+
+
+# Password hashing. The first hasher encodes new passwords; the others only
+# verify legacy hashes, which are re-encoded on the next successful login.
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=1_000_000, cast=int)
+
+# Login hashing is bounded per process (accounts.auth): at most
+# LOGIN_HASH_WORKERS run at once, LOGIN_HASH_QUEUE more may wait up to
+# LOGIN_HASH_QUEUE_TIMEOUT seconds, and the rest get a 503.
+LOGIN_HASH_WORKERS = config('LOGIN_HASH_WORKERS', default=os.cpu_count() or 1, cast=int)
+LOGIN_HASH_QUEUE = config('LOGIN_HASH_QUEUE', default=32, cast=int)
+LOGIN_HASH_QUEUE_TIMEOUT = config('LOGIN_HASH_QUEUE_TIMEOUT', default=5, cast=float)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#spassword-validators
@@ -166,3 +242,106 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Where `manage.py export_user_data` writes exports. Never under MEDIA_ROOT,
+# which is served to anyone: an export is a user's private data.
+EXPORT_ROOT = config('EXPORT_ROOT', default=os.path.join(BASE_DIR, 'exports'))
+
+# Uploads are stored under content-hashed names (core.storage) and served by
+# core.media. MEDIA_ACCEL hands the bytes to the front server: 'x-accel-redirect'
+# (nginx, internal location MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or
+# 'x-sendfile' (Apache/lighttpd); empty streams them from Django.
+STORAGES = {
+    'default': {'BACKEND': config('MEDIA_STORAGE', default='core.storage.HashedFileSystemStorage')},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_ACCEL = config('MEDIA_ACCEL', default='')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+MEDIA_MAX_AGE = 365 * 24 * 60 * 60
+# The upload_to directories of the models' file fields: the only ones core.media serves
+MEDIA_UPLOAD_DIRS = ('posts', 'profiles')
+MEDIA_LEGACY_MAX_AGE = 60 * 60
+
+
+# Threads per process for running independent queries of one request in parallel
+FANOUT_WORKERS = config('FANOUT_WORKERS', default=4, cast=int)
+
+# Read-through cache for hot objects (core.cache): entry lifetime and how long
+# one process may hold the refresh lock for a key
+READ_CACHE_TTL = config('READ_CACHE_TTL', default=60, cast=int)
+READ_CACHE_LOCK_TIMEOUT = config('READ_CACHE_LOCK_TIMEOUT', default=10, cast=int)
+
+# Seconds a post's cached like array (posts.likes_index) lives before it is rebuilt from the Like table,
+# seconds the post's update lock or a STALE lease lasts at most (longer than a load takes), and the most
+# likers kept in an array (8 bytes each: 50000 stay well under memcached's 1 MB item limit)
+LIKE_INDEX_TTL = config('LIKE_INDEX_TTL', default=6 * 60 * 60, cast=int)
+LIKE_INDEX_LEASE = config('LIKE_INDEX_LEASE', default=2, cast=int)
+LIKE_INDEX_MAX_IDS = config('LIKE_INDEX_MAX_IDS', default=50000, cast=int)
+
+# Sampling profiler (core.profiling): fraction of requests profiled, seconds
+# between stack samples, the header staff can send to profile one request,
+# how many distinct stacks and bytes of them each view's profile keeps per
+# process (under the cache's item size limit), how long it is kept, and how
+# many processes can store profiles at once
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+PROFILE_INTERVAL = config('PROFILE_INTERVAL', default=0.005, cast=float)
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MAX_STACKS = config('PROFILE_MAX_STACKS', default=2000, cast=int)
+PROFILE_MAX_BYTES = config('PROFILE_MAX_BYTES', default=256 * 1024, cast=int)
+PROFILE_TTL = config('PROFILE_TTL', default=24 * 60 * 60, cast=int)
+PROFILE_SLOTS = config('PROFILE_SLOTS', default=64, cast=int)
+
+# Cache warming (core.warming, `manage.py warm_cache`): background threads per
+# process for warming after login/token refresh (also the command's default
+# concurrency), how often one user is warmed lazily, the feed page size and
+# how recently a user must have been seen for the deploy-time warm-up
+WARM_WORKERS = config('WARM_WORKERS', default=2, cast=int)
+WARM_COOLDOWN = config('WARM_COOLDOWN', default=5 * 60, cast=int)
+WARM_FEED_SIZE = 20
+WARM_ACTIVE_DAYS = config('WARM_ACTIVE_DAYS', default=7, cast=int)
+
+# Response encoding (core.compression): encodings in order of preference (those
+# whose library is not installed are skipped), the smallest body worth
+# compressing, compressible content types and levels. List endpoints stream
+# JSON arrays (core.rendering) once they exceed one chunk of rows.
+COMPRESSION_ENCODINGS = config('COMPRESSION_ENCODINGS', default='zstd,br,gzip', cast=Csv())
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_TYPES = ('application/json', 'application/x-ndjson', 'text/', 'application/javascript', 'image/svg+xml')
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_ZSTD_LEVEL = 3
+STREAM_LISTS = config('STREAM_LISTS', default=True, cast=bool)
+STREAM_CHUNK_SIZE = config('STREAM_CHUNK_SIZE', default=100, cast=int)
+
+# Engagement rollups (analytics): change-feed events folded per run of the
+# analytics.rollup job, how long hourly buckets are kept (daily ones are kept)
+# and the longest range the insights endpoints answer
+ANALYTICS_BATCH_SIZE = config('ANALYTICS_BATCH_SIZE', default=1000, cast=int)
+ANALYTICS_HOURLY_RETENTION_DAYS = config('ANALYTICS_HOURLY_RETENTION_DAYS', default=14, cast=int)
+ANALYTICS_MAX_DAYS = 365
+
+# Worker startup (core.startup): whether config.wsgi preloads URLs,
+# serializers, backends and connections, and the milliseconds bench_startup
+# allows a fresh process to load the app and answer its first request
+STARTUP_PRELOAD = config('STARTUP_PRELOAD', default=True, cast=bool)
+STARTUP_BUDGET_MS = config('STARTUP_BUDGET_MS', default=1000, cast=int)
+
+# Job runner (core.jobs, `manage.py run_jobs`): seconds without a heartbeat before a job whose
+# worker vanished is retried, base retry backoff, and days finished jobs are kept
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=15 * 60, cast=int)
+JOB_RETRY_DELAY = config('JOB_RETRY_DELAY', default=30, cast=int)
+JOB_RETENTION_DAYS = config('JOB_RETENTION_DAYS', default=7, cast=int)
+
+# Outbox / change feed (core.outbox, /api/events/): events per read, how long a
+# transaction that emits events may take to commit (gaps in the ids are read
+# again until then) and how many gaps a cursor tracks, the default and longest
+# ?wait= of the NDJSON stream, and days events are kept
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=500, cast=int)
+OUTBOX_GAP_TIMEOUT = config('OUTBOX_GAP_TIMEOUT', default=300, cast=int)
+OUTBOX_MAX_GAPS = 1000
+OUTBOX_STREAM_LIMIT = 10000
+OUTBOX_MAX_WAIT = 30
+OUTBOX_RETENTION_DAYS = config('OUTBOX_RETENTION_DAYS', default=7, cast=int)
+
+# Notifications older than this are pruned by `manage.py prune_notifications`
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=30, cast=int)
+NOTIFICATION_UNREAD_RETENTION_DAYS = config('NOTIFICATION_UNREAD_RETENTION_DAYS', default=180, cast=int)
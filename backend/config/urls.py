@@ -1,11 +1,17 @@
 from django.conf import settings
-from django.conf.urls.static import static
-from django.contrib import admin
-from django.urls import path, include
+from django.urls import URLResolver, path, include
+from django.urls.resolvers import RoutePattern
+
+from core.media import serve_media
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # include() would import the admin's URLs now; a resolver given a module
+    # path imports it when a request first reaches it (see config.admin_urls)
+    URLResolver(RoutePattern('admin/'), 'config.admin_urls', app_name='admin', namespace='admin'),
     path('api/auth/', include('accounts.urls')),
     path('api/posts/', include('posts.urls')),
     path('api/notifications/', include('notifications.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('api/analytics/', include('analytics.urls')),
+    path('api/', include('core.urls')),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
+]
@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# Only once the settings module is known: core.startup's imports read settings
+from core.startup import preload  # noqa: E402
+
 application = get_wsgi_application()
+
+# Load what the first requests would (core.startup); with gunicorn's
+# preload_app this runs once in the master, before the workers are forked
+if settings.STARTUP_PRELOAD:
+    preload()
@@ -0,0 +1,29 @@
+"""
+Admin deletes that go through the same soft delete as the API.
+
+Django's admin deletes by collecting and removing every related row in the
+request. For users and posts that is the synchronous cascade soft deletes
+exist to avoid, so SoftDeleteAdmin hides the objects and leaves their rows
+to the purge jobs, and its confirmation page lists only the objects picked.
+"""
+from django.contrib import admin
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    # staticmethod called with each object deleted; hides it and defers its purge
+    soft_delete = None
+
+    def delete_model(self, request, obj):
+        self.soft_delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
+
+    def get_deleted_objects(self, objs, request):
+        # Nothing cascades now, so there is nothing related to collect and list
+        objs = list(objs)
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, set(), []
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
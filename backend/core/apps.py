@@ -0,0 +1,12 @@
+from django.apps import AppConfig, apps
+from django.db.models.signals import pre_save
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from .sharding import ID_ALLOCATED, allocate_id
+        for label in ID_ALLOCATED:
+            pre_save.connect(allocate_id, sender=apps.get_model(label))
@@ -0,0 +1,51 @@
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .singleflight import count, flight
+
+
+def _compute(key, ttl, loader, cache_none):
+    started = time.time()
+    value = loader()
+    delta = time.time() - started
+    if value is not None or cache_none:
+        cache.set(key, (value, delta, time.time() + ttl), ttl)
+    cache.delete(f'{key}:refresh')
+    return value
+
+
+def get_or_compute(key, loader, ttl=None, beta=1.0, cache_none=True):
+    """
+    Read-through cache for hot read paths.
+
+    Misses go through the process-wide single flight, so concurrent requests
+    for the same key run `loader` once. Entries are refreshed early with
+    probability growing as they near expiry (XFetch, weighted by how long the
+    loader took), and only the process that wins a short cache lock does the
+    refresh while everyone else keeps serving the current value, so a hot key
+    expiring never sends a burst of identical queries to the database.
+    With cache_none=False a None result is returned but not cached, for
+    lookups whose answer can turn from "missing" to found at any time.
+    """
+    ttl = ttl or settings.READ_CACHE_TTL
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if time.time() - delta * beta * math.log(1 - random.random()) < expires_at:
+            count('cache_hits')
+            return value
+        if not cache.add(f'{key}:refresh', 1, settings.READ_CACHE_LOCK_TIMEOUT):
+            count('cache_stale_served')
+            return value
+        count('cache_early_refreshes')
+    else:
+        count('cache_misses')
+    return flight.do(key, lambda: _compute(key, ttl, loader, cache_none))
+
+
+def invalidate(*keys):
+    cache.delete_many(keys)
@@ -0,0 +1,177 @@
+"""
+Content-negotiated response compression (zstd, brotli, gzip).
+
+CompressionMiddleware picks the first of COMPRESSION_ENCODINGS that the
+client accepts (q > 0 in Accept-Encoding) and whose library is installed,
+and encodes compressible content types: whole responses of at least
+COMPRESSION_MIN_SIZE bytes, and streaming responses chunk by chunk, each
+chunk flushed so a streamed list or NDJSON feed reaches the client as it
+is produced.
+
+Views wrapped in no_compression() are never compressed: their bodies carry
+secrets (JWTs), and compressing a secret next to data an attacker can
+influence lets them recover it from response sizes (BREACH).
+"""
+import zlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+ENCODERS = {
+    'zstd': _Zstd if zstandard else None,
+    'br': _Brotli if brotli else None,
+    'gzip': _Gzip,
+}
+
+
+def available_encodings():
+    """COMPRESSION_ENCODINGS in order of preference, minus those whose library is missing"""
+    return [name for name in settings.COMPRESSION_ENCODINGS if ENCODERS.get(name)]
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = [p.strip() for p in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def negotiate(header):
+    """The encoding to use for a request's Accept-Encoding header, or None"""
+    accepted = accepted_encodings(header or '')
+    for name in available_encodings():
+        if accepted.get(name, accepted.get('*', 0)) > 0:
+            return name
+    return None
+
+
+def compress(data, encoding):
+    encoder = ENCODERS[encoding]()
+    return encoder.compress(data) + encoder.finish()
+
+
+def compress_stream(chunks, encoding):
+    encoder = ENCODERS[encoding]()
+    for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+def _compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return any(content_type.startswith(prefix) for prefix in settings.COMPRESSION_TYPES)
+
+
+def no_compression(view):
+    """Mark a view whose responses must go out uncompressed"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapper.no_compression = True
+    return wrapper
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'no_compression', False):
+            request._no_compression = True
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(request, '_no_compression', False) or not _compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+        # The representation changed, so a strong validator no longer matches it byte for byte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
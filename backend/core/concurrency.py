@@ -0,0 +1,30 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# Shared pool for fanning independent queries of one request out in parallel.
+# Each thread keeps its own connections between tasks, to every database it
+# used, and treats a task like the request cycle treats a request.
+_executor = ThreadPoolExecutor(max_workers=settings.FANOUT_WORKERS, thread_name_prefix='fanout')
+_local = threading.local()
+
+
+def _call(fn):
+    _local.in_pool = True
+    # Drop connections (on any alias) that broke or outlived CONN_MAX_AGE in an earlier task
+    close_old_connections()
+    try:
+        return fn()
+    finally:
+        close_old_connections()
+
+
+def run_concurrently(*fns):
+    """Call each function on the fan-out pool and return their results in order."""
+    if getattr(_local, 'in_pool', False):
+        # Already on a pool thread: waiting on the pool from here could deadlock it
+        return [fn() for fn in fns]
+    futures = [_executor.submit(_call, fn) for fn in fns]
+    return [future.result() for future in futures]
@@ -0,0 +1,15 @@
+def delete_in_batches(queryset, batch_size=1000):
+    """
+    Delete the rows of `queryset` a batch at a time with raw DELETE statements:
+    no instances are loaded, no signals fire and nothing cascades, so callers
+    must delete dependent rows first. Every batch is its own short statement,
+    which keeps lock times bounded. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        batch = model._base_manager.using(queryset.db).filter(pk__in=ids)
+        deleted += batch._raw_delete(batch.db)
@@ -0,0 +1,195 @@
+"""
+Lightweight job queue on the Job table.
+
+Apps declare jobs in a `jobs.py` module with the @job decorator and queue
+work with defer(); `manage.py run_jobs` discovers those modules, keeps
+periodic jobs scheduled and runs due jobs, claiming them with
+SELECT ... FOR UPDATE SKIP LOCKED so any number of workers can share the
+table without an external broker. A running job's locked_at is refreshed
+by a heartbeat, so only jobs whose worker died are ever released.
+"""
+import threading
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .db import delete_in_batches
+from .models import Job, JobLock, OutboxEvent
+from .sharding import shards
+from .storage import remember_hash, verified_hash
+
+
+@dataclass
+class JobSpec:
+    name: str
+    func: callable
+    schedule: timedelta = None
+    max_attempts: int = 3
+    concurrency: int = None
+
+
+registry = {}
+
+
+def job(name, schedule=None, max_attempts=3, concurrency=None):
+    """
+    Register a function as a job. `schedule` makes it periodic (it is re-queued
+    that long after each run); `concurrency` caps how many run at once across
+    all workers.
+    """
+    def decorator(func):
+        registry[name] = JobSpec(name, func, schedule, max_attempts, concurrency)
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('jobs')
+
+
+def defer(name, run_at=None, key=None, **kwargs):
+    """
+    Queue a job. Call it inside the transaction making the change the job
+    follows up on, so both commit or roll back together. With a `key`, the job
+    is dropped if one with the same key is already pending or running.
+    """
+    Job.objects.bulk_create([
+        Job(name=name, kwargs=kwargs, key=key, run_at=run_at or timezone.now())
+    ], ignore_conflicts=key is not None)
+
+
+def ensure_scheduled():
+    """Queue every periodic job that has no pending or running instance"""
+    for spec in registry.values():
+        if spec.schedule:
+            defer(spec.name, key=f'periodic:{spec.name}')
+
+
+def release_stale():
+    """Put back jobs whose worker died while running them"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(status='pending', locked_at=None)
+
+
+def _running(name):
+    return Job.objects.filter(name=name, status='running').count()
+
+
+def claim():
+    """Lock and mark the next due job as running, or return None"""
+    # A hint that skips capped jobs already at their limit; the check that counts is made under the JobLock
+    saturated = [
+        spec.name for spec in registry.values()
+        if spec.concurrency and _running(spec.name) >= spec.concurrency
+    ]
+    now = timezone.now()
+    with transaction.atomic():
+        pending = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', run_at__lte=now, name__in=list(registry))
+            .exclude(name__in=saturated)
+            .order_by('run_at')
+            .first()
+        )
+        if pending is None:
+            return None
+        spec = registry[pending.name]
+        if spec.concurrency:
+            # Claims of one job name queue up on its lock row until the claim before commits.
+            # One lock row per transaction, so two workers never wait on each other's.
+            JobLock.objects.bulk_create([JobLock(name=spec.name)], ignore_conflicts=True)
+            JobLock.objects.select_for_update().get(name=spec.name)
+            if _running(spec.name) >= spec.concurrency:
+                return None  # Filled up since the hint; the next poll skips it
+        pending.status = 'running'
+        pending.locked_at = now
+        pending.attempts += 1
+        pending.save(update_fields=['status', 'locked_at', 'attempts', 'updated_at'])
+    return pending
+
+
+class Heartbeat:
+    """Refreshes a running job's locked_at from a thread, every third of JOB_LOCK_TIMEOUT"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        try:
+            while not self.stopped.wait(settings.JOB_LOCK_TIMEOUT / 3):
+                try:
+                    Job.objects.filter(pk=self.job_id, status='running').update(locked_at=timezone.now())
+                except DatabaseError:
+                    connection.close()  # Tried again on the next beat, on a new connection
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def _schedule_next(spec, claimed):
+    if spec.schedule:
+        defer(spec.name, run_at=timezone.now() + spec.schedule, key=claimed.key or f'periodic:{spec.name}')
+
+
+def run(claimed):
+    """
+    Run a claimed job and record the outcome, retrying with backoff on
+    failure. A periodic job is queued again once it succeeds or gives up.
+    """
+    spec = registry[claimed.name]
+    try:
+        with Heartbeat(claimed.id):
+            spec.func(**claimed.kwargs)
+    except Exception:
+        claimed.last_error = traceback.format_exc()
+        if claimed.attempts < spec.max_attempts:
+            claimed.status = 'pending'
+            claimed.run_at = timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (claimed.attempts - 1))
+        else:
+            claimed.status = 'failed'
+        claimed.locked_at = None
+        claimed.save(update_fields=['status', 'run_at', 'last_error', 'locked_at', 'updated_at'])
+        if claimed.status == 'failed':
+            _schedule_next(spec, claimed)
+        return False
+
+    claimed.status = 'done'
+    claimed.locked_at = None
+    claimed.save(update_fields=['status', 'locked_at', 'updated_at'])
+    _schedule_next(spec, claimed)
+    return True
+
+
+@job('core.prune_jobs', schedule=timedelta(days=1))
+def prune_jobs():
+    cutoff = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    Job.objects.filter(status__in=['done', 'failed'], updated_at__lt=cutoff).delete()
+
+
+@job('core.prune_outbox', schedule=timedelta(days=1))
+def prune_outbox():
+    cutoff = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    for alias in shards():
+        delete_in_batches(OutboxEvent.objects.using(alias).filter(created_at__lt=cutoff))
+
+
+@job('core.verify_media_hash')
+def verify_media_hash(path):
+    """Check a hash-shaped media name against its file, for core.media to serve it as immutable if it matches"""
+    if default_storage.exists(path):
+        remember_hash(path, verified_hash(default_storage, path))
@@ -0,0 +1,108 @@
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from accounts.models import User, Follow
+from accounts.tokens import RefreshToken
+from core.compression import available_encodings
+from core.sharding import is_sharded
+from notifications.models import Notification
+from posts.models import Post
+from posts.read_model import refresh_items
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure payload size, latency and peak Python memory of the large list '
+        'endpoints (followers, feed, notifications) rendered whole and '
+        'uncompressed, as before core.compression and core.rendering, and '
+        'streamed with each available encoding. Everything runs in a transaction '
+        'that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Followers, feed posts and notifications')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed requests per case (median reported)')
+
+    def handle(self, *args, **options):
+        if is_sharded():
+            raise CommandError('bench_responses rolls back one transaction on `default`; run it without SHARDS')
+        try:
+            with transaction.atomic():
+                self._run(options['rows'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, n_rows, repeat):
+        tag = uuid.uuid4().hex[:8]
+        viewer, *users = User.objects.bulk_create([
+            User(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.invalid', password='!',
+                 bio='Benchmark account with a bio of a typical length for a profile.')
+            for i in range(n_rows + 1)
+        ])
+        Follow.objects.bulk_create([Follow(follower=user, following=viewer) for user in users]
+                                   + [Follow(follower=viewer, following=user) for user in users])
+        posts = Post.objects.bulk_create([
+            Post(author=user, content=f'Post number {i} of the response benchmark, about as long as most.')
+            for i, user in enumerate(users)
+        ])
+        refresh_items([post.id for post in posts], 'default')
+        Notification.objects.bulk_create([
+            Notification(recipient=viewer, sender=user, notification_type='follow',
+                         message=f'{user.username} ha iniziato a seguirti')
+            for user in users
+        ])
+
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(viewer).access_token}')
+        endpoints = (
+            ('followers', f'/api/auth/users/{viewer.username}/followers/'),
+            ('feed', '/api/posts/'),
+            ('notifications', '/api/notifications/'),
+        )
+        self.stdout.write(f'{n_rows} rows per list, median of {repeat} requests')
+        self.stdout.write(f'{"endpoint":<14} {"case":<16} {"bytes":>10} {"ratio":>7} {"ms":>9} {"peak KiB":>10}')
+        for name, url in endpoints:
+            with override_settings(STREAM_LISTS=False):
+                baseline = self._measure(client, url, 'identity', repeat)
+            self._report(name, 'whole, identity', baseline, baseline)
+            for encoding in ['identity'] + available_encodings():
+                self._report(name, f'stream, {encoding}', self._measure(client, url, encoding, repeat), baseline)
+
+    def _fetch(self, client, url, encoding):
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        if response.status_code != 200:
+            raise CommandError(f'GET {url}: {response.status_code}')
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return len(response.content)
+
+    def _measure(self, client, url, encoding, repeat):
+        self._fetch(client, url, encoding)  # Warm the caches the views read
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            size = self._fetch(client, url, encoding)
+            timings.append(time.perf_counter() - started)
+        # Memory on a separate request: tracing slows everything down
+        tracemalloc.start()
+        try:
+            self._fetch(client, url, encoding)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return size, statistics.median(timings), peak
+
+    def _report(self, name, case, result, baseline):
+        size, elapsed, peak = result
+        self.stdout.write(f'{name:<14} {case:<16} {size:>10} {size / baseline[0]:>7.2f} '
+                          f'{elapsed * 1000:>9.1f} {peak / 1024:>10.0f}')
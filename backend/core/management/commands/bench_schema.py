@@ -0,0 +1,102 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User, Follow
+from core.sharding import is_sharded
+from notifications.models import Notification
+from posts.models import Post, Like, FeedItem
+from posts.read_model import refresh_items
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure insert throughput of follows, likes and notifications and the '
+        'latency of the main read queries against the current schema. Everything '
+        'runs in a transaction that is rolled back. Run it before and after a '
+        'migration to compare index changes; --explain prints the plan of every '
+        'read (EXPLAIN ANALYZE with buffers on PostgreSQL, where the numbers that '
+        'matter come from: SQLite keeps no statistics and plans differently).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--rows', type=int, default=2000, help='Rows inserted per table')
+        parser.add_argument('--reads', type=int, default=200, help='Repetitions per read query')
+        parser.add_argument('--explain', action='store_true', help='Print the plan of each read query')
+
+    def handle(self, *args, **options):
+        if is_sharded():
+            raise CommandError('bench_schema rolls back one transaction on `default`; run it without SHARDS')
+        try:
+            with transaction.atomic():
+                self._run(options['users'], options['rows'], options['reads'], options['explain'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _timed(self, label, count, fn):
+        started = time.perf_counter()
+        for i in range(count):
+            fn(i)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:<32} {count / elapsed:>10.0f}/s {elapsed / count * 1000:>8.3f} ms each')
+
+    def _explain(self, fn):
+        with CaptureQueriesContext(connection) as queries:
+            fn(0)
+        sql = queries.captured_queries[-1]['sql']
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if connection.vendor == 'postgresql' else 'EXPLAIN QUERY PLAN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            for row in cursor.fetchall():
+                self.stdout.write('    ' + ' '.join(str(column) for column in row))
+
+    def _run(self, n_users, n_rows, n_reads, explain):
+        tag = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create([
+            User(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.invalid', password='!')
+            for i in range(n_users)
+        ])
+        posts = Post.objects.bulk_create([
+            Post(author=random.choice(users), content='bench') for _ in range(n_users * 5)
+        ])
+        refresh_items([post.id for post in posts], 'default')
+        pairs = random.sample([(a, b) for a in users for b in users if a != b], n_rows)
+        like_pairs = random.sample([(p, u) for p in posts[:n_rows] for u in users[:10]], n_rows)
+        self.stdout.write(f'Database: {connection.vendor}, {n_users} users, {len(posts)} posts')
+
+        # Row-at-a-time inserts, as the API issues them
+        self._timed('insert follow', n_rows,
+                    lambda i: Follow.objects.create(follower=pairs[i][0], following=pairs[i][1]))
+        self._timed('insert like', n_rows,
+                    lambda i: Like.objects.create(post=like_pairs[i][0], user=like_pairs[i][1]))
+        self._timed('insert notification', n_rows,
+                    lambda i: Notification.objects.create(recipient=pairs[i][1], sender=pairs[i][0],
+                                                          notification_type='like', message='bench'))
+
+        viewer = users[0]
+        following_ids = list(Follow.objects.filter(follower=viewer).values_list('following_id', flat=True))
+        reads = [
+            ('read feed first page', lambda i: list(FeedItem.objects.feed_for(viewer, following_ids)[:20])),
+            ('read user posts',
+             lambda i: list(FeedItem.objects.visible().filter(author_id=users[i % n_users].id)[:20])),
+            ('read follow set',
+             lambda i: list(Follow.objects.filter(follower=users[i % n_users]).values_list('following_id', flat=True))),
+            ('read unread count',
+             lambda i: Notification.objects.filter(recipient=users[i % n_users], is_read=False).count()),
+            ('read notification list', lambda i: list(Notification.objects.filter(recipient=users[i % n_users])[:20])),
+            ('read is-liked', lambda i: Like.objects.filter(post=posts[i % len(posts)], user=viewer).exists()),
+        ]
+        for label, fn in reads:
+            self._timed(label, n_reads, fn)
+            if explain:
+                self._explain(fn)
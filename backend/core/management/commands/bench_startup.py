@@ -0,0 +1,86 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from core.startup import run_python
+
+# Load the app like a worker, then send it one request through WSGI
+PROBE = '''
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from config.wsgi import application
+ready = time.perf_counter()
+environ = {'PATH_INFO': sys.argv[1]}
+if len(sys.argv) > 2:
+    environ['HTTP_AUTHORIZATION'] = 'Bearer ' + sys.argv[2]
+setup_testing_defaults(environ)
+status = []
+b''.join(application(environ, lambda code, headers, exc_info=None: status.append(code)))
+done = time.perf_counter()
+print(json.dumps({'setup': setup - started, 'app': ready - setup, 'request': done - ready, 'status': status[0]}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Start fresh interpreters that load the app like a worker and answer one '
+        'request, and check the median time to that first response against '
+        'STARTUP_BUDGET_MS. The request is authenticated as --user (the '
+        'first active user by default) unless --anonymous, and must answer '
+        '--status. Exits with an error when over budget or on another status; '
+        'run import_report to see where the time goes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Processes to start (median reported)')
+        parser.add_argument('--path', default='/api/posts/', help='URL of the first request')
+        parser.add_argument('--status', type=int, default=200, help='Status the request must answer')
+        parser.add_argument('--user', help='Username to authenticate as')
+        parser.add_argument('--anonymous', action='store_true', help='Send the request without a token')
+        parser.add_argument('--budget', type=int, default=settings.STARTUP_BUDGET_MS, help='Milliseconds')
+
+    def _token(self, options):
+        if options['anonymous']:
+            return []
+        users = User.objects.filter(is_active=True, deleted_at__isnull=True)
+        user = users.filter(username=options['user']).first() if options['user'] else users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No user to authenticate as: pass --user, or --anonymous with a public --path')
+        return [str(AccessToken.for_user(user))]
+
+    def handle(self, *args, **options):
+        token = self._token(options)
+        runs = []
+        for _ in range(max(options['runs'], 1)):
+            started = time.perf_counter()
+            result = run_python(PROBE, options['path'], *token)
+            elapsed = time.perf_counter() - started
+            if result.returncode:
+                raise CommandError(f'The probe failed: {result.stderr.strip().splitlines()[-1]}')
+            run = json.loads(result.stdout.strip().splitlines()[-1])
+            # An error page is not the first response being measured
+            if not run['status'].startswith(f'{options["status"]} '):
+                raise CommandError(f'GET {options["path"]} answered {run["status"]}, not {options["status"]}')
+            runs.append({**run, 'total': elapsed})
+
+        self.stdout.write(f'{len(runs)} processes, GET {options["path"]} -> {runs[0]["status"]}, median ms')
+        self.stdout.write(f'{"setup":>9} {"app":>9} {"request":>9} {"total":>9}')
+        median = {key: statistics.median(run[key] for run in runs) * 1000
+                  for key in ('setup', 'app', 'request', 'total')}
+        self.stdout.write(f'{median["setup"]:>9.1f} {median["app"]:>9.1f} {median["request"]:>9.1f} '
+                          f'{median["total"]:>9.1f}')
+        self.stdout.write('setup: django.setup(); app: config.wsgi with its preload; '
+                          'total: process start to exit, interpreter included')
+
+        if median['total'] > options['budget']:
+            raise CommandError(f'Startup took {median["total"]:.0f} ms, over the {options["budget"]} ms budget')
+        self.stdout.write(self.style.SUCCESS(f'Within the {options["budget"]} ms budget'))
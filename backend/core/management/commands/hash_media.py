@@ -0,0 +1,63 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from accounts.cache import invalidate_user
+from accounts.models import User
+from core.sharding import shards
+from core.storage import remember_hash, verified_hash
+from posts.cache import invalidate_post
+from posts.models import Post
+from posts.read_model import refresh_author, refresh_post
+
+
+def _post_renamed(post):
+    refresh_post(post)
+    invalidate_post(post)
+
+
+def _user_renamed(user):
+    invalidate_user(user.username)
+    refresh_author(user.id)
+
+
+# Model, file field, follow-up on the renamed row and the databases holding its rows
+MEDIA_FIELDS = (
+    (Post, 'image', _post_renamed, shards),
+    (User, 'profile_picture', _user_renamed, lambda: ['default']),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rename media uploaded before content-hashed names to hashed names, so '
+        'they are served as immutable too. Each row is updated to the new name '
+        'before the old file is removed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--keep-old', action='store_true', help='Leave the old files in place')
+
+    def handle(self, *args, **options):
+        for model, field, after_rename, databases in MEDIA_FIELDS:
+            renamed = missing = 0
+            rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            for obj in (obj for alias in databases() for obj in rows.using(alias).iterator()):
+                name = getattr(obj, field).name
+                if not default_storage.exists(name):
+                    missing += 1
+                    continue
+                digest = verified_hash(default_storage, name)
+                if digest is not None:
+                    remember_hash(name, digest)  # Served as immutable without a check job
+                    continue
+                renamed += 1
+                if options['dry_run']:
+                    continue
+                with default_storage.open(name, 'rb') as f:
+                    new_name = default_storage.save(name, f, max_length=model._meta.get_field(field).max_length)
+                model.objects.using(obj._state.db).filter(pk=obj.pk).update(**{field: new_name})
+                after_rename(obj)
+                if not options['keep_old'] and new_name != name:
+                    default_storage.delete(name)
+            self.stdout.write(f'{model.__name__}.{field}: {renamed} renamed, {missing} missing files')
@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import BOOT, import_times
+
+
+class Command(BaseCommand):
+    help = (
+        'Start a fresh interpreter under -X importtime, load the app the way a '
+        'worker does (django.setup() and config.wsgi, preload included) and '
+        'report where the import time goes: self time per top-level package, '
+        'then the modules with the largest cumulative time and what imported them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Packages and modules to list')
+        parser.add_argument('--code', default=BOOT, help='Python to run instead of loading the app')
+
+    def handle(self, *args, **options):
+        try:
+            times = import_times(options['code'])
+        except RuntimeError as e:
+            raise CommandError(f'The interpreter failed: {e}')
+        total = sum(self_us for _, self_us, _, _ in times)
+        top = options['top']
+
+        packages = defaultdict(lambda: [0, 0])
+        for module, self_us, _, _ in times:
+            package = packages[module.split('.')[0]]
+            package[0] += self_us
+            package[1] += 1
+        self.stdout.write(f'{len(times)} modules, {total / 1000:.1f} ms of import time')
+        self.stdout.write(f'\n{"package":<36} {"self ms":>9} {"share":>6} {"modules":>8}')
+        for name, (self_us, count) in sorted(packages.items(), key=lambda item: -item[1][0])[:top]:
+            self.stdout.write(f'{name:<36} {self_us / 1000:>9.1f} {self_us / total:>6.1%} {count:>8}')
+
+        self.stdout.write(f'\n{"module":<44} {"cumul ms":>9} {"self ms":>8}  imported by')
+        for module, self_us, cumulative_us, importer in sorted(times, key=lambda row: -row[2])[:top]:
+            self.stdout.write(f'{module:<44} {cumulative_us / 1000:>9.1f} {self_us / 1000:>8.1f}  {importer or "-"}')
@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.sharding import is_sharded, misplaced, next_id, shard_for_id, shard_for_user, shards
+from notifications.models import Notification
+from posts.models import Comment, FeedItem, ImportedPost, Like, Mention, Post
+
+
+def _copy(obj, using, **changes):
+    """Insert a copy of `obj` on `using` with `changes`; raw, so timestamps and ids are kept as given"""
+    for field, value in changes.items():
+        setattr(obj, field, value)
+    obj._state.adding, obj._state.db = True, None
+    obj.save_base(raw=True, using=using, force_insert=True)
+    return obj
+
+
+def _move_post(post, alias):
+    """Give the post an id of its author's shard there, with its comments, likes, mentions and feed item"""
+    target, old_id = shard_for_user(post.author_id), post.pk
+    with transaction.atomic(using=alias), transaction.atomic(using=target):
+        comments = list(Comment.objects.using(alias).filter(post_id=old_id).order_by('pk'))
+        likes = list(Like.objects.using(alias).filter(post_id=old_id))
+        mentions = list(Mention.objects.using(alias).filter(post_id=old_id))
+        items = list(FeedItem.objects.using(alias).filter(post_id=old_id))
+
+        new_id = _copy(post, target, pk=next_id(Post, target)).pk
+        comment_ids = {comment.pk: _copy(comment, target, pk=next_id(Comment, target), post_id=new_id).pk
+                       for comment in comments}
+        for like in likes:
+            _copy(like, target, pk=None, post_id=new_id)
+        for mention in mentions:
+            _copy(mention, target, pk=None, post_id=new_id, comment_id=comment_ids.get(mention.comment_id))
+        for item in items:
+            _copy(item, target, post_id=new_id)
+        for shard in shards():
+            Notification.objects.using(shard).filter(related_post_id=old_id).update(related_post_id=new_id)
+        ImportedPost.objects.using('default').filter(post_id=old_id).update(post_id=new_id)
+
+        for model in (Mention, Like, FeedItem, Comment):
+            model._base_manager.using(alias).filter(post_id=old_id)._raw_delete(alias)
+        Post._base_manager.using(alias).filter(pk=old_id)._raw_delete(alias)
+
+
+def _renumber_comment(comment, alias):
+    """Give a comment on a post already in place an id of its shard"""
+    with transaction.atomic(using=alias):
+        old_id = comment.pk
+        new_id = _copy(comment, alias, pk=next_id(Comment, alias)).pk
+        Mention.objects.using(alias).filter(comment_id=old_id).update(comment_id=new_id)
+        Comment._base_manager.using(alias).filter(pk=old_id)._raw_delete(alias)
+
+
+def _move_notification(notification, alias):
+    target = shard_for_user(notification.recipient_id)
+    with transaction.atomic(using=alias), transaction.atomic(using=target):
+        pk = notification.pk
+        _copy(notification, target, pk=None)
+        Notification._base_manager.using(alias).filter(pk=pk)._raw_delete(alias)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move rows written before SHARD_DATABASES was set or changed onto the '
+        'shard they are routed to: posts with their comments, likes, mentions '
+        'and feed items to their author\'s shard, notifications to their '
+        'recipient\'s. Posts and comments get new ids that encode their shard, '
+        'so links to their old ids stop working. Run it with the app stopped '
+        '(workers refuse to start until it has run) after migrating every '
+        'shard; the cache is cleared at the end. --check only reports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Exit with an error if any rows are misplaced')
+
+    def handle(self, *args, **options):
+        if not is_sharded():
+            self.stdout.write('SHARD_DATABASES is not set: nothing to do')
+            return
+        if options['check']:
+            found = {alias: labels for alias in shards() if (labels := misplaced(alias))}
+            if found:
+                raise CommandError('Misplaced rows: ' + '; '.join(f'{alias}: {", ".join(labels)}'
+                                                                  for alias, labels in found.items()))
+            self.stdout.write(self.style.SUCCESS('Every shard holds only its own rows'))
+            return
+
+        for alias in shards():
+            moved = {'post': 0, 'comment': 0, 'notification': 0}
+            # Ids are read up front: moving a post can append rows to this very shard
+            for post_id in list(Post.objects.using(alias).order_by('pk').values_list('pk', flat=True)):
+                post = Post._base_manager.using(alias).get(pk=post_id)
+                if shard_for_user(post.author_id) != alias or shard_for_id(post.pk) != alias:
+                    _move_post(post, alias)
+                    moved['post'] += 1
+            for comment_id in list(Comment.objects.using(alias).order_by('pk').values_list('pk', flat=True)):
+                if shard_for_id(comment_id) != alias:
+                    _renumber_comment(Comment._base_manager.using(alias).get(pk=comment_id), alias)
+                    moved['comment'] += 1
+            notifications = Notification.objects.using(alias).order_by('pk').values_list('pk', 'recipient_id')
+            for notification_id, recipient_id in list(notifications):
+                if shard_for_user(recipient_id) != alias:
+                    _move_notification(Notification._base_manager.using(alias).get(pk=notification_id), alias)
+                    moved['notification'] += 1
+            self.stdout.write(f'{alias}: ' + ', '.join(f'{count} {label}s moved' for label, count in moved.items()))
+
+        # Cached posts, like arrays and pages still name the old ids and shards
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Resharded; the cache was cleared'))
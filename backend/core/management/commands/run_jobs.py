@@ -0,0 +1,63 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued and periodic jobs from the Job table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Jobs run in parallel by this worker')
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+
+    def handle(self, *args, **options):
+        jobs.autodiscover()
+        jobs.ensure_scheduled()
+        self.stdout.write(f'Running jobs: {", ".join(sorted(jobs.registry))}')
+
+        self.stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._loop, args=(options['poll_interval'], options['once']), daemon=True)
+            for _ in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stop.set()
+            self.stdout.write('Stopping after the running jobs finish')
+            for thread in threads:
+                thread.join()
+
+    def _loop(self, poll_interval, once):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    jobs.release_stale()
+                    claimed = jobs.claim()
+                except DatabaseError as e:
+                    self.stderr.write(f'Could not claim a job: {e}')
+                    connection.close()
+                    self.stop.wait(poll_interval)
+                    continue
+                if claimed is None:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+                started = time.monotonic()
+                ok = jobs.run(claimed)
+                self.stdout.write(
+                    f'{claimed.name} #{claimed.id} {"done" if ok else "failed"} in {time.monotonic() - started:.2f}s'
+                )
+        finally:
+            connection.close()
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.warming import recently_active_users, warm_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the cached data of recently active users (profile, follow '
+        'set and counts, unread count, like arrays of the first feed page). Run '
+        'it on deploy or after a cache flush, before sending traffic. '
+        '--concurrency bounds how many queries hit the database at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.WARM_ACTIVE_DAYS,
+                            help='Users who logged in or refreshed a token in this many days')
+        parser.add_argument('--limit', type=int, default=1000, help='At most this many users, most recent first')
+        parser.add_argument('--concurrency', type=int, default=settings.WARM_WORKERS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = recently_active_users(options['days'], options['limit'])
+        warmed, failed = warm_users(users, max(options['concurrency'], 1))
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {warmed} users in {time.perf_counter() - started:.1f}s ({failed} failed)'
+        ))
@@ -0,0 +1,139 @@
+import mimetypes
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+from .jobs import defer
+from .storage import hash_key, name_hash
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _content_hash(name):
+    """
+    The hash in a content-hashed name as recorded when the file was saved, or
+    None for legacy names. A legacy upload can be named like
+    photo.0123456789abcdef.jpg without that being its hash, so a hash-shaped
+    name with no record (saved before hashes were recorded, or evicted) is
+    served as legacy while a job checks it against the file.
+    """
+    digest = cache.get(hash_key(name))
+    if digest is None and name_hash(name) is not None:
+        defer('core.verify_media_hash', key=hash_key(name), path=name)
+    return digest or None
+
+
+def _etag(name, digest):
+    if digest is not None:
+        return f'"{digest}"'
+    # Legacy names carry no hash, so fall back to size and mtime
+    modified = default_storage.get_modified_time(name)
+    return f'"{default_storage.size(name):x}-{int(modified.timestamp()):x}"'
+
+
+def _cache_control(digest):
+    if digest is not None:
+        return f'public, max-age={settings.MEDIA_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_LEGACY_MAX_AGE}'
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable byte range, None to send the whole file, False if unsatisfiable"""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        # Multiple ranges or another unit: ignoring Range and sending 200 is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(name, start, length):
+    with default_storage.open(name, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload(response, name):
+    """Hand the transfer to the front server; it handles Range itself"""
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        # A header value, not a URL yet: spaces, '?' and non-ASCII in the name must be escaped
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+        return True
+    if settings.MEDIA_ACCEL == 'x-sendfile':
+        try:
+            response['X-Sendfile'] = default_storage.path(name)
+        except NotImplementedError:
+            # Not a local backend: nothing the front server could send
+            return False
+        return True
+    return False
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serves uploads (MEDIA_UPLOAD_DIRS) from the default storage. Content-hashed names are
+    cached as immutable, If-None-Match is answered with 304 and single byte
+    ranges with 206. With MEDIA_ACCEL set the response only carries headers
+    and the front server (nginx X-Accel-Redirect, Apache/lighttpd
+    X-Sendfile) streams the bytes, so no Python worker does.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    # Only the upload directories: anything else under MEDIA_ROOT is not meant to be public
+    if name.split('/', 1)[0] not in settings.MEDIA_UPLOAD_DIRS or not default_storage.exists(name):
+        raise Http404('Media not found')
+
+    digest = _content_hash(name)
+    etag = _etag(name, digest)
+    headers = {'ETag': etag, 'Cache-Control': _cache_control(digest), 'Accept-Ranges': 'bytes'}
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type, headers=headers)
+    if _offload(response, name):
+        return response
+
+    size = default_storage.size(name)
+    byte_range = _parse_range(request.META.get('HTTP_RANGE', ''), size)
+    if byte_range is False:
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    body = _read_range(name, start, length) if request.method == 'GET' else ()
+    response = StreamingHttpResponse(body, content_type=content_type, headers=headers)
+    response['Content-Length'] = str(length)
+    response['Last-Modified'] = http_date(default_storage.get_modified_time(name).timestamp())
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,79 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A unit of deferred or periodic work, run by `manage.py run_jobs`"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Jobs sharing a key are never pending/running twice at the same time
+    key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_at'], condition=models.Q(status='pending'), name='core_job_pending_idx'),
+            models.Index(fields=['name'], condition=models.Q(status='running'), name='core_job_running_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status__in=['pending', 'running']),
+                                    name='core_job_active_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class JobLock(models.Model):
+    """Row claim() locks to count a concurrency-capped job's running instances without racing other workers"""
+    name = models.CharField(max_length=100, primary_key=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ShardSequence(models.Model):
+    """Next id of a sharded model on one shard (core.sharding.next_id); exists on every shard"""
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event written in the same transaction as the change it
+    describes, on the same database (core.outbox). The id orders events
+    within a database.
+    """
+    topic = models.CharField(max_length=50)
+    aggregate_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.topic} {self.aggregate_id}"
+
+
+class OutboxCheckpoint(models.Model):
+    """How far a named consumer of the change feed has processed it"""
+    consumer = models.CharField(max_length=100, primary_key=True)
+    cursor = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} at {self.cursor or 'start'}"
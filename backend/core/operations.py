@@ -0,0 +1,97 @@
+"""
+Migration operations that change indexes without blocking writes.
+
+On PostgreSQL a plain CREATE or DROP INDEX holds a lock that stops every
+insert, update and delete on the table until it finishes, which on a large
+table is minutes of failed writes. These run CONCURRENTLY there instead, so
+the migration using them must set `atomic = False`; on other backends
+(SQLite in tests and local shards) they fall back to the plain statements.
+"""
+from django.contrib.postgres import operations as postgres
+from django.db import migrations
+from django.db.migrations.operations.base import Operation
+from django.db.models import Index
+
+
+def _concurrently(schema_editor):
+    return schema_editor.connection.vendor == 'postgresql'
+
+
+class AddIndexConcurrently(postgres.AddIndexConcurrently):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if _concurrently(schema_editor):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if _concurrently(schema_editor):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RemoveIndexConcurrently(postgres.RemoveIndexConcurrently):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if _concurrently(schema_editor):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.RemoveIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if _concurrently(schema_editor):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.RemoveIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RemoveFieldIndexConcurrently(postgres.NotInTransactionMixin, Operation):
+    """
+    Drop the index Django creates for a field with db_index (every ForeignKey
+    by default), which RemoveIndex cannot name. Database only: pair it with
+    the AlterField(db_index=False) in a SeparateDatabaseAndState.
+    """
+    reversible = True
+
+    def __init__(self, model_name, name):
+        self.model_name = model_name
+        self.name = name
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {'model_name': self.model_name, 'name': self.name}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        column = model._meta.get_field(self.name).column
+        # The same lookup AlterField does: single-column indexes not declared in Meta.indexes
+        declared = {index.name for index in model._meta.indexes}
+        for index_name in schema_editor._constraint_names(model, [column], index=True, type_=Index.suffix,
+                                                          exclude=declared):
+            if _concurrently(schema_editor):
+                self._ensure_not_in_transaction(schema_editor)
+                schema_editor.execute(schema_editor._delete_index_sql(model, index_name, concurrently=True))
+            else:
+                schema_editor.execute(schema_editor._delete_index_sql(model, index_name))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        field = model._meta.get_field(self.name)
+        if _concurrently(schema_editor):
+            self._ensure_not_in_transaction(schema_editor)
+            schema_editor.execute(schema_editor._create_index_sql(model, fields=[field], concurrently=True))
+        else:
+            schema_editor.execute(schema_editor._create_index_sql(model, fields=[field]))
+
+    def describe(self):
+        return f'Concurrently remove the index of {self.model_name}.{self.name}'
+
+    @property
+    def migration_name_fragment(self):
+        return f'remove_{self.model_name.lower()}_{self.name.lower()}_index'
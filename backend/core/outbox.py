@@ -0,0 +1,164 @@
+"""
+Transactional outbox and change feed.
+
+Write paths call emit() inside the transaction that makes the change, on
+the database holding the changed row, so an event exists if and only if
+its change was committed. Consumers read the feed in id order per database
+from a cursor, either in process through Consumer (which checkpoints its
+cursor in OutboxCheckpoint) or over HTTP as NDJSON (core.views.event_stream).
+
+A cursor is, for every shard, the last event id seen and the lower ids
+that were still missing then, with when to give up on each: encoded as
+"default:120~115@1729300000.117@1729300000,shard1:98". An event's id is
+taken when its transaction inserts it but it only becomes visible when that
+transaction commits, so one committing after a later event was read leaves
+a gap below the cursor. Gaps are read again until their event shows up or,
+for a transaction that rolled back, OUTBOX_GAP_TIMEOUT seconds after the
+event above them was created.
+"""
+import heapq
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import OutboxCheckpoint, OutboxEvent
+from .sharding import scatter, shards
+
+
+def emit(topic, aggregate_id, payload=None, using='default'):
+    """Record an event; call it inside the transaction.atomic(using=...) block of the change"""
+    return OutboxEvent.objects.using(using).create(topic=topic, aggregate_id=aggregate_id, payload=payload or {})
+
+
+def emit_many(topic, events, using='default'):
+    """emit() for every (aggregate_id, payload) of a bulk change, in one INSERT"""
+    OutboxEvent.objects.using(using).bulk_create([
+        OutboxEvent(topic=topic, aggregate_id=aggregate_id, payload=payload or {})
+        for aggregate_id, payload in events
+    ])
+
+
+def parse_cursor(cursor):
+    """{alias: (last id, {missing id: unix time to give up on it})}"""
+    positions = {alias: (0, {}) for alias in shards()}
+    for part in filter(None, (cursor or '').split(',')):
+        alias, _, position = part.partition(':')
+        last, _, gaps = position.partition('~')
+        if alias not in positions or not last.isdigit():
+            raise ValueError(f'Invalid cursor: {cursor}')
+        try:
+            gaps = {int(gap): int(expires) for gap, _, expires in
+                    (gap.partition('@') for gap in filter(None, gaps.split('.')))}
+        except ValueError:
+            raise ValueError(f'Invalid cursor: {cursor}') from None
+        positions[alias] = (int(last), gaps)
+    return positions
+
+
+def format_cursor(positions):
+    parts = []
+    for alias, (last, gaps) in positions.items():
+        parts.append(f'{alias}:{last}')
+        if gaps:
+            parts[-1] += '~' + '.'.join(f'{gap}@{expires}' for gap, expires in sorted(gaps.items()))
+    return ','.join(parts)
+
+
+def _advance(positions, event):
+    """Move the event's shard past it: a gap it fills is closed, ids it skips become gaps"""
+    last, gaps = positions[event.shard]
+    gaps = dict(gaps)
+    if event.id > last:
+        # Whatever took a skipped id did so before this event was created
+        expires = int(event.created_at.timestamp()) + settings.OUTBOX_GAP_TIMEOUT
+        if expires > time.time():
+            gaps.update(dict.fromkeys(range(max(last + 1, event.id - settings.OUTBOX_MAX_GAPS), event.id),
+                                      expires))
+            gaps = dict(sorted(gaps.items())[-settings.OUTBOX_MAX_GAPS:])
+        last = event.id
+    else:
+        gaps.pop(event.id, None)
+    positions[event.shard] = (last, gaps)
+
+
+def read_events(cursor=None, limit=None):
+    """
+    The next events after `cursor`, oldest first, and the cursor to resume
+    from; each event's `cursor` attribute resumes right after it. Each
+    database is read in id order, late commits filling a gap first, and
+    databases are merged by time.
+    """
+    limit = limit or settings.OUTBOX_BATCH_SIZE
+    now = time.time()
+    positions = {alias: (last, {gap: expires for gap, expires in gaps.items() if expires > now})
+                 for alias, (last, gaps) in parse_cursor(cursor).items()}
+
+    def shard_events(alias):
+        last, gaps = positions[alias]
+        events = list(OutboxEvent.objects.using(alias)
+                      .filter(Q(id__gt=last) | Q(id__in=list(gaps))).order_by('id')[:limit])
+        for event in events:
+            event.shard = alias
+        return events
+
+    events = list(islice(heapq.merge(*scatter(shard_events), key=lambda event: event.created_at), limit))
+    for event in events:
+        _advance(positions, event)
+        event.cursor = format_cursor(positions)
+    return events, format_cursor(positions)
+
+
+def event_data(event):
+    return {
+        'id': event.id,
+        'shard': event.shard,
+        'topic': event.topic,
+        'aggregate_id': event.aggregate_id,
+        'payload': event.payload,
+        'created_at': event.created_at,
+    }
+
+
+class Consumer:
+    """
+    A named, checkpointed reader of the change feed. handler(events) gets
+    each batch inside a transaction on `default` that also advances the
+    checkpoint: writes the handler makes to `default` commit together with
+    it, anything else is delivered at least once and should be idempotent.
+    """
+
+    def __init__(self, name, batch_size=None):
+        self.name = name
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+
+    @property
+    def cursor(self):
+        return OutboxCheckpoint.objects.filter(consumer=self.name).values_list('cursor', flat=True).first() or ''
+
+    def reset(self):
+        OutboxCheckpoint.objects.filter(consumer=self.name).delete()
+
+    def consume_batch(self, handler):
+        """Process one batch; returns the number of events handled"""
+        with transaction.atomic():
+            checkpoint, _ = OutboxCheckpoint.objects.select_for_update().get_or_create(consumer=self.name)
+            events, cursor = read_events(checkpoint.cursor, self.batch_size)
+            if events:
+                handler(events)
+                checkpoint.cursor = cursor
+                checkpoint.save(update_fields=['cursor', 'updated_at'])
+        return len(events)
+
+    def consume(self, handler, max_batches=None):
+        """Process batches until caught up (or max_batches); returns the number of events handled"""
+        handled = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self.consume_batch(handler)
+            handled += count
+            batches += 1
+            if count < self.batch_size:
+                break
+        return handled
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+def slot_key(slot):
+    """A process's claim on the slot and the URL names it has profiles for"""
+    return f'profile:slot:{slot}'
+
+
+def view_key(slot, name):
+    # URL names and routes may hold characters memcached keys cannot
+    return f'profile:slot:{slot}:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+class Sampler:
+    """
+    Statistical profiler: a daemon thread wakes every `interval` seconds and
+    records the current stack of each registered thread. It only walks
+    frames while at least one request is being profiled, so an idle sampler
+    costs nothing and a profiled request pays roughly one stack walk per
+    interval instead of a hook on every call like cProfile.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id, stop_code):
+        with self._lock:
+            self._active[thread_id] = (Counter(), stop_code)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id):
+        """The samples taken; the sampler only adds to them under the lock, so none arrive after this"""
+        with self._lock:
+            stacks, _ = self._active.pop(thread_id, (Counter(), None))
+        return stacks
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                active = dict(self._active)
+                if not active:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            samples = [(thread_id, _collapse(frames[thread_id], stop_code))
+                       for thread_id, (_, stop_code) in active.items() if thread_id in frames]
+            del frames
+            with self._lock:
+                for thread_id, stack in samples:
+                    # Only requests still being profiled: a stopped one's samples are being recorded
+                    if thread_id in self._active:
+                        self._active[thread_id][0][stack] += 1
+            time.sleep(self.interval)
+
+
+def _collapse(frame, stop_code):
+    """Fold a stack into flamegraph format (root first, ';'-separated), stopping at stop_code"""
+    names = []
+    while frame is not None and frame.f_code is not stop_code:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+_slot = (None, None, None)  # (pid, slot, owner token) of this process
+_slot_lock = threading.Lock()
+
+
+def _own_slot():
+    """
+    This process's slot and its entry. Slots are a fixed pool of
+    PROFILE_SLOTS, claimed with cache.add; a claim lapses PROFILE_TTL after
+    the owner's last record, so the slots of exited processes are reused.
+    None when every slot is taken.
+    """
+    global _slot
+    pid, slot, token = _slot
+    if pid == os.getpid():
+        entry = cache.get(slot_key(slot))
+        if entry is not None and entry['owner'] == token:
+            return slot, entry
+    # First record in this process, a fork of one that had recorded, or the claim lapsed
+    token = secrets.token_hex(8)
+    entry = {'owner': token, 'views': []}
+    for slot in range(1, settings.PROFILE_SLOTS + 1):
+        if cache.add(slot_key(slot), entry, settings.PROFILE_TTL):
+            _slot = (os.getpid(), slot, token)
+            return slot, entry
+    return None
+
+
+def _merge(profile, requests, seconds, samples, stacks):
+    profile['requests'] += requests
+    profile['seconds'] += seconds
+    profile['samples'] += samples
+    merged = Counter(profile['stacks'])
+    merged.update(stacks)
+    # Keep the profile bounded, in stacks and in bytes (a cache value over the backend's item size
+    # limit, 1 MB for memcached, is dropped without an error): rare stacks are noise in a flamegraph anyway
+    profile['stacks'], size = {}, 0
+    for stack, count in merged.most_common(settings.PROFILE_MAX_STACKS):
+        size += len(stack) + 16
+        if size > settings.PROFILE_MAX_BYTES:
+            break
+        profile['stacks'][stack] = count
+
+
+def _empty():
+    return {'requests': 0, 'seconds': 0.0, 'samples': 0, 'stacks': {}}
+
+
+def record(name, stacks, elapsed):
+    """
+    Merge one request's samples into this process's profile of its URL name,
+    kept under its own key per (slot, URL name). Only this process writes its
+    slot, and its threads take turns, so no samples are lost to another
+    writer's read-merge-write.
+    """
+    with _slot_lock:
+        owned = _own_slot()
+        if owned is None:
+            return
+        slot, entry = owned
+        key = view_key(slot, name)
+        profile = cache.get(key) or _empty()
+        _merge(profile, 1, elapsed, sum(stacks.values()), stacks)
+        cache.set(key, profile, settings.PROFILE_TTL)
+        if name not in entry['views']:
+            entry['views'].append(name)
+        cache.set(slot_key(slot), entry, settings.PROFILE_TTL)  # Also renews the claim
+
+
+def _stored():
+    """{view key: URL name} of every stored profile"""
+    entries = cache.get_many([slot_key(slot) for slot in range(1, settings.PROFILE_SLOTS + 1)])
+    return {view_key(slot, name): name
+            for slot in range(1, settings.PROFILE_SLOTS + 1) if (entry := entries.get(slot_key(slot)))
+            for name in entry['views']}
+
+
+def profiles():
+    """All stored profiles, every process's merged, keyed by URL name"""
+    names = _stored()
+    merged = {}
+    for key, profile in cache.get_many(names).items():
+        _merge(merged.setdefault(names[key], _empty()), profile['requests'], profile['seconds'],
+               profile['samples'], profile['stacks'])
+    return dict(sorted(merged.items()))
+
+
+def clear_profiles():
+    """Drop every profile; processes claim their slots again on their next record"""
+    cache.delete_many([*_stored(), *(slot_key(slot) for slot in range(1, settings.PROFILE_SLOTS + 1))])
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a PROFILE_SAMPLE_RATE fraction of requests, plus any request
+    from a staff user that sends the PROFILE_HEADER header, and stores the
+    collapsed stacks per URL name (see core.views.profile_list).
+
+    Only the request's own thread is sampled; work fanned out to the
+    core.concurrency pool shows up as time spent waiting on its futures.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sampler = Sampler(settings.PROFILE_INTERVAL)
+        self.header = 'HTTP_' + settings.PROFILE_HEADER.upper().replace('-', '_')
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        self.sampler.start(thread_id, self.__call__.__code__)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = self.sampler.stop(thread_id)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        if match is not None and stacks:
+            record(match.view_name or match.route, stacks, elapsed)
+        return response
+
+    def _should_profile(self, request):
+        if request.META.get(self.header):
+            return self._is_staff(request)
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def _is_staff(self, request):
+        if request.user.is_authenticated:
+            return request.user.is_staff
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        return authenticated is not None and authenticated[0].is_staff
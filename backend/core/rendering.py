@@ -0,0 +1,56 @@
+"""
+Streamed JSON arrays for list endpoints.
+
+A ListAPIView with StreamingListMixin serializes its rows STREAM_CHUNK_SIZE
+at a time from a queryset iterator and streams the array as it goes, so a
+worker holds one chunk of instances and rendered JSON instead of the whole
+list. The bytes match what JSONRenderer would render for the whole list.
+Lists that fit in one chunk are rendered as a normal Response, which keeps
+their Content-Length and lets the compression threshold apply.
+"""
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def iter_json_array(chunks, renderer):
+    """Render each chunk of items as JSON and join them into one array"""
+    yield b'['
+    separator = b''
+    for chunk in chunks:
+        # render() gives "[...]"; keep the items and join the chunks with commas
+        body = renderer.render(chunk)[1:-1]
+        if body:
+            yield separator + body
+            separator = b','
+    yield b']'
+
+
+class StreamingListMixin:
+    """For ListAPIView subclasses; unpaginated JSON lists only, anything else falls back to list()"""
+
+    def list(self, request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if self.paginator is not None or not isinstance(renderer, JSONRenderer) or not settings.STREAM_LISTS:
+            return super().list(request, *args, **kwargs)
+
+        size = settings.STREAM_CHUNK_SIZE
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.iterator(chunk_size=size) if isinstance(queryset, QuerySet) else queryset
+        pages = (self.get_serializer(chunk, many=True).data for chunk in chunked(rows, size))
+        first = next(pages, [])
+        if len(first) < size:
+            return Response(first)
+
+        return StreamingHttpResponse(iter_json_array(chain([first], pages), renderer),
+                                     content_type=renderer.media_type)
@@ -0,0 +1,218 @@
+"""
+Author-keyed horizontal sharding.
+
+settings.SHARDS lists the database aliases that hold posts, comments, likes,
+mentions, feed items and notifications; users, follows, tokens and jobs stay on
+`default`. A post lives on the shard of its author and takes its comments,
+likes, mentions and feed item with it; a notification lives on the shard of its
+recipient. With a single shard (the default) every query goes to `default`
+exactly as before.
+
+Post and comment ids are allocated per shard from ShardSequence so that
+`(id - 1) % len(SHARDS)` is the index of the shard holding the row, which
+lets a URL like /api/posts/<id>/ be routed without a lookup. Rows written
+before SHARD_DATABASES was set (or changed) are neither on the right shard
+nor numbered that way: workers refuse to start (check_placement) until
+`manage.py reshard` has moved them.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+from .concurrency import run_concurrently
+
+# Models placed by ShardRouter, with the attribute that picks their shard
+USER_KEYED = {'posts.post': 'author_id', 'notifications.notification': 'recipient_id'}
+POST_KEYED = {'posts.comment': 'post_id', 'posts.like': 'post_id', 'posts.mention': 'post_id',
+              'posts.feeditem': 'post_id'}
+SHARDED_MODELS = USER_KEYED.keys() | POST_KEYED.keys()
+# Sharded models whose ids must be unique across shards and encode the shard
+ID_ALLOCATED = {'posts.post', 'posts.comment'}
+
+
+def shards():
+    return settings.SHARDS
+
+
+def is_sharded():
+    return len(settings.SHARDS) > 1
+
+
+def shard_for_user(user_id):
+    return settings.SHARDS[user_id % len(settings.SHARDS)]
+
+
+def shard_for_id(object_id):
+    """Shard of a post or comment, from the id it was allocated"""
+    return settings.SHARDS[(object_id - 1) % len(settings.SHARDS)]
+
+
+def group_by_shard(ids, shard_of):
+    """{alias: [ids]} for the ids, using shard_of (shard_for_user or shard_for_id)"""
+    grouped = defaultdict(list)
+    for object_id in ids:
+        grouped[shard_of(object_id)].append(object_id)
+    return grouped
+
+
+def scatter(fn):
+    """fn(alias) on every shard, concurrently when there is more than one; returns the results in SHARDS order"""
+    if not is_sharded():
+        return [fn(settings.SHARDS[0])]
+    return run_concurrently(*[(lambda alias=alias: fn(alias)) for alias in settings.SHARDS])
+
+
+def merge_newest(results, limit=None, field='created_at'):
+    """Merge per-shard lists already sorted newest first into one list sorted by `field`"""
+    merged = heapq.merge(*results, key=lambda obj: getattr(obj, field), reverse=True)
+    return list(islice(merged, limit))
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+class ShardRouter:
+    def _shard_of_instance(self, model, instance):
+        label = _label(model)
+        if label in USER_KEYED:
+            key = getattr(instance, USER_KEYED[label], None)
+            return shard_for_user(key) if key is not None else None
+        key = getattr(instance, POST_KEYED[label], None)
+        return shard_for_id(key) if key is not None else None
+
+    def _db_for(self, model, instance=None, **hints):
+        if instance is None:
+            return None
+        if _label(model) not in SHARDED_MODELS:
+            # post.author and friends: Django would otherwise follow the post onto its shard
+            return 'default' if _label(instance._meta.model) in SHARDED_MODELS else None
+        if _label(instance._meta.model) in SHARDED_MODELS:
+            # Saved rows stay where they are; related managers follow their instance
+            if instance._state.db is not None:
+                return instance._state.db
+            if isinstance(instance, model):
+                return self._shard_of_instance(model, instance)
+            return None
+        if _label(model) in USER_KEYED and instance._meta.model is model._meta.get_field(
+                USER_KEYED[_label(model)]).remote_field.model:
+            # e.g. user.posts / user.notifications: the user's own shard
+            return shard_for_user(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows reference users (and notifications posts) on other databases
+        if _label(obj1._meta.model) in SHARDED_MODELS or _label(obj2._meta.model) in SHARDED_MODELS:
+            return True
+        return None
+
+    # No allow_migrate: every shard gets the full schema. Unsharded tables just
+    # stay empty there, and third-party data migrations run unchanged.
+
+
+class ShardedQuerySet(models.QuerySet):
+    def for_user(self, user_id):
+        """Rows whose shard is picked from this user (a post's author, a notification's recipient)"""
+        return self.using(shard_for_user(user_id))
+
+    def for_id(self, object_id):
+        """The shard holding the post or comment with this id"""
+        return self.using(shard_for_id(object_id))
+
+    def for_post(self, post_id):
+        """The shard holding a post, and so its comments, likes and mentions"""
+        return self.using(shard_for_id(post_id))
+
+    def exclude_deleted_users(self, *fields):
+        """Drop rows whose `fields` users are soft-deleted, without a cross-shard join when sharded"""
+        if not is_sharded():
+            return self.filter(**{f'{field}__deleted_at__isnull': True for field in fields})
+        from accounts.cache import get_deleted_user_ids
+        deleted = get_deleted_user_ids()
+        if not deleted:
+            return self
+        queryset = self
+        for field in fields:
+            queryset = queryset.exclude(**{f'{field}_id__in': deleted})
+        return queryset
+
+    def with_related(self, *fields):
+        """select_related on one database; prefetch_related (a query on `default`) when users are elsewhere"""
+        if not is_sharded():
+            return self.select_related(*fields)
+        return self.prefetch_related(*fields)
+
+
+def misplaced(alias, sample=100):
+    """
+    Labels of the sharded models whose oldest rows on `alias` belong on
+    another shard, or carry an id that encodes another shard. Rows written
+    before SHARD_DATABASES was set or changed are the oldest, so looking at
+    the first `sample` by id finds them without scanning the tables.
+    """
+    found = []
+    for label in sorted(SHARDED_MODELS):
+        model = apps.get_model(label)
+        if label in USER_KEYED:
+            field, shard_of = USER_KEYED[label], shard_for_user
+        else:
+            field, shard_of = POST_KEYED[label], shard_for_id
+        rows = model._base_manager.using(alias).order_by('pk').values_list('pk', field)[:sample]
+        if any(shard_of(key) != alias or (label in ID_ALLOCATED and shard_for_id(pk) != alias)
+               for pk, key in rows):
+            found.append(label)
+    return found
+
+
+def check_placement():
+    """Raise ImproperlyConfigured when a shard holds rows that reads routed by id or user would never find"""
+    if not is_sharded():
+        return
+    for alias in settings.SHARDS:
+        labels = misplaced(alias)
+        if labels:
+            raise ImproperlyConfigured(
+                f'Database {alias!r} holds {", ".join(labels)} rows that belong on other shards, '
+                f'e.g. from before SHARD_DATABASES was set. Run `manage.py reshard` first.'
+            )
+
+
+def _first_id(alias, model):
+    """Smallest id above the shard's current maximum that maps back to this shard"""
+    count, index = len(settings.SHARDS), settings.SHARDS.index(alias)
+    max_id = model._base_manager.using(alias).aggregate(max_id=models.Max('pk'))['max_id'] or 0
+    return max_id + 1 + (index - max_id) % count
+
+
+def next_id(model, alias):
+    """Allocate the next id of `model` on shard `alias`"""
+    from .models import ShardSequence
+    sequences = ShardSequence.objects.using(alias)
+    name = _label(model)
+    while True:
+        with transaction.atomic(using=alias):
+            if sequences.filter(name=name).update(value=F('value') + len(settings.SHARDS)):
+                return sequences.get(name=name).value
+        try:
+            with transaction.atomic(using=alias):
+                return sequences.create(name=name, value=_first_id(alias, model)).value
+        except IntegrityError:
+            continue  # Another process created the sequence first
+
+
+def allocate_id(sender, instance, raw=False, using=None, **kwargs):
+    """pre_save receiver giving new posts and comments their shard-encoded id"""
+    if instance.pk is None and not raw and is_sharded() and _label(sender) in ID_ALLOCATED:
+        instance.pk = next_id(sender, using)
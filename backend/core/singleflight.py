@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def stats():
+    """Process-wide counters for single-flight calls and the read cache"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key within a process: the first
+    caller runs the function, the others wait for it and share its result
+    (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            count('coalesced')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        count('executed')
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+flight = SingleFlight()
@@ -0,0 +1,126 @@
+"""
+Worker startup: loading the app before the first request, and measuring it.
+
+preload() does once the work a fresh worker otherwise does on its first
+requests: it imports every urls and views module and compiles the URL
+patterns, fills the models' _meta caches, builds the fields of every view's
+serializer, imports the cache, session and message backends Django loads
+on first use, activates the default language (loading its catalogs), and
+opens each database connection so the backend's connection setup has run.
+It also refuses to start a worker whose shards hold rows routed elsewhere
+(core.sharding.check_placement).
+config.wsgi calls it, so with gunicorn's preload_app (gunicorn.conf.py) it
+runs once in the master and every forked worker starts warm. Connections
+are closed again at the end: a socket must never be shared by two
+processes, and workers reconnect on their first query.
+
+URLs mounted lazily on purpose, like the admin's (config.urls), are left
+alone, which is also why the resolver's reverse() tables are not built:
+building them imports every urlconf.
+
+run_python() and import_times() run a fresh interpreter for the
+import_report and bench_startup commands.
+"""
+import re
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+from django.utils.module_loading import import_string
+
+from .sharding import check_placement
+
+# What a worker imports before it serves anything (gunicorn imports config.wsgi)
+BOOT = 'import django; django.setup(); import config.wsgi'
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def _load_urls(resolver):
+    """Import the urls and views modules under `resolver` and compile its patterns; returns the views"""
+    views = []
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex  # Otherwise compiled on the first request it is matched against
+        if not isinstance(pattern, URLResolver):
+            views.append(pattern.callback)
+        elif not isinstance(pattern.urlconf_name, str):  # Mounted lazily: left to its first request
+            views += _load_urls(pattern)
+    return views
+
+
+def _serializer_classes(views):
+    found = []
+    for view in views:
+        view_class = getattr(view, 'view_class', None) or getattr(view, 'cls', None)
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is not None and serializer_class not in found:
+            found.append(serializer_class)
+    return found
+
+
+def _lazy_backends():
+    """Classes Django imports on the first request that uses them rather than at setup"""
+    paths = [cache['BACKEND'] for cache in settings.CACHES.values()]
+    paths += [settings.SESSION_ENGINE + '.SessionStore', settings.SESSION_SERIALIZER, settings.MESSAGE_STORAGE]
+    return paths
+
+
+def preload():
+    resolver = get_resolver()
+    resolver.pattern.regex
+    views = _load_urls(resolver)
+    for model in apps.get_models():
+        model._meta.get_fields()
+    for serializer_class in _serializer_classes(views):
+        serializer_class().fields
+    for path in _lazy_backends():
+        import_string(path)
+    with translation.override(settings.LANGUAGE_CODE):
+        pass
+
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            pass  # The database may not be up yet; workers connect on their first query as usual
+    try:
+        check_placement()
+    except DatabaseError:
+        pass  # Not up or not migrated yet
+    connections.close_all()
+
+
+def run_python(code, *args, options=()):
+    """Run `code` in a fresh interpreter with this process's settings and working directory"""
+    return subprocess.run([sys.executable, *options, '-c', code, *args],
+                          cwd=settings.BASE_DIR, capture_output=True, text=True)
+
+
+def import_times(code=BOOT):
+    """
+    [(module, self µs, cumulative µs, importer)] for every module a fresh
+    interpreter imports while running `code`, in -X importtime order.
+    The importer is the module whose import pulled it in (None at top level).
+    """
+    result = run_python(code, options=('-X', 'importtime'))
+    if result.returncode:
+        raise RuntimeError((result.stderr.strip() or f'exit status {result.returncode}').splitlines()[-1])
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            rows.append((match[4], int(match[1]), int(match[2]), len(match[3])))
+    # A module is listed after everything it imported, one level less indented
+    times, pending = [], []
+    for module, self_us, cumulative_us, depth in rows:
+        while pending and pending[-1][1] > depth:
+            times[pending.pop()[0]][3] = module
+        pending.append((len(times), depth))
+        times.append([module, self_us, cumulative_us, None])
+    return [tuple(row) for row in times]
+
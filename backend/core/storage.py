@@ -0,0 +1,88 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_LENGTH = 16
+HASHED_NAME_RE = re.compile(rf'\.([0-9a-f]{{{HASH_LENGTH}}})(\.[^./]*)?$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name, digest, max_length=None):
+    # Re-saving a stored file replaces its hash instead of stacking another one
+    root, ext = os.path.splitext(HASHED_NAME_RE.sub(r'\2', name))
+    suffix = f'.{digest}{ext}'
+    if max_length and len(root) + len(suffix) > max_length:
+        # Shorten the original file name, never the hash
+        dir_name, file_root = os.path.split(root)
+        keep = max_length - len(suffix) - (len(dir_name) + 1 if dir_name else 0)
+        if keep < 1:
+            raise SuspiciousFileOperation(f'No hashed name for "{name}" fits in {max_length} characters')
+        root = os.path.join(dir_name, file_root[:keep])
+    return root + suffix
+
+
+def name_hash(name):
+    """The hash-shaped segment of a name, or None. Legacy names can have one too: see verified_hash()"""
+    match = HASHED_NAME_RE.search(name)
+    return match.group(1) if match else None
+
+
+def verified_hash(storage, name):
+    """The hash embedded in `name` if the stored file's content has that hash, else None. Reads the file."""
+    digest = name_hash(name)
+    if digest is None:
+        return None
+    with storage.open(name, 'rb') as f:
+        return digest if content_hash(f) == digest else None
+
+
+def hash_key(name):
+    # Names can hold spaces and non-ASCII, which memcached keys cannot
+    return 'media_hash:' + hashlib.sha256(name.encode()).hexdigest()
+
+
+def remember_hash(name, digest):
+    """Record verified_hash() of `name` ('' for None) for core.media, which never reads a file to learn it"""
+    cache.set(hash_key(name), digest or '', settings.MEDIA_MAX_AGE)
+
+
+class HashedStorageMixin:
+    """
+    Stores every file under a name that embeds a hash of its content, e.g.
+    posts/cat.3f2a9c0d1e4b5a67.jpg. A name therefore never points to
+    different bytes, which lets core.media serve it as immutable, and
+    uploading the same file twice reuses the stored copy. The hash is
+    recorded (remember_hash) as the file is saved.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = content_hash(content)
+        name = hashed_name(name, digest, max_length)
+        if not self.exists(name):
+            name = super().save(name, content, max_length=max_length)
+        remember_hash(name, digest)
+        return name
+
+
+class HashedFileSystemStorage(HashedStorageMixin, FileSystemStorage):
+    def __init__(self, *args, allow_overwrite=True, **kwargs):
+        # A name stands for its content, so two uploads racing to the same name write the same bytes.
+        # Without this, the loser would get a random suffix after the hash and lose its hashed name.
+        super().__init__(*args, allow_overwrite=allow_overwrite, **kwargs)
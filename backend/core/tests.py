@@ -0,0 +1,510 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.cache import follow_counts_key, following_key, user_key
+from accounts.models import Follow, User
+from core import jobs, profiling, sharding, warming
+from core.startup import run_python
+from core.models import Job, OutboxEvent
+from core.outbox import parse_cursor, read_events
+from core.sharding import ShardRouter, group_by_shard, merge_newest, next_id, scatter, shard_for_id, shard_for_user
+from core.storage import HASH_LENGTH, content_hash, hashed_name
+from core.throttling import TokenBucket, client_ip
+from notifications.models import Notification
+from posts import read_model
+from posts.models import Comment, FeedItem, Like, Mention, Post
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+
+    def _bucket(self, capacity=3, duration=60):
+        return TokenBucket('test-bucket', capacity, duration, timer=lambda: self.now)
+
+    def test_allows_capacity_then_refuses(self):
+        bucket = self._bucket()
+        self.assertEqual([bucket.consume() for _ in range(3)], [0, 0, 0])
+        self.assertGreater(bucket.consume(), 0)
+
+    def test_refills_over_the_duration(self):
+        bucket = self._bucket()
+        for _ in range(3):
+            bucket.consume()
+        self.now += 30  # Still within the last minute: the burst is not spent yet
+        self.assertGreater(bucket.consume(), 0)
+        self.now += 60
+        self.assertEqual(bucket.consume(), 0)
+
+    def test_refused_requests_spend_nothing(self):
+        bucket = self._bucket(capacity=1)
+        bucket.consume()
+        for _ in range(10):
+            bucket.consume()
+        self.now += 120
+        self.assertEqual(bucket.consume(), 0)
+
+    def test_concurrent_requests_cannot_share_a_token(self):
+        bucket = self._bucket(capacity=10)
+        allowed = []
+        barrier = threading.Barrier(20)
+
+        def take():
+            barrier.wait()
+            allowed.append(bucket.consume() == 0)
+
+        threads = [threading.Thread(target=take) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(allowed), 10)
+
+
+class ClientIPTests(SimpleTestCase):
+    def test_ignores_forwarded_for_without_proxies(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='1.2.3.4', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '10.0.0.1')
+
+    @override_settings(THROTTLE_NUM_PROXIES=1)
+    def test_uses_the_address_the_proxy_saw(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 1.2.3.4', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '1.2.3.4')
+
+
+class BatchTests(TransactionTestCase):  # Sub-requests run in other threads, on their own connections
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='root', email='root@example.com', password='pw-secret-123')
+        for i in range(5):
+            User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com', password='pw-secret-123')
+        self.client = APIClient()
+        # Sub-requests authenticate again from the caller's header
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+
+    def _batch(self, *urls):
+        response = self.client.post('/api/batch/', {'requests': list(urls)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['responses']
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_streamed_list_is_returned_whole(self):
+        [users] = self._batch('/api/auth/users/')
+        self.assertEqual(users['status'], 200)
+        self.assertEqual(len(users['body']), User.objects.count() - 1)
+
+    @override_settings(STREAM_CHUNK_SIZE=2, COMPRESSION_MIN_SIZE=1)
+    def test_streamed_list_in_a_compressed_batch(self):
+        response = self.client.post('/api/batch/', {'requests': ['/api/auth/users/']}, format='json',
+                                    HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        [users] = json.loads(gzip.decompress(response.content))['responses']
+        self.assertEqual(len(users['body']), User.objects.count() - 1)
+
+    def test_other_streams_are_refused(self):
+        events, profile = self._batch('/api/events/', '/api/auth/profile/')
+        self.assertEqual(events['status'], 400)
+        self.assertEqual(profile['body']['username'], 'root')
+
+    def test_only_api_endpoints_are_batched(self):
+        admin, media, missing, profile = self._batch('/admin/', '/media/missing.png', '/nowhere/',
+                                                     '/api/auth/profile/')
+        self.assertEqual((admin['status'], media['status'], missing['status']), (400, 400, 404))
+        self.assertEqual(profile['body']['username'], 'root')
+
+    def test_a_failing_request_fails_alone(self):
+        with mock.patch('core.views.UserProfileSerializer', side_effect=RuntimeError), \
+                self.assertLogs('core.views', 'ERROR'):
+            bootstrap, profile = self._batch('/api/bootstrap/', '/api/auth/profile/')
+        self.assertEqual(bootstrap['status'], 500)
+        self.assertEqual(profile['body']['username'], 'root')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1)
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+
+    def test_responses_with_tokens_are_not_compressed(self):
+        response = self.client.post('/api/auth/login/', {'email': 'alice@example.com', 'password': 'pw-secret-123'},
+                                    HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': response.json()['refresh']},
+                                    HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_other_responses_are_compressed(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/auth/users/alice/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['username'], 'alice')
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media_root = override_settings(MEDIA_ROOT=root.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_shortened_names_keep_their_hash(self):
+        digest = content_hash(ContentFile(b'x'))
+        name = hashed_name('posts/' + 'a' * 200 + '.jpeg', digest, max_length=100)
+        self.assertEqual(len(name), 100)
+        self.assertTrue(name.startswith('posts/a') and name.endswith(f'.{digest}.jpeg'))
+        with self.assertRaises(SuspiciousFileOperation):
+            hashed_name('posts/' + 'a' * 200 + '.jpeg', digest, max_length=HASH_LENGTH + 10)
+
+    def test_saving_twice_keeps_the_hashed_name(self):
+        first = default_storage.save('posts/cat.jpg', ContentFile(b'meow'), max_length=100)
+        second = default_storage.save('posts/cat.jpg', ContentFile(b'meow'), max_length=100)
+        self.assertEqual(first, second)
+        self.assertRegex(first, rf'^posts/cat\.[0-9a-f]{{{HASH_LENGTH}}}\.jpg$')
+
+    def test_legacy_name_that_looks_hashed_is_not_immutable(self):
+        name = 'posts/photo.0123456789abcdef.jpg'
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'legacy')
+        response = self.client.get('/media/' + name)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertNotEqual(response['ETag'], '"0123456789abcdef"')
+
+        hashed = default_storage.save('posts/photo.jpg', ContentFile(b'new'))
+        self.assertIn('immutable', self.client.get('/media/' + hashed)['Cache-Control'])
+
+    def test_hashes_come_from_the_upload_not_the_request(self):
+        name = default_storage.save('posts/cat.jpg', ContentFile(b'meow'))
+        with mock.patch('core.storage.content_hash', side_effect=AssertionError):
+            response = self.client.get('/media/' + name)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        cache.clear()  # The record was evicted: served as legacy until a job checks the file
+        self.assertNotIn('immutable', self.client.get('/media/' + name)['Cache-Control'])
+        job = Job.objects.get(name='core.verify_media_hash')
+        jobs.verify_media_hash(**job.kwargs)
+        self.assertIn('immutable', self.client.get('/media/' + name)['Cache-Control'])
+
+    def test_only_upload_directories_are_served(self):
+        for name in ('exports/alice-20260101000000.ndjson', 'secret.txt'):
+            path = default_storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write('{}')
+            self.assertEqual(self.client.get('/media/' + name).status_code, 404)
+        self.assertEqual(self.client.get('/media/posts/../exports/alice-20260101000000.ndjson').status_code, 404)
+
+    @override_settings(MEDIA_ACCEL='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_accel_redirect_is_quoted(self):
+        name = default_storage.save('posts/my cat?é.jpg', ContentFile(b'meow'))
+        response = self.client.get('/media/' + quote(name))
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/protected-media/posts/my%20cat%3F%C3%A9.'))
+
+
+SHARDED = override_settings(SHARDS=['default', 'shard1', 'shard2'])
+
+
+class ShardingTests(SimpleTestCase):
+    @SHARDED
+    def test_ids_and_users_map_to_shards(self):
+        self.assertEqual([shard_for_id(object_id) for object_id in (1, 2, 3, 4)],
+                         ['default', 'shard1', 'shard2', 'default'])
+        self.assertEqual([shard_for_user(user_id) for user_id in (3, 4, 5)], ['default', 'shard1', 'shard2'])
+        self.assertEqual(dict(group_by_shard([1, 2, 4, 7], shard_for_id)), {'default': [1, 4, 7], 'shard1': [2]})
+
+    @SHARDED
+    def test_router_places_rows_by_author_and_post(self):
+        router = ShardRouter()
+        post = Post(author_id=5)
+        self.assertEqual(router.db_for_write(Post, instance=post), 'shard2')
+        self.assertEqual(router.db_for_write(Like, instance=Like(post_id=2)), 'shard1')
+        self.assertEqual(router.db_for_write(Notification, instance=Notification(recipient_id=4)), 'shard1')
+        # A saved row stays put, and the users it points to are on default
+        post._state.db = 'shard1'
+        self.assertEqual(router.db_for_read(Comment, instance=post), 'shard1')
+        self.assertEqual(router.db_for_read(User, instance=post), 'default')
+        self.assertEqual(router.db_for_read(Post, instance=User(pk=4)), 'shard1')
+
+    @SHARDED
+    def test_scatter_returns_results_in_shard_order(self):
+        class Row:
+            def __init__(self, created_at):
+                self.created_at = created_at
+
+        rows = {'default': [Row(9), Row(3)], 'shard1': [Row(8), Row(1)], 'shard2': [Row(5)]}
+        results = scatter(lambda alias: (alias, threading.current_thread().name, rows[alias]))
+        self.assertEqual([alias for alias, _, _ in results], ['default', 'shard1', 'shard2'])
+        self.assertTrue(all(name.startswith('fanout') for _, name, _ in results))
+        merged = merge_newest([found for _, _, found in results], limit=4)
+        self.assertEqual([row.created_at for row in merged], [9, 8, 5, 3])
+
+
+class ShardPlacementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # With three shards, a user whose id is a multiple of three is on default
+        while (user := User.objects.create_user(username=f'u{User.objects.count()}', password='pw-secret-123',
+                                                email=f'u{User.objects.count()}@example.com')).pk % 3:
+            pass
+        self.user = user
+
+    def test_allocated_ids_encode_the_shard(self):
+        Post.objects.create(author=self.user, content='before sharding')
+        with SHARDED:
+            first = next_id(Post, 'default')
+            self.assertEqual(shard_for_id(first), 'default')
+            self.assertEqual(next_id(Post, 'default'), first + 3)
+            post = Post.objects.create(author=self.user, content='sharded')
+            self.assertEqual(shard_for_id(post.pk), 'default')
+
+    def test_rows_from_before_sharding_are_found_and_renumbered(self):
+        # Legacy ids that encode shard1 once there are three shards
+        post = Post.objects.create(pk=5, author=self.user, content='hello')
+        comment = Comment.objects.create(pk=5, post=post, author=self.user, content='hi')
+        Like.objects.create(post=post, user=self.user)
+        Mention.objects.create(post=post, comment=comment, user=self.user)
+        read_model.refresh_post(post)
+        notification = Notification.objects.create(recipient=self.user, sender=self.user, notification_type='like',
+                                                   message='liked', related_post=post)
+        with SHARDED:
+            self.assertIn('posts.post', sharding.misplaced('default'))
+            # Only default exists in tests; every row here is routed to it
+            with mock.patch('core.management.commands.reshard.shards', return_value=['default']):
+                call_command('reshard', stdout=io.StringIO())
+            self.assertEqual(sharding.misplaced('default'), [])
+
+            moved = Post.objects.get()
+            self.assertEqual(shard_for_id(moved.pk), 'default')
+            self.assertEqual(shard_for_id(moved.comments.get().pk), 'default')
+            self.assertEqual(moved.likes.count(), 1)
+            self.assertEqual(Mention.objects.get().comment, moved.comments.get())
+            self.assertTrue(FeedItem.objects.filter(post=moved).exists())
+            notification.refresh_from_db()
+            self.assertEqual(notification.related_post_id, moved.pk)
+
+
+class OutboxTests(TestCase):
+    def _emit(self, **fields):
+        return OutboxEvent.objects.create(topic='test', aggregate_id=1, **fields)
+
+    def test_event_committed_after_a_later_one_is_not_skipped(self):
+        first = self._emit()
+        late_id = first.id + 1
+        self._emit(id=late_id + 1)  # Its transaction committed while late_id's was still open
+        events, cursor = read_events()
+        self.assertEqual([event.id for event in events], [first.id, late_id + 1])
+        self.assertEqual(list(parse_cursor(cursor)['default'][1]), [late_id])
+
+        self._emit(id=late_id)
+        events, cursor = read_events(cursor)
+        self.assertEqual([event.id for event in events], [late_id])
+        self.assertEqual(parse_cursor(cursor)['default'], (late_id + 1, {}))
+        self.assertEqual(read_events(cursor)[0], [])
+
+    def test_gaps_are_given_up_after_the_timeout(self):
+        first = self._emit()
+        self._emit(id=first.id + 2, created_at=timezone.now() - timedelta(seconds=settings.OUTBOX_GAP_TIMEOUT + 1))
+        cursor = read_events()[1]
+        self.assertEqual(parse_cursor(cursor)['default'], (first.id + 2, {}))
+
+    def test_each_line_carries_its_own_cursor(self):
+        events = [self._emit() for _ in range(3)]
+        lines = read_events()[0]
+        self.assertEqual([parse_cursor(line.cursor)['default'][0] for line in lines], [event.id for event in events])
+
+    def test_stream_refuses_waits_that_are_not_finite(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser(username='root', email='root@example.com',
+                                                                password='pw-secret-123'))
+        for wait in ('nan', 'inf', 'abc'):
+            self.assertEqual(client.get(f'/api/events/?wait={wait}').status_code, 400, wait)
+        self.assertEqual(client.get('/api/events/?wait=0').status_code, 200)
+
+
+class StartupTests(SimpleTestCase):
+    def test_wsgi_module_works_without_a_settings_variable(self):
+        result = run_python("import os; os.environ.pop('DJANGO_SETTINGS_MODULE', None); import config.wsgi")
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_bench_refuses_an_unexpected_status(self):
+        with self.assertRaisesMessage(CommandError, 'answered 401'):
+            call_command('bench_startup', '--runs=1', '--anonymous', stdout=io.StringIO())
+
+
+class IndexMigrationTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_foreign_keys_covered_by_composite_indexes_have_no_own_index(self):
+        with connection.cursor() as cursor:
+            for model, field in ((Like, 'post'), (Comment, 'post'), (Mention, 'user'),
+                                 (Follow, 'follower'), (Notification, 'recipient')):
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                column = model._meta.get_field(field).column
+                declared = {index.name for index in model._meta.indexes}
+                self.assertFalse([name for name, info in constraints.items()
+                                  if info['index'] and info['columns'] == [column] and not info['unique']
+                                  and name not in declared],
+                                 f'{model.__name__}.{field}')
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.registry = dict(jobs.registry)
+        self.addCleanup(lambda: (jobs.registry.clear(), jobs.registry.update(self.registry)))
+        jobs.registry.clear()
+
+    def test_periodic_job_is_requeued_after_its_last_failed_attempt(self):
+        def broken():
+            raise RuntimeError('boom')
+        jobs.job('test.broken', schedule=timedelta(hours=1), max_attempts=1)(broken)
+        jobs.ensure_scheduled()
+        self.assertFalse(jobs.run(jobs.claim()))
+        self.assertEqual(Job.objects.get(status='failed').name, 'test.broken')
+        following = Job.objects.get(status='pending')
+        self.assertGreater(following.run_at, timezone.now() + timedelta(minutes=59))
+
+    def test_concurrency_cap_is_checked_under_the_lock(self):
+        jobs.job('test.capped', concurrency=1)(lambda: None)
+        jobs.defer('test.capped')
+        jobs.defer('test.capped')
+        self.assertIsNotNone(jobs.claim())
+        # The hint is computed before the lock; make it miss the running job
+        with mock.patch.object(jobs, '_running', side_effect=[0, 1]):
+            self.assertIsNone(jobs.claim())
+        self.assertEqual(Job.objects.filter(status='running').count(), 1)
+
+
+class HeartbeatTests(TransactionTestCase):  # The heartbeat writes from its own thread and connection
+    @override_settings(JOB_LOCK_TIMEOUT=0.15)
+    def test_running_job_is_not_released(self):
+        registry = dict(jobs.registry)
+        self.addCleanup(lambda: (jobs.registry.clear(), jobs.registry.update(registry)))
+        jobs.job('test.slow')(lambda: (time.sleep(0.4), self.assertEqual(jobs.release_stale(), 0)))
+        jobs.defer('test.slow')
+        self.assertTrue(jobs.run(jobs.claim()))
+
+
+class WarmingTests(TransactionTestCase):  # Warming runs on other threads, with their own connections
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        Post.objects.create(author=self.bob, content='hello')
+        cache.clear()
+
+    def test_recently_active_users_come_from_last_login(self):
+        now = timezone.now()
+        carol = User.objects.create_user(username='carol', email='carol@example.com', password='pw-secret-123')
+        dave = User.objects.create_user(username='dave', email='dave@example.com', password='pw-secret-123')
+        User.objects.filter(pk=self.alice.pk).update(last_login=now - timedelta(days=2))
+        User.objects.filter(pk=self.bob.pk).update(last_login=now - timedelta(hours=1))
+        User.objects.filter(pk=carol.pk).update(last_login=now - timedelta(days=30))
+        User.objects.filter(pk=dave.pk).update(last_login=now, deleted_at=now)
+        self.assertEqual(warming.recently_active_users(7, 10), [self.bob, self.alice])
+        self.assertEqual(warming.recently_active_users(7, 1), [self.bob])
+
+    def test_warm_users_fills_the_cache(self):
+        self.assertEqual(warming.warm_users([self.alice, self.bob], 2), (2, 0))
+        post = Post.objects.get()
+        for key in (user_key('alice'), following_key(self.alice.id), follow_counts_key(self.bob.id),
+                    f'post_likes:{post.id}'):
+            self.assertIsNotNone(cache.get(key))
+
+    def test_login_records_activity_and_warms_once_per_cooldown(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        with mock.patch.object(warming, '_executor', executor):
+            for _ in range(2):
+                response = APIClient().post('/api/auth/login/', {'email': 'alice@example.com',
+                                                                 'password': 'pw-secret-123'})
+                self.assertEqual(response.status_code, 200)
+            executor.shutdown(wait=True)
+        self.alice.refresh_from_db()
+        self.assertIsNotNone(self.alice.last_login)
+        self.assertEqual(warming.recently_active_users(1, 10), [self.alice])
+        self.assertIsNotNone(cache.get(following_key(self.alice.id)))
+        with mock.patch.object(warming, '_executor') as executor:
+            warming.warm_user_later(self.alice)
+        executor.submit.assert_not_called()
+
+
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, profiling, '_slot', profiling._slot)
+
+    def test_processes_record_into_their_own_slots(self):
+        profiling._slot = (None, None, None)
+        profiling.record('view', Counter({'a;b': 2}), 0.5)
+        profiling._slot = (None, None, None)  # As in another worker process
+        profiling.record('view', Counter({'a;b': 1, 'a;c': 1}), 0.25)
+        profile = profiling.profiles()['view']
+        self.assertEqual((profile['requests'], profile['seconds'], profile['samples']), (2, 0.75, 4))
+        self.assertEqual(profile['stacks'], {'a;b': 3, 'a;c': 1})
+
+        profiling.clear_profiles()
+        self.assertEqual(profiling.profiles(), {})
+
+    @override_settings(PROFILE_SLOTS=2, PROFILE_MAX_BYTES=130)
+    def test_profiles_are_capped_in_bytes_and_slots_are_reused(self):
+        profiling._slot = (None, None, None)
+        profiling.record('view', Counter({'x' * 60: 1, 'y' * 30: 2, 'z' * 30: 1}), 0.1)
+        profiling.record('other', Counter({'a': 1}), 0.1)
+        self.assertEqual(profiling.profiles()['view']['stacks'], {'y' * 30: 2, 'x' * 60: 1})
+        self.assertEqual(cache.get(profiling.slot_key(1))['views'], ['view', 'other'])
+
+        profiling._slot = (None, None, None)
+        profiling.record('view', Counter({'a': 1}), 0.1)
+        profiling._slot = (None, None, None)  # Every slot is taken: not stored
+        profiling.record('view', Counter({'b': 1}), 0.1)
+        self.assertEqual(profiling.profiles()['view']['requests'], 2)
+
+        cache.delete(profiling.slot_key(1))  # The first process's claim lapsed
+        profiling.record('view', Counter({'b': 1}), 0.1)
+        self.assertEqual(profiling._slot[1], 1)
+
+    def test_sampler_stops_adding_after_stop(self):
+        sampler = profiling.Sampler(0.001)
+        release = threading.Event()
+        thread = threading.Thread(target=release.wait)
+        thread.start()
+        sampler.start(thread.ident, None)
+        time.sleep(0.05)
+        stacks = sampler.stop(thread.ident)
+        taken = sum(stacks.values())
+        time.sleep(0.05)
+        release.set()
+        thread.join()
+        self.assertGreater(taken, 0)
+        self.assertEqual(sum(stacks.values()), taken)
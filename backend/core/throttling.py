@@ -0,0 +1,152 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def client_ip(request):
+    """
+    The client's address: REMOTE_ADDR, or with THROTTLE_NUM_PROXIES trusted
+    proxies in front, the address the outermost of them saw. X-Forwarded-For
+    entries further left are set by the client and not trusted.
+    """
+    num_proxies = settings.THROTTLE_NUM_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR')
+
+
+class TokenBucket:
+    """
+    Rate limit kept in the default cache, so every worker sharing the cache
+    sees the same counters: at most `capacity` requests in any `duration`
+    seconds, refilling evenly like a token bucket. Usage is counted per fixed
+    window, the previous window weighted by how much of it lies within the
+    last `duration`. Counters only change through cache.add and incr/decr,
+    which are atomic, so concurrent requests cannot spend the same token.
+    """
+
+    def __init__(self, key, capacity, duration, timer=time.time):
+        self.key = key
+        self.capacity = capacity
+        self.duration = duration
+        self.timer = timer
+
+    def consume(self):
+        """Take a token. Returns 0 if allowed, otherwise the seconds until one is available."""
+        window, position = divmod(self.timer() / self.duration, 1)
+        current = f'{self.key}:{int(window)}'
+        cache.add(current, 0, self.duration * 2)
+        try:
+            count = cache.incr(current)
+        except ValueError:  # Evicted between add and incr
+            cache.add(current, 1, self.duration * 2)
+            count = 1
+        previous = cache.get(f'{self.key}:{int(window) - 1}', 0)
+        used = previous * (1 - position) + count
+        if used <= self.capacity:
+            return 0
+        try:
+            cache.decr(current)  # A refused request spends nothing
+        except ValueError:
+            pass
+        # When would this request fit, with `count - 1` others in this window?
+        if count <= self.capacity:  # Later in this window, once enough of the previous one slid out
+            fits_at = 1 - (self.capacity - count) / previous
+        else:  # In the next window, once enough of this one slid out
+            fits_at = 2 - (self.capacity - 1) / (count - 1)
+        return max(fits_at - position, 0) * self.duration or 1
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    DRF throttle backed by a TokenBucket. Rates come from settings.THROTTLE_RATES
+    in the usual '60/min' format: the number is the burst size and the bucket
+    refills at that rate.
+    """
+
+    @property
+    def THROTTLE_RATES(self):
+        return settings.THROTTLE_RATES
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        self.wait_time = TokenBucket(key, self.num_requests, self.duration, self.timer).consume()
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
+
+    def get_ident(self, request):
+        return client_ip(request)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per authenticated user (per IP for anonymous requests); subclasses set the scope."""
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per client IP; subclasses set the scope."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LikeRateThrottle(UserTokenBucketThrottle):
+    scope = 'likes'
+
+
+class FollowRateThrottle(UserTokenBucketThrottle):
+    scope = 'follows'
+
+
+class AuthRateThrottle(IPTokenBucketThrottle):
+    scope = 'auth'
+
+
+class RefreshRateThrottle(IPTokenBucketThrottle):
+    scope = 'refresh'
+
+
+class WriteRateThrottle(IPTokenBucketThrottle):
+    scope = 'ip_writes'
+
+
+class WriteRateLimitMiddleware:
+    """
+    Per-IP token bucket for unsafe methods, checked before authentication and
+    before the view runs, so floods are rejected without touching the database.
+    Uses the 'ip_writes' rate from settings.THROTTLE_RATES.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.throttle = WriteRateThrottle()
+
+    def __call__(self, request):
+        if self.throttle.rate and request.method not in self.SAFE_METHODS:
+            # Not allow_request(): it keeps the wait on the throttle, which is shared between threads here
+            key = self.throttle.get_cache_key(request, None)
+            wait = TokenBucket(key, self.throttle.num_requests, self.throttle.duration).consume()
+            if wait:
+                response = JsonResponse({'detail': 'Request was throttled.'}, status=429)
+                response['Retry-After'] = str(int(wait) + 1)
+                return response
+        return self.get_response(request)
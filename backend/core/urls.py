@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('bootstrap/', views.bootstrap, name='bootstrap'),
+    path('batch/', views.batch, name='batch'),
+    path('metrics/read-path/', views.read_path_stats, name='read_path_stats'),
+    path('metrics/profiles/', views.profile_list, name='profile_list'),
+    path('events/', views.event_stream, name='event_stream'),
+]
@@ -0,0 +1,223 @@
+import json
+import logging
+import math
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, HttpResponse, QueryDict, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from accounts.cache import get_following_ids
+from accounts.serializers import UserProfileSerializer
+from notifications.cache import get_unread_count
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer
+from posts.feed import feed_items
+from posts.serializers import FeedItemSerializer
+from .concurrency import run_concurrently
+from .outbox import event_data, format_cursor, parse_cursor, read_events
+from .profiling import clear_profiles, profiles
+from .singleflight import stats
+
+BOOTSTRAP_FEED_SIZE = 20
+BOOTSTRAP_NOTIFICATIONS = 5
+MAX_BATCH_REQUESTS = 10
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def bootstrap(request):
+    """
+    Everything the app loads on startup in one response: the profile, the
+    first feed page, the unread notification count and recent notifications.
+    The viewer's follow set is loaded once and shared by all of them (is_liked
+    comes from the like index); the remaining queries run concurrently.
+    """
+    user = request.user
+    following_ids = get_following_ids(user.id)
+    context = {'request': request, 'following_ids': following_ids}
+
+    def profile():
+        return UserProfileSerializer(user, context=context).data
+
+    def feed():
+        items = feed_items(user, following_ids, BOOTSTRAP_FEED_SIZE)
+        return FeedItemSerializer(items, many=True, context={**context}).data
+
+    def unread_count():
+        return get_unread_count(user.id)
+
+    def notifications():
+        recent = Notification.objects.visible_to(user)[:BOOTSTRAP_NOTIFICATIONS]
+        return NotificationSerializer(recent, many=True, context=context).data
+
+    user_data, feed_data, unread, recent = run_concurrently(profile, feed, unread_count, notifications)
+    return Response({
+        'user': user_data,
+        'feed': feed_data,
+        'unread_count': unread,
+        'notifications': recent,
+    })
+
+
+def _sub_request(request, url):
+    parts = urlsplit(url)
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = parts.path
+    sub.META = {key: value for key, value in request.META.items()
+                if key not in ('CONTENT_LENGTH', 'CONTENT_TYPE')}
+    sub.META.update(REQUEST_METHOD='GET', PATH_INFO=parts.path, QUERY_STRING=parts.query)
+    sub.GET = QueryDict(parts.query)
+    return sub
+
+
+def _run_sub_request(request, url):
+    path = urlsplit(url).path
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {'path': url, 'status': status.HTTP_404_NOT_FOUND, 'body': None}
+    # Only DRF views (as_view() sets `cls`): they authenticate the caller and turn errors into responses,
+    # where admin pages, media and the like would answer HTML or raise
+    if match.func is batch or not hasattr(match.func, 'cls'):
+        return {'path': url, 'status': status.HTTP_400_BAD_REQUEST,
+                'body': {'error': 'Only API endpoints can be batched'}}
+
+    try:
+        response = match.func(_sub_request(request, url), *match.args, **match.kwargs)
+    except Exception:
+        # One failing request must not fail the others
+        logger.exception('Batched request to %s failed', url)
+        return {'path': url, 'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': None}
+    if response.streaming:
+        # A streamed JSON list is read whole; event streams and files cannot go in a JSON body
+        if not response.get('Content-Type', '').startswith('application/json'):
+            response.close()
+            return {'path': url, 'status': status.HTTP_400_BAD_REQUEST,
+                    'body': {'error': 'Streaming responses cannot be batched'}}
+        content = b''.join(response.streaming_content)
+        response.close()
+    else:
+        if hasattr(response, 'render'):
+            response.render()
+        content = response.content
+    try:
+        body = json.loads(content) if content else None
+    except ValueError:
+        body = None
+    return {'path': url, 'status': response.status_code, 'body': body}
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def batch(request):
+    """
+    Run up to MAX_BATCH_REQUESTS GET requests in one call, e.g.
+    {"requests": ["/api/auth/profile/", "/api/notifications/"]}.
+    Each sub-request goes through its own view with the caller's credentials.
+    Only API endpoints can be batched. Streamed lists are returned whole;
+    other streaming endpoints (the event stream, exports) answer 400 inside
+    the batch, and a request that fails answers 500 without failing the rest.
+    """
+    urls = request.data.get('requests')
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) for u in urls):
+        return Response({'error': 'requests must be a non-empty list of paths'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(urls) > MAX_BATCH_REQUESTS:
+        return Response({'error': f'At most {MAX_BATCH_REQUESTS} requests per batch'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    responses = run_concurrently(*[
+        (lambda url=url: _run_sub_request(request._request, url)) for url in urls
+    ])
+    return Response({'responses': responses})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@authentication_classes([JWTAuthentication])
+def read_path_stats(request):
+    """Read-cache and single-flight counters of the process that serves the request"""
+    return Response(stats())
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+@authentication_classes([JWTAuthentication])
+def profile_list(request):
+    """
+    Summary of the sampled profiles per URL name; DELETE discards them all.
+    ?view=<url name> returns that view's collapsed stacks as text, ready for
+    flamegraph.pl or speedscope.
+    """
+    if request.method == 'DELETE':
+        clear_profiles()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    stored = profiles()
+    name = request.query_params.get('view')
+    if name is not None:
+        if name not in stored:
+            return Response({'error': 'No profile for this view'}, status=status.HTTP_404_NOT_FOUND)
+        stacks = sorted(stored[name]['stacks'].items(), key=lambda item: -item[1])
+        return HttpResponse(''.join(f'{stack} {count}\n' for stack, count in stacks),
+                            content_type='text/plain; charset=utf-8')
+
+    return Response({
+        name: {
+            'requests': profile['requests'],
+            'avg_ms': round(profile['seconds'] * 1000 / profile['requests'], 1),
+            'samples': profile['samples'],
+            'stacks': len(profile['stacks']),
+        }
+        for name, profile in stored.items()
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@authentication_classes([JWTAuthentication])
+def event_stream(request):
+    """
+    The change feed as NDJSON, one event per line, from ?cursor= (the start
+    when omitted) until caught up or ?limit= events. Every line carries the
+    cursor to resume from after it; ?wait=<seconds> keeps polling for new
+    events for that long (at most OUTBOX_MAX_WAIT) before closing.
+    """
+    try:
+        cursor = format_cursor(parse_cursor(request.query_params.get('cursor')))
+        limit = int(request.query_params.get('limit', settings.OUTBOX_STREAM_LIMIT))
+        wait = float(request.query_params.get('wait', 0))
+        if not math.isfinite(wait):
+            # nan would never reach the deadline and inf never be capped by min()
+            raise ValueError(f'Invalid wait: {wait}')
+        wait = min(wait, settings.OUTBOX_MAX_WAIT)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def lines():
+        current, sent = cursor, 0
+        deadline = time.monotonic() + wait
+        while sent < limit:
+            events, current = read_events(current, min(settings.OUTBOX_BATCH_SIZE, limit - sent))
+            for event in events:
+                # Each line's cursor covers every event up to and including it
+                yield json.dumps({**event_data(event), 'cursor': event.cursor}, cls=DjangoJSONEncoder) + '\n'
+            sent += len(events)
+            if not events:
+                if time.monotonic() >= deadline:
+                    return
+                time.sleep(1)
+
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, connections
+from django.utils import timezone
+
+from accounts.cache import get_follow_counts, get_following_ids, get_user
+from accounts.models import User
+from notifications.cache import get_unread_count
+from posts import likes_index
+from posts.feed import feed_items
+
+# Lazy warming after login/refresh runs on its own small pool; when every slot
+# is busy the request is dropped rather than queued behind the others
+_executor = ThreadPoolExecutor(max_workers=settings.WARM_WORKERS, thread_name_prefix='warm')
+_slots = threading.BoundedSemaphore(settings.WARM_WORKERS)
+
+
+def warm_user(user):
+    """
+    Load what a user's first requests read into the cache: the profile, the
+    follow set and counts, the unread count, and the like arrays of the
+    first feed page. Only missing entries are computed.
+    """
+    get_user(user.username)
+    get_follow_counts(user.id)
+    get_unread_count(user.id)
+    following_ids = get_following_ids(user.id)
+    items = feed_items(user, following_ids, settings.WARM_FEED_SIZE)
+    likes_index.get_likers_many(item.id for item in items)
+
+
+def recently_active_users(days, limit):
+    """
+    Users that logged in or refreshed a token in the last `days`, most recent
+    first: both record last_login (warm_user_later)
+    """
+    since = timezone.now() - timedelta(days=days)
+    return list(User.objects.filter(last_login__gte=since, deleted_at__isnull=True, is_active=True)
+                .order_by('-last_login')[:limit])
+
+
+def warm_users(users, concurrency):
+    """Warm users on `concurrency` threads, each with one connection. Returns (warmed, failed)."""
+    pending = iter(users)
+    lock = threading.Lock()
+
+    def worker():
+        warmed = failed = 0
+        try:
+            while True:
+                with lock:
+                    user = next(pending, None)
+                if user is None:
+                    return warmed, failed
+                try:
+                    warm_user(user)
+                    warmed += 1
+                except DatabaseError:
+                    connections.close_all()
+                    failed += 1
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='warm') as executor:
+        results = [future.result() for future in [executor.submit(worker) for _ in range(concurrency)]]
+    return sum(warmed for warmed, _ in results), sum(failed for _, failed in results)
+
+
+def _warm_later(user):
+    # Pool threads outlive requests: drop connections (on any alias) that broke or outlived CONN_MAX_AGE
+    close_old_connections()
+    try:
+        User.objects.filter(pk=user.pk).update(last_login=timezone.now())
+        warm_user(user)
+    except DatabaseError:
+        # Warming is best effort; drop possibly broken connections and move on
+        connections.close_all()
+    finally:
+        close_old_connections()
+        _slots.release()
+
+
+def warm_user_later(user):
+    """
+    Warm a user in the background after login or token refresh, at most once
+    per WARM_COOLDOWN and never with more than WARM_WORKERS at a time. The
+    same background task records the user's last_login, which
+    recently_active_users reads.
+    """
+    if not cache.add(f'warmed:{user.id}', 1, settings.WARM_COOLDOWN):
+        return
+    if not _slots.acquire(blocking=False):
+        cache.delete(f'warmed:{user.id}')
+        return
+    _executor.submit(_warm_later, user)
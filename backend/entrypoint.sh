@@ -0,0 +1,17 @@
+#!/bin/sh
+# Container command: the job worker (`manage.py run_jobs`, core.jobs) in the
+# background and gunicorn in the foreground. Set RUN_JOBS=0 when the worker
+# runs as its own service instead (same image, command `python manage.py run_jobs`).
+set -e
+
+if [ "${RUN_JOBS:-1}" != "0" ]; then
+    # Started again if it exits, so a crash cannot quietly stop scheduled jobs
+    (
+        while true; do
+            python manage.py run_jobs --concurrency "${JOB_CONCURRENCY:-2}" || true
+            sleep 5
+        done
+    ) &
+fi
+
+exec gunicorn config.wsgi:application --bind 0.0.0.0:8000
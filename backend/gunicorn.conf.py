@@ -0,0 +1,6 @@
+# Read by gunicorn from the working directory (see the Dockerfile's CMD).
+
+# Import config.wsgi, and so core.startup.preload(), once in the master and
+# fork workers that are ready to serve, instead of each one loading the app
+# on its own. Set WEB_CONCURRENCY for the number of workers.
+preload_app = True
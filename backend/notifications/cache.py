@@ -0,0 +1,19 @@
+from core.cache import get_or_compute, invalidate
+from .models import Notification
+
+
+def unread_key(user_id):
+    return f'unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    return get_or_compute(
+        unread_key(user_id),
+        # Matches the list, which hides notifications from soft-deleted senders
+        lambda: (Notification.objects.for_user(user_id).filter(recipient_id=user_id, is_read=False)
+                 .exclude_deleted_users('sender').count()),
+    )
+
+
+def invalidate_unread(*user_ids):
+    invalidate(*[unread_key(user_id) for user_id in user_ids])
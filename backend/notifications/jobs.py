@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.jobs import job
+from .utils import prune_notifications
+
+
+@job('notifications.prune', schedule=timedelta(hours=6), concurrency=1)
+def prune():
+    now = timezone.now()
+    prune_notifications(now - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS))
+    if settings.NOTIFICATION_UNREAD_RETENTION_DAYS:
+        prune_notifications(now - timedelta(days=settings.NOTIFICATION_UNREAD_RETENTION_DAYS), include_unread=True)
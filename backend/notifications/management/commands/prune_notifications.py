@@ -0,0 +1,40 @@
+import gzip
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications.utils import prune_notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete (optionally archive) old notifications in small batches to keep the table bounded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.NOTIFICATION_RETENTION_DAYS,
+                            help='Delete read notifications older than this many days')
+        parser.add_argument('--unread-days', type=int, default=settings.NOTIFICATION_UNREAD_RETENTION_DAYS,
+                            help='Also delete unread notifications older than this many days (0 keeps them)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--archive', help='Append deleted rows to this gzipped NDJSON file')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        archive = gzip.open(options['archive'], 'at', encoding='utf-8') if options['archive'] else None
+        started = time.monotonic()
+        try:
+            deleted = prune_notifications(now - timedelta(days=options['days']),
+                                          batch_size=options['batch_size'], archive=archive)
+            if options['unread_days']:
+                deleted += prune_notifications(now - timedelta(days=options['unread_days']),
+                                               batch_size=options['batch_size'],
+                                               include_unread=True, archive=archive)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} notifications in {time.monotonic() - started:.1f}s'
+        ))
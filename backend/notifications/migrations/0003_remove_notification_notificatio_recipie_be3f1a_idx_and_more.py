@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from core.operations import AddIndexConcurrently, RemoveFieldIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY cannot run in a transaction (core.operations)
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0002_alter_notification_notification_type_and_more'),
+        ('posts', '0004_remove_comment_posts_comme_post_id_06cfd5_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='notification',
+                    name='recipient',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[RemoveFieldIndexConcurrently('notification', 'recipient')],
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient'], name='notif_unread_recipient_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction (core.operations)
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0004_alter_notification_recipient_and_more'),
+        ('posts', '0009_importedpost'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['created_at', 'id'], name='notif_created_idx'),
+        ),
+    ]
@@ -1,28 +1,55 @@
 from django.db import models
 from django.conf import settings
 
+from core.sharding import ShardedQuerySet, is_sharded
+
+
+class NotificationQuerySet(ShardedQuerySet):
+    def visible_to(self, user):
+        """A user's notifications, minus those from soft-deleted users or about soft-deleted posts"""
+        queryset = self.for_user(user.id).filter(recipient=user).exclude_deleted_users('sender')
+        if not is_sharded():
+            queryset = queryset.exclude(related_post__deleted_at__isnull=False)
+        else:
+            # The post may be on another shard, so filter by the (short) list of soft-deleted posts
+            from posts.cache import get_deleted_post_ids
+            deleted_posts = get_deleted_post_ids()
+            if deleted_posts:
+                queryset = queryset.exclude(related_post_id__in=deleted_posts)
+        return queryset.with_related('sender')
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('like', 'Like'),
         ('comment', 'Comment'),
         ('follow', 'Follow'),
+        ('mention', 'Mention'),
     ]
 
-    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
-    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_notifications')
+    # Lookups by recipient use the (recipient, -created_at) index. Notifications are sharded by
+    # recipient (core.sharding), so users and the post may be on other databases: no DB constraints
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications',
+                                  db_index=False, db_constraint=False)
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_notifications',
+                               db_constraint=False)
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     message = models.CharField(max_length=255)
-    related_post = models.ForeignKey('posts.Post', on_delete=models.CASCADE, null=True, blank=True)
+    related_post = models.ForeignKey('posts.Post', on_delete=models.CASCADE, null=True, blank=True,
+                                     db_constraint=False)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['recipient']),
-            models.Index(fields=['sender']),
-            models.Index(fields=['recipient', 'is_read']),
-            models.Index(fields=['recipient', '-created_at'])
+            # Unread counts and mark-all-read only touch unread rows
+            models.Index(fields=['recipient'], condition=models.Q(is_read=False),
+                         name='notif_unread_recipient_idx'),
+            models.Index(fields=['recipient', '-created_at']),
+            # Pruning walks old rows in (created_at, id) order, so it never reads the rows it keeps
+            models.Index(fields=['created_at', 'id'], name='notif_created_idx'),
         ]
 
     def __str__(self):
@@ -1,3 +1,71 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from notifications import jobs
+from notifications.cache import get_unread_count
+from notifications.models import Notification
+from notifications.utils import create_notification, prune_notifications
+
+
+class PruneTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+        self.now = timezone.now()
+
+    def _notification(self, days_old, is_read):
+        notification = create_notification(self.alice, self.bob, 'follow', 'bob follows you')
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.now - timedelta(days=days_old),
+                                                               is_read=is_read)
+        return notification.pk
+
+    def test_deletes_only_old_read_rows_unless_told_otherwise(self):
+        old_read = [self._notification(40, True) for _ in range(5)]
+        old_unread = self._notification(40, False)
+        recent = self._notification(1, True)
+        self.assertEqual(prune_notifications(self.now - timedelta(days=30), batch_size=2), len(old_read))
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {old_unread, recent})
+
+        self.assertEqual(get_unread_count(self.alice.id), 1)
+        self.assertEqual(prune_notifications(self.now - timedelta(days=30), include_unread=True), 1)
+        self.assertEqual(get_unread_count(self.alice.id), 0)
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [recent])
+
+    def test_walks_rows_with_the_same_timestamp(self):
+        ids = [self._notification(40, True) for _ in range(5)]
+        # Batches end between rows with the same created_at: the walk must still see each row once
+        Notification.objects.filter(pk__in=ids).update(created_at=self.now - timedelta(days=40))
+        archive = io.StringIO()
+        self.assertEqual(prune_notifications(self.now - timedelta(days=30), batch_size=2, archive=archive), 5)
+        self.assertEqual([json.loads(line)['id'] for line in archive.getvalue().splitlines()], ids)
+
+    def test_command_archives_what_it_deletes(self):
+        kept = self._notification(1, True)
+        deleted = {self._notification(40, True), self._notification(200, False)}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'archive.ndjson.gz')
+            out = io.StringIO()
+            call_command('prune_notifications', days=30, unread_days=180, archive=path, stdout=out)
+            with gzip.open(path, 'rt') as f:
+                self.assertEqual({json.loads(line)['id'] for line in f}, deleted)
+        self.assertIn('Deleted 2 notifications', out.getvalue())
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [kept])
 
-# Create your tests here.
+    def test_job_uses_the_retention_settings(self):
+        kept = {self._notification(1, True), self._notification(40, False)}
+        self._notification(40, True)
+        self._notification(200, False)
+        with self.settings(NOTIFICATION_RETENTION_DAYS=30, NOTIFICATION_UNREAD_RETENTION_DAYS=180):
+            jobs.prune()
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), kept)
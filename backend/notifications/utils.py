@@ -1,26 +1,77 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from core.sharding import shards
+from .cache import invalidate_unread
 from .models import Notification
 
 def create_notification(recipient, sender, notification_type, message, related_post=None):
-    return Notification.objects.create(
+    notification = Notification.objects.for_user(recipient.id).create(
         recipient=recipient,
         sender=sender,
         notification_type=notification_type,
         message=message,
         related_post=related_post
     )
+    invalidate_unread(recipient.id)
+    return notification
 
 
 def create_follow_notification(follower, followed_user):
-    Notification.objects.create(
+    Notification.objects.for_user(followed_user.id).create(
         recipient=followed_user,
         sender=follower,
         notification_type='follow',
         message=f'{follower.username} ha inizato a seguirti'
     )
+    invalidate_unread(followed_user.id)
 
 def remove_follow_notification(follower, followed_user):
-    Notification.objects.filter(
+    Notification.objects.for_user(followed_user.id).filter(
         recipient=followed_user,
         sender=follower,
         notification_type='follow'
-    ).delete()
\ No newline at end of file
+    ).delete()
+    invalidate_unread(followed_user.id)
+
+def prune_notifications(cutoff, batch_size=1000, include_unread=False, archive=None):
+    """
+    Delete notifications created before `cutoff` (only read ones unless
+    include_unread) in small transactions, walking the (created_at, id) index
+    so every batch, the last empty one included, is an index range scan. When `archive` is a writable text file the
+    deleted rows are written to it as NDJSON first. Returns the number deleted.
+    """
+    return sum(_prune_shard(alias, cutoff, batch_size, include_unread, archive) for alias in shards())
+
+
+def _prune_shard(alias, cutoff, batch_size, include_unread, archive):
+    queryset = Notification.objects.using(alias).filter(created_at__lt=cutoff)
+    if not include_unread:
+        queryset = queryset.filter(is_read=True)
+
+    deleted, last = 0, None
+    while True:
+        with transaction.atomic(using=alias):
+            page = queryset
+            if last is not None:
+                page = page.filter(Q(created_at__gt=last['created_at'])
+                                   | Q(created_at=last['created_at'], id__gt=last['id']))
+            batch = list(
+                page.order_by('created_at', 'id').values(
+                    'id', 'recipient_id', 'sender_id', 'notification_type', 'message',
+                    'related_post_id', 'is_read', 'created_at'
+                )[:batch_size]
+            )
+            if not batch:
+                return deleted
+            if archive is not None:
+                for row in batch:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            ids = [row['id'] for row in batch]
+            Notification.objects.using(alias).filter(id__in=ids).delete()
+        invalidate_unread(*{row['recipient_id'] for row in batch if not row['is_read']})
+        deleted += len(ids)
+        last = batch[-1]
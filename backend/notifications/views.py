@@ -3,19 +3,19 @@ from rest_framework.decorators import api_view, permission_classes, authenticati
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from core.rendering import StreamingListMixin
+from .cache import get_unread_count, invalidate_unread
 from .models import Notification
 from .serializers import NotificationSerializer
 
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(StreamingListMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        return Notification.objects.filter(
-            recipient=self.request.user
-        ).select_related('sender', 'related_post', 'related_post__author')
+        return Notification.objects.visible_to(self.request.user)
 
 
 @api_view(['POST'])
@@ -23,9 +23,10 @@ class NotificationListView(generics.ListAPIView):
 @authentication_classes([JWTAuthentication])
 def mark_notification_read(request, notification_id):
     try:
-        notification = Notification.objects.get(id=notification_id, recipient=request.user)
+        notification = Notification.objects.for_user(request.user.id).get(id=notification_id, recipient=request.user)
         notification.is_read = True
         notification.save()
+        invalidate_unread(request.user.id)
         return Response({'message': 'Notification marked as read'})
     except Notification.DoesNotExist:
         return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -35,7 +36,8 @@ def mark_notification_read(request, notification_id):
 @permission_classes([permissions.IsAuthenticated])
 @authentication_classes([JWTAuthentication])
 def mark_all_notifications_read(request):
-    Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+    Notification.objects.for_user(request.user.id).filter(recipient=request.user, is_read=False).update(is_read=True)
+    invalidate_unread(request.user.id)
     return Response({'message': 'All notifications marked as read'})
 
 
@@ -44,8 +46,7 @@ def mark_all_notifications_read(request):
 @authentication_classes([JWTAuthentication])
 def unread_notifications_count(request):
     """Get count of unread notifications for the current user"""
-    count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-    return Response({'unread_count': count})
+    return Response({'unread_count': get_unread_count(request.user.id)})
 
 
 @api_view(['GET'])
@@ -53,9 +54,7 @@ def unread_notifications_count(request):
 @authentication_classes([JWTAuthentication])
 def recent_notifications(request):
     """Get the 5 most recent notifications for the current user"""
-    notifications = Notification.objects.filter(
-        recipient=request.user
-    ).select_related('sender', 'related_post', 'related_post__author')[:5]
+    notifications = Notification.objects.visible_to(request.user)[:5]
 
     serializer = NotificationSerializer(notifications, many=True)
     return Response(serializer.data)
\ No newline at end of file
@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.admin import SoftDeleteAdmin
+from .models import Post
+from .purge import soft_delete_post
+
+
+@admin.register(Post)
+class PostAdmin(SoftDeleteAdmin):
+    soft_delete = staticmethod(soft_delete_post)
+    list_display = ('id', 'author', 'created_at')
+    raw_id_fields = ('author',)
@@ -0,0 +1,56 @@
+from core.cache import get_or_compute, invalidate
+from core.sharding import scatter
+from .models import Post, FeedItem
+
+DELETED_POSTS_KEY = 'deleted_post_ids'
+# Posts of one author kept in the cache; longer profiles are read from the table
+USER_POSTS_CACHE_SIZE = 100
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def user_posts_key(user_id):
+    return f'user_posts:{user_id}'
+
+
+def get_post(post_id):
+    """Feed item of a visible post, or None"""
+    return get_or_compute(
+        post_key(post_id),
+        lambda: FeedItem.objects.for_id(post_id).visible().filter(post_id=post_id).first(),
+    )
+
+
+def user_posts(user_id):
+    return FeedItem.objects.for_user(user_id).visible().filter(author_id=user_id)
+
+
+def get_user_posts(user_id):
+    """
+    Feed items of a user's visible posts, newest first: from the cache for
+    authors with at most USER_POSTS_CACHE_SIZE posts, otherwise a queryset
+    """
+    posts = get_or_compute(
+        user_posts_key(user_id),
+        lambda: list(user_posts(user_id)[:USER_POSTS_CACHE_SIZE + 1]),
+    )
+    return posts if len(posts) <= USER_POSTS_CACHE_SIZE else user_posts(user_id)
+
+
+def get_deleted_post_ids():
+    """Soft-deleted posts not purged yet, from every shard"""
+    return get_or_compute(
+        DELETED_POSTS_KEY,
+        lambda: set().union(*scatter(
+            lambda alias: Post.objects.using(alias).filter(deleted_at__isnull=False).values_list('id', flat=True)
+        )),
+    )
+
+
+def invalidate_post(post, deleted=False):
+    keys = [post_key(post.id), user_posts_key(post.author_id)]
+    if deleted:
+        keys.append(DELETED_POSTS_KEY)
+    invalidate(*keys)
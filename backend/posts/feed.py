@@ -0,0 +1,39 @@
+from core.sharding import group_by_shard, is_sharded, merge_newest, scatter, shard_for_user
+from .models import Post, FeedItem
+
+
+def feed_items(user, following_ids, limit=None):
+    """
+    Feed items of the visible posts by the user and the accounts they
+    follow, newest first. With several shards each one is queried for its
+    own authors concurrently and the results are merged by created_at.
+    """
+    if not is_sharded():
+        items = FeedItem.objects.feed_for(user, following_ids)
+        return items[:limit] if limit else items
+
+    by_shard = group_by_shard(set(following_ids) | {user.id}, shard_for_user)
+
+    def shard_feed(alias):
+        author_ids = by_shard.get(alias)
+        if not author_ids:
+            return []
+        items = FeedItem.objects.using(alias).visible().filter(author_id__in=author_ids)
+        return list(items[:limit] if limit else items)
+
+    return merge_newest(scatter(shard_feed), limit)
+
+
+def scatter_posts(filter_posts, limit=None, field='created_at'):
+    """
+    Posts selected by filter_posts(queryset on one shard) from every shard,
+    newest first by `field`, which filter_posts must order the queryset by.
+    """
+    def shard_posts(alias):
+        posts = filter_posts(Post.objects.using(alias)).with_related('author')
+        return list(posts[:limit] if limit else posts)
+
+    if not is_sharded():
+        posts = filter_posts(Post.objects.all()).with_related('author')
+        return posts[:limit] if limit else posts
+    return merge_newest(scatter(shard_posts), limit, field)
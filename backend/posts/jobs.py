@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.jobs import job
+from core.sharding import shards
+from . import likes_index, read_model
+from .models import Like
+from .purge import purge_post, purge_deleted_posts
+
+
+@job('posts.purge_post')
+def purge(post_id):
+    purge_post(post_id)
+
+
+@job('posts.refresh_author')
+def refresh_author(user_id):
+    read_model.refresh_author(user_id)
+
+
+@job('posts.purge_deleted', schedule=timedelta(hours=1), concurrency=1)
+def purge_deleted():
+    purge_deleted_posts()
+
+
+@job('posts.reconcile_like_index', schedule=timedelta(minutes=15), concurrency=1)
+def reconcile_like_index():
+    """Rebuild the cached like arrays of posts liked recently, fixing any drift between workers"""
+    since = timezone.now() - timedelta(minutes=20)
+    for alias in shards():
+        post_ids = list(Like.objects.using(alias).filter(created_at__gte=since)
+                        .values_list('post_id', flat=True).distinct())
+        for i in range(0, len(post_ids), 500):
+            likes_index.invalidate(post_ids[i:i + 500])
@@ -0,0 +1,225 @@
+"""
+Per-post like membership kept as a sorted array of user ids in the cache.
+
+The Like table stays the source of truth; the array is loaded from it on a
+miss (an index-only scan on (post, user)) and expires after LIKE_INDEX_TTL.
+Membership is a binary search and the count is the array length, so neither
+touches the database however many likes a post has.
+
+A like or unlike updates the cached array in place, holding the post's lock
+(a cache.add key lasting at most LIKE_INDEX_LEASE) for the read-modify-write.
+It sets the liker's membership to what the table says at that moment, so
+changes applied twice or out of order still end in the right state. A load
+reads the table and stores its array while holding the same lock, so every
+like committed before the load is in the array and every later one is
+applied to it; readers that find the lock taken answer from the table
+without storing. A writer that cannot get the lock in LOCK_WAIT replaces
+the array with a short STALE lease instead: loaders store with add(), so
+nothing outdated is put back while it lasts, and a locked update that
+overlapped it (seen by the post's version counter) gives way to it too.
+
+Posts with more than LIKE_INDEX_MAX_IDS likers, whose arrays would get near
+the cache's value size limit, cache only their count (moved by one per like
+or unlike; a like that races a reload can be counted twice until the count
+expires) and answer membership with a query, as Overflow.
+"""
+import contextlib
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from core.sharding import group_by_shard, shard_for_id
+from .models import Like
+
+KEY = 'post_likes:{}'
+LOCK_KEY = 'post_likes_lock:{}'
+VERSION_KEY = 'post_likes_version:{}'
+STALE = 'stale'
+# Seconds a like or unlike waits for a load or another update of the post, and how often it retries
+LOCK_WAIT = 0.2
+LOCK_POLL = 0.005
+
+
+def _key(post_id):
+    return KEY.format(post_id)
+
+
+@contextlib.contextmanager
+def _locked(post_id, wait=0):
+    """Hold the post's lock if it can be had within `wait` seconds; yields whether it was"""
+    key = LOCK_KEY.format(post_id)
+    deadline = time.monotonic() + wait
+    while not (acquired := cache.add(key, 1, settings.LIKE_INDEX_LEASE)) and time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+class Overflow:
+    """Likers of a post too liked for an array: the count, and membership by query"""
+
+    def __init__(self, post_id, count):
+        self.post_id = post_id
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def _likes(self):
+        return Like.objects.for_post(self.post_id).filter(post_id=self.post_id)
+
+    def __contains__(self, user_id):
+        return self._likes().filter(user_id=user_id).exists()
+
+    def among(self, user_ids):
+        return set(self._likes().filter(user_id__in=user_ids).values_list('user_id', flat=True))
+
+
+def _decode(post_id, value):
+    if isinstance(value, int):
+        return Overflow(post_id, value)
+    ids = array('q')
+    ids.frombytes(value)
+    return ids
+
+
+def _encode(ids):
+    return ids.count if isinstance(ids, Overflow) else ids.tobytes()
+
+
+def _load(post_ids):
+    """Arrays (or Overflows) for post_ids from the Like table, cached for the posts whose lock is free"""
+    with contextlib.ExitStack() as stack:
+        locked = [post_id for post_id in post_ids if stack.enter_context(_locked(post_id))]
+        loaded = _read(post_ids)
+        for post_id in locked:
+            # add(): a STALE lease left by a writer that could not wait for this load must win
+            cache.add(_key(post_id), _encode(loaded[post_id]), settings.LIKE_INDEX_TTL)
+    return loaded
+
+
+def _read(post_ids):
+    """Build arrays (or Overflows) for post_ids from the Like table, two queries per shard"""
+    loaded = {post_id: array('q') for post_id in post_ids}
+    for alias, shard_post_ids in group_by_shard(post_ids, shard_for_id).items():
+        likes = Like.objects.using(alias).filter(post_id__in=shard_post_ids).order_by()
+        small = []
+        for post_id, count in likes.values('post_id').annotate(n=Count('*')).values_list('post_id', 'n'):
+            if count > settings.LIKE_INDEX_MAX_IDS:
+                loaded[post_id] = Overflow(post_id, count)
+            else:
+                small.append(post_id)
+        if small:
+            rows = likes.filter(post_id__in=small).order_by('post_id', 'user_id').values_list('post_id', 'user_id')
+            for post_id, user_id in rows.iterator(chunk_size=10000):
+                loaded[post_id].append(user_id)
+    return loaded
+
+
+def get_likers_many(post_ids):
+    """Sorted liker-id arrays (or Overflows) for several posts: one cache round trip plus queries for misses"""
+    post_ids = list(post_ids)
+    cached = cache.get_many([_key(post_id) for post_id in post_ids])
+    likers = {}
+    missing = []
+    for post_id in post_ids:
+        value = cached.get(_key(post_id))
+        if value is None or value == STALE:
+            missing.append(post_id)
+        else:
+            likers[post_id] = _decode(post_id, value)
+    if missing:
+        likers.update(_load(missing))
+    return likers
+
+
+def get_likers(post_id):
+    return get_likers_many([post_id])[post_id]
+
+
+def contains(ids, user_id):
+    if isinstance(ids, Overflow):
+        return user_id in ids
+    i = bisect_left(ids, user_id)
+    return i < len(ids) and ids[i] == user_id
+
+
+def is_liked(post_id, user_id):
+    return contains(get_likers(post_id), user_id)
+
+
+def likes_count(post_id):
+    return len(get_likers(post_id))
+
+
+def liked_by(ids, user_ids):
+    """The members of user_ids (e.g. a follow set) found in the sorted array ids"""
+    if isinstance(ids, Overflow):
+        return ids.among(user_ids)
+    if len(user_ids) < len(ids):
+        return {user_id for user_id in user_ids if contains(ids, user_id)}
+    user_ids = set(user_ids)
+    return {user_id for user_id in ids if user_id in user_ids}
+
+
+def _bump_version(post_id):
+    key = VERSION_KEY.format(post_id)
+    cache.add(key, 0, settings.LIKE_INDEX_TTL)
+    try:
+        cache.incr(key)
+    except ValueError:  # Evicted between add and incr
+        pass
+
+
+def _updated(value, post_id, user_id, delta):
+    """The cached value with the change applied"""
+    if isinstance(value, int):
+        return max(value + delta, 0)
+    ids = _decode(post_id, value)
+    liked = Like.objects.for_post(post_id).filter(post_id=post_id, user_id=user_id).exists()
+    if liked and not contains(ids, user_id):
+        insort(ids, user_id)
+        if len(ids) > settings.LIKE_INDEX_MAX_IDS:
+            return len(ids)
+    elif not liked and contains(ids, user_id):
+        del ids[bisect_left(ids, user_id)]
+    return ids.tobytes()
+
+
+def _changed(post_id, user_id, delta):
+    key, version_key = _key(post_id), VERSION_KEY.format(post_id)
+    with _locked(post_id, LOCK_WAIT) as locked:
+        if locked:
+            version = cache.get(version_key)
+            value = cache.get(key)
+            if value is None or value == STALE:
+                return  # The next load reads the change from the table
+            cache.set(key, _updated(value, post_id, user_id, delta), settings.LIKE_INDEX_TTL)
+            if cache.get(version_key) == version:
+                return
+            # A writer without the lock left its STALE lease while this update ran: put it back
+        else:
+            _bump_version(post_id)
+    cache.set(key, STALE, settings.LIKE_INDEX_LEASE)
+
+
+def add_like(post_id, user_id):
+    """Call after the like is committed"""
+    _changed(post_id, user_id, 1)
+
+
+def remove_like(post_id, user_id):
+    """Call after the unlike is committed"""
+    _changed(post_id, user_id, -1)
+
+
+def invalidate(post_ids):
+    """Drop cached arrays after likes were changed behind the index's back (bulk imports, purges)"""
+    cache.delete_many([_key(post_id) for post_id in post_ids])
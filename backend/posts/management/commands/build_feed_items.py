@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.read_model import BATCH_SIZE, build_items
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the feed items (the read model behind feed, profile and post '
+        'pages) of every post from the posts, comments and users tables. '
+        'Migrating builds the missing ones; run it to repair the items after '
+        'writes that bypassed the API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built = build_items(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Built feed items for {built} posts in {time.perf_counter() - started:.1f}s'
+        ))
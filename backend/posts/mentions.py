@@ -0,0 +1,77 @@
+import re
+
+from django.contrib.auth import get_user_model
+
+from core.sharding import group_by_shard, shard_for_user
+from notifications.cache import invalidate_unread
+from notifications.models import Notification
+from .models import Mention
+
+User = get_user_model()
+
+# Usernames allow letters, digits and . + - _ ; '@' is not accepted inside a
+# mention and a trailing dot is treated as punctuation.
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]+)')
+MAX_MENTIONS = 50
+
+
+def parse_mentions(text):
+    """Distinct usernames mentioned in text, capped at MAX_MENTIONS"""
+    usernames = []
+    for match in MENTION_RE.finditer(text or ''):
+        username = match.group(1).rstrip('.')
+        if username and username not in usernames:
+            usernames.append(username)
+            if len(usernames) == MAX_MENTIONS:
+                break
+    return usernames
+
+
+def sync_mentions(post, author, text, comment=None, created=False):
+    """
+    Store the mentions in a saved post/comment and notify the users mentioned
+    for the first time. Usernames are resolved in a single query and rows are
+    written with bulk_create, so the cost is a handful of queries however many
+    users are mentioned. Pass created=True for new objects to skip looking up
+    previous mentions.
+    """
+    usernames = parse_mentions(text)
+    if created and not usernames:
+        return
+
+    existing = Mention.objects.for_post(post.id).filter(post=post, comment=comment)
+    current_ids = set() if created else set(existing.values_list('user_id', flat=True))
+
+    mentioned_ids = set()
+    if usernames:
+        mentioned_ids = set(
+            User.objects.filter(username__in=usernames, deleted_at__isnull=True)
+            .exclude(id=author.id).values_list('id', flat=True)
+        )
+
+    removed = current_ids - mentioned_ids
+    if removed:
+        existing.filter(user_id__in=removed).delete()
+
+    added = mentioned_ids - current_ids
+    if not added:
+        return
+
+    # A concurrent save of the same post or comment may have stored some already
+    Mention.objects.for_post(post.id).bulk_create([
+        Mention(post=post, comment=comment, user_id=user_id) for user_id in added
+    ], ignore_conflicts=True)
+    where = 'in un commento' if comment else 'in un post'
+    # One insert per shard the recipients live on
+    for alias, recipient_ids in group_by_shard(added, shard_for_user).items():
+        Notification.objects.using(alias).bulk_create([
+            Notification(
+                recipient_id=user_id,
+                sender=author,
+                notification_type='mention',
+                message=f'{author.username} ti ha menzionato {where}',
+                related_post=post,
+            )
+            for user_id in recipient_ids
+        ])
+    invalidate_unread(*added)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_alter_comment_author_alter_like_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_item', serialize=False, to='posts.post')),
+                ('author_id', models.BigIntegerField()),
+                ('author', models.JSONField()),
+                ('content', models.TextField(max_length=2000)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='posts/')),
+                ('likes_count', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['author_id', '-created_at'], name='posts_feedi_author__58aa73_idx')],
+            },
+        ),
+    ]
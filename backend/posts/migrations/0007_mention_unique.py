@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    # Concurrent saves could store the same mention twice; keep the first row of each
+    Mention = apps.get_model('posts', 'Mention')
+    mentions = Mention.objects.using(schema_editor.connection.alias)
+    keep = mentions.values('post', 'comment', 'user').annotate(first=Min('id')).values('first')
+    mentions.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_feeditem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='mention',
+            constraint=models.UniqueConstraint(condition=models.Q(('comment__isnull', True)), fields=('post', 'user'), name='unique_post_mention'),
+        ),
+        migrations.AddConstraint(
+            model_name='mention',
+            constraint=models.UniqueConstraint(condition=models.Q(('comment__isnull', False)), fields=('comment', 'user'), name='unique_comment_mention'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:02
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+from rest_framework import serializers
+
+BATCH_SIZE = 500
+
+
+def author_snapshot(user):
+    # posts.read_model.author_snapshot as of this migration
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'bio': user.bio,
+        'profile_picture': user.profile_picture.name or None,
+        'created_at': serializers.DateTimeField().to_representation(user.created_at),
+    }
+
+
+def build_missing_items(apps, schema_editor):
+    # Posts from before 0006, which only created the table, would otherwise be missing from every feed
+    # until build_feed_items ran. Users stay on `default` when posts are sharded (core.sharding).
+    alias = schema_editor.connection.alias
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    FeedItem = apps.get_model('posts', 'FeedItem')
+    users = apps.get_model(settings.AUTH_USER_MODEL).objects.using('default')
+    deleted = list(users.filter(deleted_at__isnull=False).values_list('id', flat=True))
+    posts = Post.objects.using(alias).filter(deleted_at__isnull=True, feed_item__isnull=True).order_by('pk')
+    last = 0
+    while batch := list(posts.filter(pk__gt=last)[:BATCH_SIZE]):
+        last = batch[-1].pk
+        comments = dict(Comment.objects.using(alias).filter(post__in=batch).exclude(author_id__in=deleted)
+                        .order_by().values('post').annotate(n=Count('*')).values_list('post', 'n'))
+        authors = users.in_bulk({post.author_id for post in batch})
+        FeedItem.objects.using(alias).bulk_create([
+            FeedItem(post_id=post.pk, author_id=post.author_id, author=author_snapshot(authors[post.author_id]),
+                     content=post.content, image=post.image.name, comments_count=comments.get(post.pk, 0),
+                     created_at=post.created_at, updated_at=post.updated_at)
+            for post in batch if post.author_id in authors
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_mention_unique'),
+        ('accounts', '0003_alter_user_options_user_deleted_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='likes_count',
+        ),
+        migrations.RunPython(build_missing_items, migrations.RunPython.noop),
+    ]
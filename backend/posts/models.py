@@ -1,19 +1,37 @@
 from django.db import models
 from django.conf import settings
 
+from core.sharding import ShardedQuerySet
+
+
+class PostQuerySet(ShardedQuerySet):
+    def visible(self):
+        """Posts that are neither soft-deleted nor written by a soft-deleted user"""
+        return self.filter(deleted_at__isnull=True).exclude_deleted_users('author')
+
+
 class Post(models.Model):
-    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
+    # Users stay on `default` while posts are sharded (core.sharding), so no database-level constraint
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts',
+                               db_constraint=False)
     content = models.TextField(max_length=2000)
     image = models.ImageField(upload_to='posts/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set on delete; the row and its likes/comments are removed later by purge_deleted
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['author']),
             models.Index(fields=['-created_at']),
-            models.Index(fields=['author', '-created_at']),
+            # Feed and profile pages only ever read visible posts
+            models.Index(fields=['author', '-created_at'], condition=models.Q(deleted_at__isnull=True),
+                         name='posts_post_author_feed_idx'),
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False),
+                         name='posts_post_deleted_idx'),
         ]
 
     def __str__(self):
@@ -28,18 +46,19 @@ class Post(models.Model):
         return self.comments.count()
 
 class Comment(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
-    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
+    # Lookups by post use the (post, -created_at) index
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments',
+                               db_constraint=False)
     content = models.TextField(max_length=1000)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['post']),
-            models.Index(fields=['author']),
-            models.Index(fields=['-created_at']),
             models.Index(fields=['post', '-created_at']),
         ]
 
@@ -47,17 +66,100 @@ class Comment(models.Model):
         return f"{self.author.username} on {self.post.id}: {self.content[:30]}..."
 
 class Like(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='likes')
+    # Lookups by post use the (post, user) unique index
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes', db_index=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='likes',
+                             db_constraint=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         unique_together = ('post', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} likes {self.post.id}"
+
+class Mention(models.Model):
+    """An @username in a post, or in one of its comments when comment is set"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='mentions')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='mentions')
+    # Lookups by user use the (user, -created_at) index
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='mentions',
+                             db_index=False, db_constraint=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
         indexes = [
-            models.Index(fields=['post']),
-            models.Index(fields=['user']),
-            models.Index(fields=['post', 'user']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+        # comment is NULL for mentions in the post itself, and NULLs never clash in a plain unique constraint
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'], condition=models.Q(comment__isnull=True),
+                                    name='unique_post_mention'),
+            models.UniqueConstraint(fields=['comment', 'user'], condition=models.Q(comment__isnull=False),
+                                    name='unique_comment_mention'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} mentioned in {self.post_id}"
+
+
+class ImportedPost(models.Model):
+    """The post a record of `manage.py import_data` became; likes in the import name posts by source id"""
+    source = models.CharField(max_length=100)
+    source_id = models.CharField(max_length=100)
+    # Not a foreign key: the mapping stays on default when posts are sharded, and outliving a purged post is harmless
+    post_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'], name='unique_imported_post'),
         ]
 
     def __str__(self):
-        return f"{self.user.username} likes {self.post.id}"
\ No newline at end of file
+        return f"{self.source}:{self.source_id} -> {self.post_id}"
+
+
+class FeedItemQuerySet(ShardedQuerySet):
+    def visible(self):
+        """Items whose author is not soft-deleted, without joining the user table"""
+        from accounts.cache import get_deleted_user_ids
+        deleted = get_deleted_user_ids()
+        return self.exclude(author_id__in=deleted) if deleted else self
+
+    def feed_for(self, user, following_ids):
+        """Visible items by the user and the accounts they follow, newest first"""
+        return self.visible().filter(author_id__in=list(following_ids) + [user.id])
+
+
+class FeedItem(models.Model):
+    """
+    Read model of a visible post (posts.read_model): what PostSerializer
+    renders, with the author as a snapshot and the comment count stored, so
+    feed, profile and detail pages read one row per post with no joins. The
+    like count and is_liked come from posts.likes_index.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='feed_item')
+    author_id = models.BigIntegerField()
+    # id, username, email, bio, profile_picture (file name) and created_at, as rendered
+    author = models.JSONField()
+    content = models.TextField(max_length=2000)
+    image = models.ImageField(upload_to='posts/', null=True, blank=True)
+    comments_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    objects = FeedItemQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['author_id', '-created_at']),
+        ]
+
+    @property
+    def id(self):
+        return self.post_id
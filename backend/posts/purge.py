@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import invalidate
+from core.db import delete_in_batches
+from core.jobs import defer
+from core.outbox import emit, emit_many
+from core.sharding import scatter, shard_for_id, shards
+from notifications.cache import invalidate_unread
+from notifications.models import Notification
+from . import likes_index, read_model
+from .cache import DELETED_POSTS_KEY, invalidate_post
+from .models import Post, Comment, Like, Mention
+
+
+def soft_delete_post(post):
+    """Hide the post from reads straight away; a posts.purge_post job removes its rows."""
+    db = shard_for_id(post.pk)
+    with transaction.atomic(), transaction.atomic(using=db):
+        Post.objects.using(db).filter(pk=post.pk).update(deleted_at=timezone.now())
+        emit('post.deleted', post.pk, {'author_id': post.author_id}, using=db)
+        read_model.remove_item(post.pk)
+        defer('posts.purge_post', post_id=post.pk)
+    invalidate_post(post, deleted=True)
+
+
+def _delete_emitting(queryset, batch_size, topic, event, fields):
+    """
+    delete_in_batches() that also records `topic` for every row deleted, in
+    the batch's transaction: event(row) gives the (aggregate_id, payload) of a
+    row's `fields` values.
+    """
+    alias = queryset.db
+    while True:
+        rows = list(queryset.order_by().values('pk', *fields)[:batch_size])
+        if not rows:
+            return
+        with transaction.atomic(using=alias):
+            delete_in_batches(queryset.model._base_manager.using(alias).filter(pk__in=[row['pk'] for row in rows]),
+                              batch_size)
+            emit_many(topic, [event(row) for row in rows], using=alias)
+
+
+def delete_likes(queryset, batch_size=1000):
+    """Delete likes in batches, emitting like.deleted for each so analytics rollups follow"""
+    _delete_emitting(queryset, batch_size, 'like.deleted', lambda row: (row['post_id'], {
+        'post_id': row['post_id'], 'post_author_id': row['post__author_id'], 'user_id': row['user_id'],
+    }), ('post_id', 'post__author_id', 'user_id'))
+
+
+def delete_comments(queryset, batch_size=1000):
+    """Delete comments in batches, emitting comment.deleted for each (without the content being erased)"""
+    _delete_emitting(queryset, batch_size, 'comment.deleted', lambda row: (row['pk'], {
+        'post_id': row['post_id'], 'post_author_id': row['post__author_id'], 'author_id': row['author_id'],
+    }), ('post_id', 'post__author_id', 'author_id'))
+
+
+def purge_post(post_id, batch_size=1000):
+    """Remove a soft-deleted post's notifications, likes and comments in batches, then the post."""
+    def purge_notifications(alias):
+        # Notifications live on their recipients' shards
+        notifications = Notification.objects.using(alias).filter(related_post_id=post_id)
+        unread_recipients = set(notifications.filter(is_read=False).values_list('recipient_id', flat=True))
+        delete_in_batches(notifications, batch_size)
+        return unread_recipients
+
+    invalidate_unread(*set().union(*scatter(purge_notifications)))
+    delete_likes(Like.objects.for_post(post_id).filter(post_id=post_id), batch_size)
+    delete_in_batches(Mention.objects.for_post(post_id).filter(post_id=post_id), batch_size)
+    delete_comments(Comment.objects.for_post(post_id).filter(post_id=post_id), batch_size)
+    # Nothing references the post any more, so this is a single-row delete
+    post = Post.objects.for_id(post_id).filter(pk=post_id)
+    with transaction.atomic(using=post.db):
+        # A post purged with its author's account was never soft-deleted, so post.deleted is still due
+        author_id = post.filter(deleted_at__isnull=True).values_list('author_id', flat=True).first()
+        post.delete()
+        if author_id is not None:
+            emit('post.deleted', post_id, {'author_id': author_id}, using=post.db)
+    likes_index.invalidate([post_id])
+    invalidate(DELETED_POSTS_KEY)
+
+
+def purge_deleted_posts(batch_size=1000, limit=None):
+    """Purge soft-deleted posts, oldest deletion first, shard by shard. Returns the number purged."""
+    purged = 0
+    for alias in shards():
+        post_ids = (Post.objects.using(alias).filter(deleted_at__isnull=False)
+                    .order_by('deleted_at').values_list('id', flat=True))
+        if limit:
+            post_ids = post_ids[:limit - purged]
+        for post_id in list(post_ids):
+            purge_post(post_id, batch_size)
+            purged += 1
+        if limit and purged >= limit:
+            break
+    return purged
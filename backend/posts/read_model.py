@@ -0,0 +1,108 @@
+"""
+Maintenance of the FeedItem read model.
+
+Saving a post rebuilds its item and adding or removing a comment moves its
+counter, from the receivers in posts.signals and so in the same
+transaction; a soft delete drops it. Likes never touch the item: the one
+like count is the one posts.likes_index keeps, so a popular post's likes do
+not queue on its item's row lock or invalidate its cached copies. Profile edits reach the author
+snapshots through a posts.refresh_author job that rewrites them in batches.
+Migration posts.0008 builds the items of posts that have none;
+`manage.py build_feed_items` (re)builds every item from the tables.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+from accounts.models import User
+from core.cache import invalidate
+from core.sharding import shards
+from .cache import post_key, user_posts_key
+from .models import Post, Comment, FeedItem
+
+BATCH_SIZE = 500
+
+SNAPSHOT_FIELDS = ('author_id', 'author', 'content', 'image', 'comments_count', 'created_at', 'updated_at')
+
+
+def author_snapshot(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'bio': user.bio,
+        'profile_picture': user.profile_picture.name or None,
+        'created_at': serializers.DateTimeField().to_representation(user.created_at),
+    }
+
+
+def _count(model, user_field):
+    """Rows of `model` on the post, leaving out those by soft-deleted users"""
+    rows = (model.objects.filter(post=OuterRef('pk')).exclude_deleted_users(user_field)
+            .order_by().values('post').annotate(n=Count('*')).values('n'))
+    return Coalesce(Subquery(rows), 0)
+
+
+def refresh_items(post_ids, using, batch_size=BATCH_SIZE):
+    """Rebuild the items of these posts on shard `using` from the tables; deleted posts lose theirs"""
+    post_ids = list(post_ids)
+    for i in range(0, len(post_ids), batch_size):
+        batch = post_ids[i:i + batch_size]
+        posts = list(Post.objects.using(using).filter(pk__in=batch, deleted_at__isnull=True)
+                     .annotate(comments_total=_count(Comment, 'author')))
+        authors = User.objects.in_bulk({post.author_id for post in posts})
+        FeedItem.objects.using(using).bulk_create([
+            FeedItem(post_id=post.id, author_id=post.author_id, author=author_snapshot(authors[post.author_id]),
+                     content=post.content, image=post.image.name, comments_count=post.comments_total,
+                     created_at=post.created_at, updated_at=post.updated_at)
+            for post in posts if post.author_id in authors
+        ], update_conflicts=True, unique_fields=['post'], update_fields=SNAPSHOT_FIELDS)
+        FeedItem.objects.using(using).filter(post_id__in=batch).exclude(
+            post_id__in=[post.id for post in posts if post.author_id in authors]).delete()
+
+
+def refresh_post(post):
+    refresh_items([post.id], post._state.db)
+
+
+def remove_item(post_id):
+    FeedItem.objects.for_post(post_id).filter(post_id=post_id).delete()
+
+
+def adjust_comments(post_id, delta):
+    """Move an item's comment counter; call it in the transaction adding or removing the comment"""
+    FeedItem.objects.for_post(post_id).filter(post_id=post_id).update(comments_count=F('comments_count') + delta)
+
+
+def refresh_author(user_id, batch_size=BATCH_SIZE):
+    """Rewrite the author snapshot of every item by this user, in batches"""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    snapshot = author_snapshot(user)
+    items = FeedItem.objects.for_user(user_id).filter(author_id=user_id)
+    last = 0
+    while True:
+        post_ids = list(items.filter(post_id__gt=last).order_by('post_id').values_list('post_id', flat=True)[:batch_size])
+        if not post_ids:
+            break
+        items.filter(post_id__in=post_ids).update(author=snapshot)
+        invalidate(*[post_key(post_id) for post_id in post_ids])
+        last = post_ids[-1]
+    invalidate(user_posts_key(user_id))
+
+
+def build_items(batch_size=BATCH_SIZE):
+    """(Re)build the items of every visible post, shard by shard. Returns the number of posts processed."""
+    built = 0
+    for alias in shards():
+        last = 0
+        while True:
+            post_ids = list(Post.objects.using(alias).filter(pk__gt=last).order_by('pk')
+                            .values_list('pk', flat=True)[:batch_size])
+            if not post_ids:
+                break
+            refresh_items(post_ids, alias, batch_size)
+            built += len(post_ids)
+            last = post_ids[-1]
+    return built
@@ -1,10 +1,24 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import Post, Comment, Like
+from . import likes_index
+from .models import Post, Comment, Like, FeedItem
+from accounts.cache import get_follow_counts, get_following_ids
 from accounts.serializers import UserProfileSerializer
 
+
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Load the like index of the whole page in one cache round trip
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        self.context.setdefault('likers', {}).update(
+            likes_index.get_likers_many(post.id for post in posts)
+        )
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     author = UserProfileSerializer(read_only=True)
-    likes_count = serializers.ReadOnlyField()
+    likes_count = serializers.SerializerMethodField()
     comments_count = serializers.ReadOnlyField()
     is_liked = serializers.SerializerMethodField()
 
@@ -13,16 +27,72 @@ class PostSerializer(serializers.ModelSerializer):
         fields = ('id', 'author', 'content', 'image', 'likes_count',
                  'comments_count', 'is_liked', 'created_at', 'updated_at')
         read_only_fields = ('created_at', 'updated_at')
+        list_serializer_class = PostListSerializer
+
+    def _likers(self, obj):
+        likers = self.context.setdefault('likers', {})
+        if obj.id not in likers:
+            likers[obj.id] = likes_index.get_likers(obj.id)
+        return likers[obj.id]
+
+    def get_likes_count(self, obj):
+        return len(self._likers(obj))
 
     def get_is_liked(self, obj):
+        # Callers that already loaded the viewer's likes for these posts pass them in the context
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.id in liked_post_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Like.objects.filter(post=obj, user=request.user).exists()
+            return likes_index.contains(self._likers(obj), request.user.id)
         return False
 
     def create(self, validated_data):
-        validated_data['author'] = self.context['request'].user
-        return super().create(validated_data)
+        author = validated_data['author'] = self.context['request'].user
+        # On the author's shard (core.sharding)
+        return Post.objects.for_user(author.id).create(**validated_data)
+
+
+class FeedItemSerializer(PostSerializer):
+    """PostSerializer's output rendered from a FeedItem, without touching the post or user tables"""
+    author = serializers.SerializerMethodField()
+
+    class Meta(PostSerializer.Meta):
+        model = FeedItem
+        read_only_fields = PostSerializer.Meta.fields
+
+    def _file_url(self, name):
+        if not name:
+            return None
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def _is_following(self, user_id):
+        following_ids = self.context.get('following_ids')
+        if following_ids is None:
+            request = self.context.get('request')
+            if not (request and request.user.is_authenticated):
+                return False
+            following_ids = self.context['following_ids'] = get_following_ids(request.user.id)
+        return user_id in following_ids
+
+    def get_author(self, obj):
+        # Same keys, in the same order, as UserProfileSerializer
+        snapshot = obj.author
+        followers_count, following_count = get_follow_counts(obj.author_id)
+        return {
+            'id': snapshot['id'],
+            'username': snapshot['username'],
+            'email': snapshot['email'],
+            'bio': snapshot['bio'],
+            'profile_picture': self._file_url(snapshot['profile_picture']),
+            'followers_count': followers_count,
+            'following_count': following_count,
+            'is_following': self._is_following(obj.author_id),
+            'created_at': snapshot['created_at'],
+        }
 
 class CommentSerializer(serializers.ModelSerializer):
     author = UserProfileSerializer(read_only=True)
@@ -34,7 +104,8 @@ class CommentSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
-        return super().create(validated_data)
+        # On the post's shard (core.sharding)
+        return Comment.objects.for_post(validated_data['post'].id).create(**validated_data)
 
 class LikeSerializer(serializers.ModelSerializer):
     user = UserProfileSerializer(read_only=True)
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from . import read_model
+from .models import Post, Comment
+
+# Keep the feed items in step with every ORM write (API, admin, shell); the
+# receivers run in the writer's transaction. Raw batch deletes skip them, so
+# purges refresh the items they touch themselves. Likes are counted by
+# posts.likes_index, not the items.
+
+@receiver(post_save, sender=Post)
+def refresh_feed_item(sender, instance, raw=False, **kwargs):
+    if not raw:
+        read_model.refresh_post(instance)
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        read_model.adjust_comments(instance.post_id, 1)
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    read_model.adjust_comments(instance.post_id, -1)
@@ -1,3 +1,173 @@
-from django.test import TestCase
+import json
+from array import array
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from core.models import Job
+from posts import likes_index
+from posts.cache import USER_POSTS_CACHE_SIZE, get_post, get_user_posts, post_key, user_posts_key
+from posts.mentions import sync_mentions
+from posts.models import Post, Comment, Like, Mention, FeedItem
+from posts.read_model import refresh_post
+
+
+class AdminDeleteTests(TestCase):
+    def test_admin_delete_soft_deletes_and_defers_the_purge(self):
+        cache.clear()
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='pw-secret-123')
+        post = Post.objects.create(author=admin, content='hello')
+        refresh_post(post)
+        self.client.force_login(admin)
+        response = self.client.post('/admin/posts/post/', {
+            'action': 'delete_selected', '_selected_action': [post.pk], 'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertIsNotNone(post.deleted_at)
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(Job.objects.get().name, 'posts.purge_post')
+
+
+class MentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+
+    def test_a_mention_is_stored_once(self):
+        post = Post.objects.create(author=self.alice, content='hi @bob')
+        sync_mentions(post, self.alice, post.content, created=True)
+        sync_mentions(post, self.alice, post.content, created=True)  # As a concurrent save would
+        self.assertEqual(Mention.objects.filter(post=post, user=self.bob).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Mention.objects.create(post=post, user=self.bob)
+
+        comment = Comment.objects.create(post=post, author=self.alice, content='again @bob')
+        sync_mentions(post, self.alice, comment.content, comment=comment, created=True)
+        self.assertEqual(Mention.objects.filter(post=post, user=self.bob).count(), 2)
+
+    def test_mentioned_posts_newest_mention_first(self):
+        older = Post.objects.create(author=self.alice, content='old post')
+        newer = Post.objects.create(author=self.alice, content='hi @bob')
+        Mention.objects.create(post=newer, user=self.bob)
+        Mention.objects.create(post=older, user=self.bob)
+        Mention.objects.filter(post=newer).update(created_at=timezone.now() - timedelta(days=1))
+
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        response = client.get('/api/posts/mentions/')
+        self.assertEqual([post['id'] for post in response.json()], [older.id, newer.id])
+
+
+class LikesIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com', password='pw-secret-123')
+                      for i in range(4)]
+        self.post = Post.objects.create(author=self.users[0], content='hello')
+
+    def _like(self, user):
+        Like.objects.create(post=self.post, user=user)
+        likes_index.add_like(self.post.id, user.id)
+
+    def _unlike(self, user):
+        Like.objects.filter(post=self.post, user=user).delete()
+        likes_index.remove_like(self.post.id, user.id)
+
+    def test_likes_update_the_cached_array(self):
+        self._like(self.users[1])
+        likes_index.get_likers(self.post.id)
+        self._like(self.users[2])
+        self._unlike(self.users[1])
+        with self.assertNumQueries(0):
+            self.assertEqual(list(likes_index.get_likers(self.post.id)), [self.users[2].id])
+
+    def test_changes_applied_late_or_out_of_order_follow_the_table(self):
+        Like.objects.create(post=self.post, user=self.users[1])
+        likes_index.get_likers(self.post.id)  # A load that already saw the like
+        likes_index.add_like(self.post.id, self.users[1].id)
+        Like.objects.create(post=self.post, user=self.users[2])
+        Like.objects.filter(post=self.post, user=self.users[2]).delete()
+        likes_index.remove_like(self.post.id, self.users[2].id)  # The unlike's update wins the race
+        likes_index.add_like(self.post.id, self.users[2].id)
+        self.assertEqual(list(likes_index.get_likers(self.post.id)), [self.users[1].id])
+
+    def test_loads_store_only_with_the_lock(self):
+        self._like(self.users[1])
+        with likes_index._locked(self.post.id):
+            self.assertEqual(likes_index.likes_count(self.post.id), 1)
+            self.assertIsNone(cache.get(likes_index._key(self.post.id)))
+        likes_index.get_likers(self.post.id)
+        self.assertIsNotNone(cache.get(likes_index._key(self.post.id)))
+
+    @mock.patch('posts.likes_index.LOCK_WAIT', 0)
+    def test_a_writer_without_the_lock_leaves_a_lease(self):
+        likes_index.get_likers(self.post.id)
+        with likes_index._locked(self.post.id):
+            self._like(self.users[1])
+            stale = array('q').tobytes()  # What a load holding the lock read before the like
+            cache.add(likes_index._key(self.post.id), stale)
+        self.assertEqual(cache.get(likes_index._key(self.post.id)), likes_index.STALE)
+        self.assertEqual(likes_index.likes_count(self.post.id), 1)
+
+    @override_settings(LIKE_INDEX_MAX_IDS=2)
+    def test_posts_over_the_cap_cache_only_the_count(self):
+        for user in self.users[1:]:
+            Like.objects.create(post=self.post, user=user)
+        likers = likes_index.get_likers(self.post.id)
+        self.assertIsInstance(likers, likes_index.Overflow)
+        self.assertEqual(cache.get(likes_index._key(self.post.id)), 3)
+
+        Like.objects.filter(post=self.post, user=self.users[3]).delete()
+        likes_index.remove_like(self.post.id, self.users[3].id)
+        self.assertEqual(likes_index.likes_count(self.post.id), 2)
+        self.assertTrue(likes_index.is_liked(self.post.id, self.users[1].id))
+        self.assertFalse(likes_index.is_liked(self.post.id, self.users[3].id))
+        self.assertEqual(likes_index.liked_by(likers, {self.users[1].id, self.users[3].id}), {self.users[1].id})
+
+
+class LikeCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        self.fan = User.objects.create_user(username='bob', email='bob@example.com', password='pw-secret-123')
+        self.post = Post.objects.create(author=self.author, content='hello')
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def test_liking_leaves_the_feed_item_and_its_caches_alone(self):
+        get_post(self.post.id)
+        get_user_posts(self.author.id)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post(f'/api/posts/{self.post.id}/like/').status_code, 200)
+        self.assertFalse([query for query in queries if 'posts_feeditem' in query['sql']])
+        self.assertIsNotNone(cache.get(post_key(self.post.id)))
+        self.assertIsNotNone(cache.get(user_posts_key(self.author.id)))
+
+    def test_pages_count_likes_from_the_index(self):
+        self.client.post(f'/api/posts/{self.post.id}/like/')
+        self.assertEqual(self.client.get(f'/api/posts/{self.post.id}/').json()['likes_count'], 1)
+        self.assertEqual(self.client.get('/api/posts/users/alice/').json()[0]['likes_count'], 1)
+        self.client.post(f'/api/posts/{self.post.id}/unlike/')
+        self.assertEqual(self.client.get(f'/api/posts/{self.post.id}/').json()['likes_count'], 0)
+
+
+class UserPostsCacheTests(TestCase):
+    def test_long_profiles_are_not_cached_whole(self):
+        cache.clear()
+        author = User.objects.create_user(username='alice', email='alice@example.com', password='pw-secret-123')
+        for i in range(USER_POSTS_CACHE_SIZE + 2):
+            refresh_post(Post.objects.create(author=author, content=f'post {i}'))
+        self.assertEqual(len(list(get_user_posts(author.id))), USER_POSTS_CACHE_SIZE + 2)
+        client = APIClient()
+        client.force_authenticate(author)
+        response = client.get('/api/posts/users/alice/')
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), USER_POSTS_CACHE_SIZE + 2)
@@ -1,12 +1,24 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes
 from rest_framework.response import Response
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Max
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from . import likes_index
+from .cache import get_post, get_user_posts, invalidate_post
+from .feed import feed_items, scatter_posts
+from .mentions import sync_mentions
+from .purge import soft_delete_post
 from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer, LikeSerializer
-from accounts.models import Follow
+from .serializers import PostSerializer, FeedItemSerializer, CommentSerializer, LikeSerializer
+from accounts.cache import get_following_ids, get_user
 from notifications.utils import create_notification
+from core.outbox import emit
+from core.rendering import StreamingListMixin
+from core.sharding import shard_for_id, shard_for_user
+from core.throttling import LikeRateThrottle
 
 
 class IsVerifiedUser(permissions.BasePermission):
@@ -55,16 +67,23 @@ class IsRegularUserOrReadOnly(permissions.BasePermission):
         return obj.author == request.user
 
 
-class PostListCreateView(generics.ListCreateAPIView):
+class PostListCreateView(StreamingListMixin, generics.ListCreateAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsVerifiedUser]
     authentication_classes = [JWTAuthentication]
 
+    def get_serializer_class(self):
+        return FeedItemSerializer if self.request.method == 'GET' else PostSerializer
+
     def get_queryset(self):
-        following_users = Follow.objects.filter(follower=self.request.user).values_list('following', flat=True)
-        return Post.objects.filter(
-            author__in=list(following_users) + [self.request.user.id]
-        ).select_related('author').prefetch_related('likes')
+        return feed_items(self.request.user, get_following_ids(self.request.user.id))
+
+    def perform_create(self, serializer):
+        with transaction.atomic(using=shard_for_user(self.request.user.id)):
+            post = serializer.save()
+            emit('post.created', post.id, {'author_id': post.author_id, 'content': post.content}, using=post._state.db)
+        invalidate_post(post)
+        sync_mentions(post, self.request.user, post.content, created=True)
 
 
 class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -73,34 +92,83 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        return Post.objects.select_related('author').prefetch_related('likes')
+        return Post.objects.for_id(self.kwargs['pk']).visible().with_related('author')
+
+    def get_serializer_class(self):
+        return FeedItemSerializer if self.request.method in permissions.SAFE_METHODS else PostSerializer
+
+    def get_object(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return super().get_object()
+        # Reads of hot posts share one cached, single-flight lookup of the feed item
+        post = get_post(self.kwargs['pk'])
+        if post is None:
+            raise Http404
+        self.check_object_permissions(self.request, post)
+        return post
+
+    def perform_update(self, serializer):
+        with transaction.atomic(using=shard_for_id(serializer.instance.pk)):
+            post = serializer.save()
+            emit('post.updated', post.id, {'author_id': post.author_id, 'content': post.content}, using=post._state.db)
+        invalidate_post(post)
+        sync_mentions(post, post.author, post.content)
+
+    def perform_destroy(self, instance):
+        soft_delete_post(instance)
+
+
+class UserPostsView(StreamingListMixin, generics.ListAPIView):
+    serializer_class = FeedItemSerializer
+    permission_classes = [IsRegularUserOrReadOnly]
+    authentication_classes = [JWTAuthentication]
+
+    def get_queryset(self):
+        author = get_user(self.kwargs['username'])
+        if author is None:
+            return []
+        return get_user_posts(author.id)
 
 
-class UserPostsView(generics.ListAPIView):
+class MentionedPostsView(StreamingListMixin, generics.ListAPIView):
+    """Posts that mention the current user in their text or in a comment"""
     serializer_class = PostSerializer
-    permission_classes = [IsRegularUserOrReadOnly]
+    permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        username = self.kwargs['username']
-        return Post.objects.filter(
-            author__username=username
-        ).select_related('author').prefetch_related('likes')
+        user = self.request.user
+        # Most recently mentioned first, so the join starts from the user's (user, -created_at) index range
+        return scatter_posts(lambda posts: (
+            posts.visible().filter(mentions__user=user)
+            .annotate(mentioned_at=Max('mentions__created_at')).order_by('-mentioned_at')
+        ), field='mentioned_at')
+
 
+def _comment_payload(comment):
+    return {'post_id': comment.post_id, 'post_author_id': comment.post.author_id,
+            'author_id': comment.author_id, 'content': comment.content}
 
-class PostCommentsView(generics.ListCreateAPIView):
+
+class PostCommentsView(StreamingListMixin, generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsRegularUserOrReadOnly]
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
         post_id = self.kwargs['post_id']
-        return Comment.objects.filter(post_id=post_id).select_related('author')
+        return Comment.objects.for_post(post_id).filter(
+            post_id=post_id, post__deleted_at__isnull=True
+        ).exclude_deleted_users('author').with_related('author')
 
     def perform_create(self, serializer):
         post_id = self.kwargs['post_id']
-        post = get_object_or_404(Post, id=post_id)
-        comment = serializer.save(post=post)
+        post = get_object_or_404(Post.objects.for_id(post_id).visible(), id=post_id)
+        with transaction.atomic(using=post._state.db):
+            comment = serializer.save(post=post)
+            emit('comment.created', comment.id, _comment_payload(comment), using=post._state.db)
+        invalidate_post(post)
+        sync_mentions(post, self.request.user, comment.content, comment=comment, created=True)
 
         if post.author != self.request.user:
             create_notification(
@@ -118,18 +186,42 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
-        return Comment.objects.select_related('author')
+        return Comment.objects.for_id(self.kwargs['pk']).filter(
+            post__deleted_at__isnull=True
+        ).exclude_deleted_users('author').with_related('author')
+
+    def perform_update(self, serializer):
+        with transaction.atomic(using=serializer.instance._state.db):
+            comment = serializer.save()
+            emit('comment.updated', comment.id, _comment_payload(comment), using=comment._state.db)
+        sync_mentions(comment.post, comment.author, comment.content, comment=comment)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=instance._state.db):
+            emit('comment.deleted', instance.id, _comment_payload(instance), using=instance._state.db)
+            instance.delete()
+        invalidate_post(instance.post)
+
+
+def _like_payload(post, user):
+    return {'post_id': post.id, 'post_author_id': post.author_id, 'user_id': user.id}
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 @authentication_classes([JWTAuthentication])
+@throttle_classes([LikeRateThrottle])
 def like_post(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_id(post_id).visible(), id=post_id)
 
-    like, created = Like.objects.get_or_create(post=post, user=request.user)
+    with transaction.atomic(using=post._state.db):
+        like, created = Like.objects.for_post(post.id).get_or_create(post=post, user=request.user)
+        if created:
+            emit('like.created', post.id, _like_payload(post, request.user), using=post._state.db)
 
     if created:
+        # The cached item and author pages carry no like count, so they stay valid
+        likes_index.add_like(post.id, request.user.id)
         if post.author != request.user:
             create_notification(
                 recipient=post.author,
@@ -146,25 +238,34 @@ def like_post(request, post_id):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 @authentication_classes([JWTAuthentication])
+@throttle_classes([LikeRateThrottle])
 def unlike_post(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_id(post_id).visible(), id=post_id)
 
     try:
-        like = Like.objects.get(post=post, user=request.user)
-        like.delete()
+        like = Like.objects.for_post(post.id).get(post=post, user=request.user)
+        with transaction.atomic(using=post._state.db):
+            like.delete()
+            emit('like.deleted', post.id, _like_payload(post, request.user), using=post._state.db)
+        likes_index.remove_like(post.id, request.user.id)
         return Response({'message': 'Post unliked successfully'})
     except Like.DoesNotExist:
         return Response({'error': 'Post not liked'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PostLikesView(generics.ListAPIView):
+class PostLikesView(StreamingListMixin, generics.ListAPIView):
     serializer_class = LikeSerializer
     permission_classes = [IsRegularUserOrReadOnly]
     authentication_classes = [JWTAuthentication]
 
     def get_queryset(self):
         post_id = self.kwargs['post_id']
-        return Like.objects.filter(post_id=post_id).select_related('user')
+        likes = Like.objects.for_post(post_id).filter(post_id=post_id).exclude_deleted_users('user')
+        if self.request.query_params.get('following'):
+            # Only likers the viewer follows, intersected in the like index
+            following_ids = get_following_ids(self.request.user.id)
+            likes = likes.filter(user_id__in=likes_index.liked_by(likes_index.get_likers(post_id), following_ids))
+        return likes.with_related('user')
 
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -1 +1,4 @@
-python3 manage.py runserver
\ No newline at end of file
+# Local development: the job worker in the background, stopped with the server
+trap 'kill 0' EXIT
+python3 manage.py run_jobs &
+python3 manage.py runserver
@@ -85,7 +85,11 @@ export const api = {
     } catch (error) {
       if (axios.isAxiosError(error) && error.response) {
         const errorData = error.response.data;
-        throw new Error(errorData.message || "Token refresh failed");
+        // The status tells a rejected token (401) from a throttled or failed request
+        throw Object.assign(
+          new Error(errorData.message || "Token refresh failed"),
+          { status: error.response.status }
+        );
       }
       throw new Error("Token refresh failed");
     }
@@ -106,6 +110,21 @@ export const api = {
     }
   },
 
+  // Profile, first feed page, unread count and recent notifications in one request
+  bootstrap: async (): Promise<APIResponse> => {
+    try {
+      const response = await axiosInstance.get("/bootstrap/");
+      return { success: true, data: response.data };
+    } catch (error) {
+      console.error("Error fetching bootstrap data:", error);
+      return {
+        success: false,
+        error:
+          error instanceof Error ? error.message : "Failed to fetch app data",
+      };
+    }
+  },
+
   updateProfile: async (
     username?: string,
     bio?: string,
@@ -12,6 +12,7 @@ export const FeedScreen: React.FC<FeedScreenProps> = ({}) => {
   const [isLoading, setIsLoading] = useState<boolean>(false);
 
   useEffect(() => {
+    // The bootstrap request only brought the first page: show it while the full feed loads
     setIsLoading(true);
 
     fetchFeed()
@@ -78,6 +78,12 @@ interface UserActions {
 
 export type UserModel = UserState & UserActions;
 
+// Only a refresh token the server rejected ends the session; a 429 or a network error may be retried
+const isRefreshRejected = (error: unknown): boolean => {
+  const status = (error as { status?: number })?.status;
+  return status === 400 || status === 401;
+};
+
 const isTokenExpired = (token: string): boolean => {
   try {
     const decodedToken: any = jwtDecode(token);
@@ -243,8 +249,10 @@ export const createUserStore: StateCreator<
 
       return newToken;
     } catch (error) {
-      // If refresh fails, logout the user
-      get().logout();
+      // If the refresh token was rejected, logout the user
+      if (isRefreshRejected(error)) {
+        get().logout();
+      }
       throw error;
     }
   },
@@ -317,11 +325,19 @@ export const createUserStore: StateCreator<
         if (newToken && !isTokenExpired(newToken)) {
           console.log("New access token is valid.");
 
-          // Load the user profile after refreshing the token
-          const response = await api.whoami();
+          // Profile, feed and notifications in one request after refreshing the token
+          const response = await api.bootstrap();
           if (response.success) {
-            const user = response.data as User;
-            set({ user, isAuthenticated: true, isLoading: false, error: null });
+            const { user, feed, notifications, unread_count } = response.data;
+            set({
+              user: user as User,
+              feed,
+              notifications,
+              unreadCount: unread_count,
+              isAuthenticated: true,
+              isLoading: false,
+              error: null,
+            });
           } else {
             console.error("Failed to load user profile after token refresh.");
             set({ error: "Failed to load user profile" });
@@ -332,7 +348,9 @@ export const createUserStore: StateCreator<
         }
       } catch (error) {
         console.error("Failed to refresh access token:", error);
-        get().logout();
+        if (isRefreshRejected(error)) {
+          get().logout();
+        }
         set({ isLoading: false, error: "Failed to refresh access token" });
       }
     } else {